@@ -37,9 +37,41 @@ export interface GrammarIssue {
   suggestion: string;
   type: 'spelling' | 'grammar' | 'style';
   severity: 'error' | 'warning' | 'info';
+  word?: string;
+  suggestions?: string[];
 }
 
 const API_BASE = 'http://localhost:5174/api';
+// Grammar answers within this budget; the rest of a long document is polled for
+const GRAMMAR_BUDGET_MS = 150;
+const GRAMMAR_POLL_MS = 500;
+const GRAMMAR_POLL_LIMIT = 10;
+
+interface BridgeResponse {
+  status: number;
+  body: any;
+}
+
+declare global {
+  interface Window {
+    pywebview?: { api?: { call?: (path: string, method: string, payload: unknown) => Promise<BridgeResponse> } };
+  }
+}
+
+// In the desktop window the API is called in-process through pywebview;
+// in a browser (or before the bridge is injected) it goes over HTTP
+async function callApi(path: string, method = 'GET', payload?: unknown) {
+  const bridge = window.pywebview?.api;
+  if (bridge?.call) {
+    const { status, body } = await bridge.call(`/api${path}`, method, payload ?? null);
+    return { ok: status >= 200 && status < 300, status, json: async () => body };
+  }
+  return fetch(`${API_BASE}${path}`, payload === undefined ? { method } : {
+    method,
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload)
+  });
+}
 
 export default function App() {
   const [sidebarOpen, setSidebarOpen] = useState(false);
@@ -127,7 +159,7 @@ export default function App() {
   // API calls
   const loadDocument = async () => {
     try {
-      const response = await fetch(`${API_BASE}/document`);
+      const response = await callApi('/document');
       if (response.ok) {
         const data = await response.json();
         setDocument(data);
@@ -139,11 +171,7 @@ export default function App() {
 
   const saveDocument = async (doc: DocumentContent) => {
     try {
-      await fetch(`${API_BASE}/document`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(doc)
-      });
+      await callApi('/document', 'POST', doc);
     } catch (error) {
       console.error('Failed to save document:', error);
     }
@@ -151,7 +179,7 @@ export default function App() {
 
   const fetchStats = async () => {
     try {
-      const response = await fetch(`${API_BASE}/stats`);
+      const response = await callApi('/stats');
       if (response.ok) {
         const data = await response.json();
         setStats(data);
@@ -161,16 +189,29 @@ export default function App() {
     }
   };
 
+  const pollGrammarCheck = async (revision: number, attempt = 0) => {
+    try {
+      const response = await callApi(`/grammar?revision=${revision}`);
+      const data = await response.json();
+      if (data.complete) {
+        setGrammarIssues(data.issues || []);
+      } else if (data.revision === revision && attempt < GRAMMAR_POLL_LIMIT) {
+        setTimeout(() => pollGrammarCheck(revision, attempt + 1), GRAMMAR_POLL_MS);
+      }
+    } catch (error) {
+      console.error('Failed to poll grammar check:', error);
+    }
+  };
+
   const fetchGrammarCheck = async () => {
     try {
-      const response = await fetch(`${API_BASE}/grammar`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text: document.content })
-      });
+      const response = await callApi('/grammar', 'POST', { text: document.content, max_ms: GRAMMAR_BUDGET_MS });
       if (response.ok) {
         const data = await response.json();
         setGrammarIssues(data.issues || []);
+        if (data.complete === false && data.revision !== undefined) {
+          setTimeout(() => pollGrammarCheck(data.revision), GRAMMAR_POLL_MS);
+        }
       }
     } catch (error) {
       console.error('Failed to fetch grammar check:', error);
@@ -179,7 +220,7 @@ export default function App() {
 
   const loadTheme = async () => {
     try {
-      const response = await fetch(`${API_BASE}/theme`);
+      const response = await callApi('/theme');
       if (response.ok) {
         const data = await response.json();
         setTheme(data.theme as Theme);
@@ -195,11 +236,7 @@ export default function App() {
   const updateTheme = useCallback(async (newTheme: Theme) => {
     setTheme(newTheme);
     try {
-      await fetch(`${API_BASE}/theme`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ theme: newTheme })
-      });
+      await callApi('/theme', 'POST', { theme: newTheme });
     } catch (error) {
       console.error('Failed to save theme:', error);
     }
@@ -208,11 +245,7 @@ export default function App() {
   const updateCustomTheme = useCallback(async (newCustomTheme: CustomTheme) => {
     setCustomTheme(newCustomTheme);
     try {
-      await fetch(`${API_BASE}/custom-theme`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(newCustomTheme)
-      });
+      await callApi('/custom-theme', 'POST', newCustomTheme);
     } catch (error) {
       console.error('Failed to save custom theme:', error);
     }
@@ -7,8 +7,12 @@ interface Note {
   id: number;
   content: string;
   color: string;
+  version?: number;
 }
 
+type NoteFields = { content?: string; color?: string; x?: number; y?: number };
+type SavedNote = Note & { x?: number; y?: number };
+
 const noteColors = [
   { name: 'Yellow', value: '#FEF08A', dark: '#FDE047' },
   { name: 'Pink', value: '#FBCFE8', dark: '#F9A8D4' },
@@ -28,7 +32,9 @@ export function StickyNotes({ onClose, theme }: StickyNotesProps) {
     { id: 1, content: 'Remember to cite Johnson et al. (2020) in methodology section', color: noteColors[0].value },
     { id: 2, content: 'Review statistical analysis before final submission', color: noteColors[2].value },
   ]);
-  const [nextId, setNextId] = useState(3);
+  const [error, setError] = useState<string | null>(null);
+  // Text we could not save because the note was changed elsewhere meanwhile
+  const [conflicts, setConflicts] = useState<{ [id: number]: string }>({});
   const [draggedNote, setDraggedNote] = useState<{ id: number; offsetX: number; offsetY: number } | null>(null);
   const [notePositions, setNotePositions] = useState<{ [id: number]: { x: number; y: number } }>({});
   const containerRef = useRef<HTMLDivElement>(null);
@@ -41,25 +47,121 @@ export function StickyNotes({ onClose, theme }: StickyNotesProps) {
     ? 'bg-white border-2 border-black hover:bg-black hover:text-white'
     : 'bg-gray-100 hover:bg-gray-200';
 
-  const addNote = () => {
-    setNotes([...notes, {
-      id: nextId,
-      content: '',
-      color: noteColors[Math.floor(Math.random() * noteColors.length)].value
-    }]);
-    setNextId(nextId + 1);
+  const contentTimers = useRef<{ [id: number]: ReturnType<typeof setTimeout> }>({});
+  const pendingContent = useRef<{ [id: number]: string }>({});
+  // What the server last confirmed for each note; every patch carries its version
+  const saved = useRef<{ [id: number]: SavedNote }>({});
+  const patchQueue = useRef<{ [id: number]: Promise<void> }>({});
+
+  const showLocally = (id: number, fields: NoteFields) => {
+    setNotes(prev => prev.map(note => note.id === id ? {
+      ...note,
+      ...(fields.content !== undefined ? { content: fields.content } : {}),
+      ...(fields.color !== undefined ? { color: fields.color } : {}),
+    } : note));
+    if (fields.x !== undefined && fields.y !== undefined) {
+      setNotePositions(prev => ({ ...prev, [id]: { x: fields.x!, y: fields.y! } }));
+    }
+  };
+
+  const sendPatch = async (id: number, fields: NoteFields): Promise<void> => {
+    const base = saved.current[id];
+    if (!base) return;  // deleted, or never reached the server
+    try {
+      const res = await fetch(`/api/sticky-notes/${id}`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...fields, version: base.version })
+      });
+      const data = await res.json();
+      if (res.ok) {
+        saved.current[id] = { ...base, ...fields, version: data.version };
+        setNotes(prev => prev.map(note => note.id === id ? { ...note, version: data.version } : note));
+        return;
+      }
+      if (res.status === 409 && data.note) {
+        // Changed elsewhere since our last save: take their note, then re-send
+        // only our changes to fields they left alone
+        const theirs: SavedNote = data.note;
+        const mine: NoteFields = {};
+        (Object.keys(fields) as (keyof NoteFields)[]).forEach(key => {
+          if (theirs[key] === base[key]) (mine as any)[key] = fields[key];
+        });
+        saved.current[id] = theirs;
+        showLocally(id, { ...theirs, ...mine });
+        if (fields.content !== undefined && mine.content === undefined && fields.content !== theirs.content) {
+          setConflicts(prev => ({ ...prev, [id]: fields.content! }));
+        }
+        if (Object.keys(mine).length) await sendPatch(id, mine);
+        return;
+      }
+      setError(data.error || 'Could not save the note');
+    } catch (e) {
+      setError('Could not reach the server; the note was not saved');
+    }
+  };
+
+  // One request per note at a time, so each patch carries the version the previous one produced
+  const patchNote = (id: number, fields: NoteFields) => {
+    const next = (patchQueue.current[id] || Promise.resolve()).then(() => sendPatch(id, fields));
+    patchQueue.current[id] = next;
+    return next;
+  };
+
+  const keepMine = (id: number) => {
+    const content = conflicts[id];
+    setConflicts(prev => { const { [id]: _, ...rest } = prev; return rest; });
+    if (content !== undefined) updateNote(id, content);
+  };
+
+  const discardMine = (id: number) => {
+    setConflicts(prev => { const { [id]: _, ...rest } = prev; return rest; });
+  };
+
+  const addNote = async () => {
+    const color = noteColors[Math.floor(Math.random() * noteColors.length)].value;
+    try {
+      const res = await fetch('/api/sticky-notes/create', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ content: '', color })
+      });
+      if (res.ok) {
+        const data = await res.json();
+        saved.current[data.note.id] = data.note;
+        setNotes(prev => [...prev, { id: data.note.id, content: '', color, version: data.note.version }]);
+        return;
+      }
+    } catch (e) {
+      // reported below
+    }
+    // A note only the browser knows about would never be saved
+    setError('Could not create a note; is the Toshu server running?');
   };
 
   const deleteNote = (id: number) => {
-    setNotes(notes.filter(note => note.id !== id));
+    setNotes(prev => prev.filter(note => note.id !== id));
+    clearTimeout(contentTimers.current[id]);
+    delete pendingContent.current[id];
+    delete saved.current[id];
+    discardMine(id);
+    fetch(`/api/sticky-notes/${id}`, { method: 'DELETE' }).catch(() => {});
   };
 
   const updateNote = (id: number, content: string) => {
-    setNotes(notes.map(note => note.id === id ? { ...note, content } : note));
+    setNotes(prev => prev.map(note => note.id === id ? { ...note, content } : note));
+    // Debounce per note so typing sends one small patch; the version is read when it is sent
+    clearTimeout(contentTimers.current[id]);
+    pendingContent.current[id] = content;
+    contentTimers.current[id] = setTimeout(() => {
+      delete pendingContent.current[id];
+      patchNote(id, { content });
+    }, 800);
   };
 
   const updateNoteColor = (id: number, color: string) => {
-    setNotes(notes.map(note => note.id === id ? { ...note, color } : note));
+    setNotes(prev => prev.map(note => note.id === id ? { ...note, color } : note));
+    patchNote(id, { color });
   };
   const handleMouseDown = (id: number, e: React.MouseEvent) => {
     if (containerRef.current) {
@@ -85,9 +187,12 @@ export function StickyNotes({ onClose, theme }: StickyNotesProps) {
   };
 
   const handleMouseUp = () => {
+    if (draggedNote) {
+      // Persist only the dragged note's position; the server batches these writes
+      const pos = notePositions[draggedNote.id];
+      if (pos) patchNote(draggedNote.id, { x: pos.x, y: pos.y });
+    }
     setDraggedNote(null);
-    // Persist positions when dragging stops
-    saveNotes();
   };
 
   // Load sticky notes from backend on mount
@@ -98,9 +203,9 @@ export function StickyNotes({ onClose, theme }: StickyNotesProps) {
         if (res.ok) {
           const data = await res.json();
           if (Array.isArray(data.notes)) {
-            setNotes(data.notes.map((n: any) => ({ id: n.id, content: n.content, color: n.color || noteColors[0].value })));
-            const maxId = data.notes.reduce((m: number, n: any) => Math.max(m, n.id || 0), 0);
-            setNextId(maxId + 1);
+            setNotes(data.notes.map((n: any) => ({ id: n.id, content: n.content, color: n.color || noteColors[0].value, version: n.version })));
+            saved.current = {};
+            data.notes.forEach((n: SavedNote) => { saved.current[n.id] = n; });
             const positions: any = {};
             data.notes.forEach((n: any) => { if (n.x !== undefined && n.y !== undefined) positions[n.id] = { x: n.x, y: n.y }; });
             setNotePositions(positions);
@@ -113,25 +218,14 @@ export function StickyNotes({ onClose, theme }: StickyNotesProps) {
     loadNotes();
   }, []);
 
-  // Save notes to backend
-  const saveNotes = async () => {
-    try {
-      const payload = notes.map(n => ({ id: n.id, content: n.content, color: n.color, x: notePositions[n.id]?.x, y: notePositions[n.id]?.y }));
-      await fetch('/api/sticky-notes', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ notes: payload })
-      });
-    } catch (e) {
-      // ignore
-    }
-  };
-
-  // Auto-save when notes or positions change (debounced)
+  // Flush pending content edits when the panel closes
   useEffect(() => {
-    const t = setTimeout(() => saveNotes(), 800);
-    return () => clearTimeout(t);
-  }, [notes, notePositions]);
+    return () => {
+      Object.values(contentTimers.current).forEach(t => clearTimeout(t));
+      Object.entries(pendingContent.current).forEach(([id, content]) => patchNote(Number(id), { content }));
+    };
+  }, []);
+
   return (
     <div 
       className="fixed inset-0 bg-black/50 backdrop-blur-sm z-50"
@@ -163,6 +257,11 @@ export function StickyNotes({ onClose, theme }: StickyNotesProps) {
             Add Note
           </button>
         </div>
+        {error && (
+          <p className="mb-4 text-sm text-red-500 cursor-pointer" onClick={() => setError(null)} title="Dismiss">
+            {error}
+          </p>
+        )}
 
         {/* Floating Notes */}
         <div className="relative w-full h-full">
@@ -199,6 +298,14 @@ export function StickyNotes({ onClose, theme }: StickyNotesProps) {
                 </button>
               </div>
 
+              {conflicts[note.id] !== undefined && (
+                <div className="mb-2 text-xs text-gray-800 bg-white/60 rounded p-2">
+                  Changed elsewhere; your last edit was not saved.
+                  <button onClick={() => keepMine(note.id)} className="ml-2 underline">Keep mine</button>
+                  <button onClick={() => discardMine(note.id)} className="ml-2 underline">Discard</button>
+                </div>
+              )}
+
               {/* Note Content */}
               <textarea
                 value={note.content}
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Measure API response encoding: time to encode and bytes on the wire.
+
+For synthetic manuscripts of each size, the document, stats and
+readability responses are encoded with the stdlib json module and with
+orjson (when installed), with and without gzip, exactly as
+ToshuHTTPRequestHandler.send_body would. A final pass fetches
+GET /api/document over a real socket with and without
+Accept-Encoding: gzip to confirm the byte counts and show latency.
+
+    python benchmarks/bench_responses.py --sizes 10000 500000
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+import argparse
+import http.client
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_server import git_commit, isolate_data_dir, percentile, synthetic_manuscript  # noqa: E402
+import toshu_app  # noqa: E402
+
+DEFAULT_SIZES = [1000, 100000, 500000]
+
+Payload = Union[bytes, Iterable[bytes]]
+
+
+def encoders() -> Dict[str, Callable[[Any], Payload]]:
+    found: Dict[str, Callable[[Any], Payload]] = {
+        "json": lambda obj: json.dumps(obj).encode(),
+        "json-stream": toshu_app._json_chunks,
+    }
+    if toshu_app.orjson is not None:
+        found["orjson"] = toshu_app.orjson.dumps
+    return found
+
+
+def wire_bytes(payload: Payload, gzip: bool) -> int:
+    chunks = [payload] if isinstance(payload, (bytes, bytearray)) else payload
+    if not gzip:
+        return sum(len(c) for c in chunks)
+    deflate = zlib.compressobj(toshu_app.GZIP_LEVEL, zlib.DEFLATED, 31)
+    total = sum(len(deflate.compress(c)) for c in chunks)
+    return total + len(deflate.flush())
+
+
+def time_encoding(obj: Any, encode: Callable[[Any], Payload], gzip: bool, repeat: int) -> Dict[str, Any]:
+    timings: List[float] = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = wire_bytes(encode(obj), gzip)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    return {"bytes": size, "p50_ms": round(percentile(timings, 50), 3), "min_ms": round(timings[0], 3)}
+
+
+def fetch_document(port: int, gzip: bool, repeat: int) -> Dict[str, Any]:
+    headers = {"Accept-Encoding": "gzip"} if gzip else {}
+    timings: List[float] = []
+    size = 0
+    for _ in range(repeat):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        start = time.perf_counter()
+        conn.request("GET", "/api/document", headers=headers)
+        resp = conn.getresponse()
+        size = len(resp.read())
+        timings.append((time.perf_counter() - start) * 1000.0)
+        conn.close()
+    timings.sort()
+    return {"bytes": size, "p50_ms": round(percentile(timings, 50), 3)}
+
+
+def run_benchmark(sizes: List[int], repeat: int) -> Dict[str, Any]:
+    isolate_data_dir()
+    httpd = toshu_app.make_server(port=0)
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    results: List[Dict[str, Any]] = []
+    try:
+        for size in sizes:
+            text = synthetic_manuscript(size)
+            toshu_app.set_document(text)
+            responses = {
+                "document": {"title": "Document", "content": text, "revision": 1},
+                "stats": toshu_app.get_stats(),
+                "readability": toshu_app.get_readability(),
+            }
+            for route, obj in responses.items():
+                for name, encode in encoders().items():
+                    for gzip in (False, True):
+                        print(f"  {size:>7} words  {route:<12} {name:<12} gzip={gzip}", flush=True)
+                        row = {"size_words": size, "route": route, "encoder": name, "gzip": gzip}
+                        row.update(time_encoding(obj, encode, gzip, repeat))
+                        results.append(row)
+            for gzip in (False, True):
+                row = {"size_words": size, "route": "document", "encoder": "http", "gzip": gzip}
+                row.update(fetch_document(port, gzip, repeat))
+                results.append(row)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "orjson": toshu_app.orjson is not None,
+            "gzip_level": toshu_app.GZIP_LEVEL,
+            "sizes": sizes,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure API response encode time and size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="manuscript sizes in words (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per measurement (default: %(default)s)")
+    parser.add_argument("--output", default="bench_results_responses.json", help="JSON report path (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, max(1, args.repeat))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for row in report["results"]:
+        print(f"{row['size_words']:>7} {row['route']:<12} {row['encoder']:<12} gzip={str(row['gzip']):<5} "
+              f"{row['bytes']:>10} B  p50 {row['p50_ms']:>8.3f} ms")
+    print(f"Wrote {len(report['results'])} results to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Benchmark the toshu_app HTTP API.
+
+Starts the real ToshuHTTPRequestHandler on a free local port, loads
+synthetic manuscripts of increasing size and hammers the main routes
+from a pool of concurrent clients. Results (p50/p95/p99 latency,
+throughput, peak RSS) are written to a JSON file so runs from
+different commits can be diffed.
+
+    python benchmarks/bench_server.py --sizes 1000 100000 --clients 4
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import toshu_app  # noqa: E402
+import toshu_cache  # noqa: E402
+import toshu_spelling  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+DEFAULT_SIZES = [1000, 10000, 100000, 500000]
+
+# (label, method, path); POST bodies are filled in per manuscript
+ROUTES: List[Tuple[str, str, str]] = [
+    ("document", "GET", "/api/document"),
+    ("stats", "GET", "/api/stats"),
+    ("grammar", "POST", "/api/grammar"),
+    ("references", "GET", "/api/references"),
+]
+
+WORDS = (
+    "the of and to in a is that for it as was with be by on not this are or "
+    "research data analysis results study participants learning cognitive load "
+    "digital method theory evidence framework significant model sample effect "
+    "however therefore although suggests indicates demonstrated observed measured"
+).split()
+
+
+def synthetic_manuscript(n_words: int, seed: int = 42) -> str:
+    """Build a deterministic manuscript of roughly ``n_words`` words.
+
+    Sentence lengths vary from short to very long so the grammar
+    heuristics (long sentences, passive voice) have work to do.
+    """
+    rng = random.Random(seed)
+    paragraphs: List[str] = []
+    sentences: List[str] = []
+    written = 0
+    while written < n_words:
+        length = min(rng.choice((6, 12, 18, 25, 40)), n_words - written)
+        words = [rng.choice(WORDS) for _ in range(length)]
+        if length > 4 and rng.random() < 0.2:
+            words[1:3] = ["was", "observed"]
+        words[0] = words[0].capitalize()
+        sentences.append(" ".join(words) + ".")
+        written += length
+        if len(sentences) >= rng.randint(3, 8):
+            paragraphs.append(" ".join(sentences))
+            sentences = []
+    if sentences:
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Peak resident set size of this process (server runs in-process)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str, body: Optional[bytes]) -> Tuple[int, int]:
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    resp = conn.getresponse()
+    payload = resp.read()
+    return resp.status, len(payload)
+
+
+def run_route(
+    port: int, method: str, path: str, body: Optional[bytes], clients: int, requests: int
+) -> Dict[str, Any]:
+    """Fire ``requests`` calls split across ``clients`` threads."""
+    latencies: List[float] = []
+    errors = [0]
+    received = [0]
+    lock = threading.Lock()
+    per_client = max(1, requests // clients)
+
+    def worker() -> None:
+        local: List[float] = []
+        local_errors = 0
+        local_bytes = 0
+        for _ in range(per_client):
+            # toshu_app speaks HTTP/1.0, so every request needs a fresh connection
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+            start = time.perf_counter()
+            try:
+                status, size = request(conn, method, path, body)
+                if status >= 400:
+                    local_errors += 1
+                local_bytes += size
+            except Exception:
+                local_errors += 1
+            finally:
+                conn.close()
+            local.append((time.perf_counter() - start) * 1000.0)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+            received[0] += local_bytes
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "bytes_received": received[0],
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+    }
+
+
+def isolate_data_dir() -> str:
+    """Point toshu_app's persistence at a temp dir so runs don't touch real data.
+
+    The analysis cache starts empty there, so cold-run numbers are not
+    served from a previous run's entries; the shipped dictionaries are
+    still read, but compiled dictionaries and user words go to the temp dir.
+    """
+    data_dir = tempfile.mkdtemp(prefix="toshu-bench-")
+    toshu_app.DATA_DIR = data_dir
+    toshu_app.DOCUMENT_PATH = os.path.join(data_dir, "document.txt")
+    toshu_app.REFS_PATH = os.path.join(data_dir, "references.json")
+    toshu_app.STICKY_PATH = os.path.join(data_dir, "sticky_notes.json")
+    toshu_app.PROFILE_DIR = os.path.join(data_dir, "profiles")
+    toshu_app.ANALYSIS_CACHE_DIR = os.path.join(data_dir, "analysis_cache")
+    toshu_app._analysis_cache = toshu_cache.AnalysisCache(toshu_app.ANALYSIS_CACHE_DIR)
+    toshu_spelling.COMPILED_DIR = os.path.join(data_dir, "spelling")
+    toshu_spelling.USER_DICTIONARY_PATH = os.path.join(data_dir, "user_dictionary.txt")
+    toshu_spelling.invalidate()
+    return data_dir
+
+
+def run_benchmark(sizes: List[int], clients: int, requests: int, routes: List[str]) -> Dict[str, Any]:
+    isolate_data_dir()
+    toshu_app.app_state["references"] = [
+        {"id": i, "text": f"Author {i} (20{i % 25:02d}). Synthetic reference {i}.", "added": ""}
+        for i in range(1, 51)
+    ]
+
+    httpd = toshu_app.make_server(port=0)
+    port = httpd.server_address[1]
+    server_thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    server_thread.start()
+
+    results: List[Dict[str, Any]] = []
+    try:
+        for size in sizes:
+            text = synthetic_manuscript(size)
+            doc_body = json.dumps({"content": text}).encode("utf-8")
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+            request(conn, "POST", "/api/document", doc_body)
+            conn.close()
+
+            for label, method, path in ROUTES:
+                if label not in routes:
+                    continue
+                body = json.dumps({"text": text}).encode("utf-8") if method == "POST" else None
+                print(f"  {size:>7} words  {label:<10} x{requests} ({clients} clients)", flush=True)
+                row = {"size_words": size, "route": label, "method": method, "path": path, "clients": clients}
+                row.update(run_route(port, method, path, body, clients, requests))
+                results.append(row)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sizes": sizes,
+            "clients": clients,
+            "requests_per_route": requests,
+        },
+        "peak_rss_kb": peak_rss_kb(),
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Toshu server API")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="manuscript sizes in words (default: %(default)s)")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients (default: %(default)s)")
+    parser.add_argument("--requests", type=int, default=40, help="requests per route and size (default: %(default)s)")
+    parser.add_argument("--routes", nargs="+", default=[r[0] for r in ROUTES],
+                        choices=[r[0] for r in ROUTES], help="routes to exercise")
+    parser.add_argument("--output", default="bench_results.json", help="JSON report path (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, max(1, args.clients), max(1, args.requests), args.routes)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output} (peak RSS {report['peak_rss_kb']} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Compare round-trip latency of the two API transports.
+
+"http" goes through a real socket to ToshuHTTPRequestHandler, as the
+React UI does in a browser. "bridge" calls toshu_bridge.Bridge the way
+pywebview does for the desktop window: arguments arrive JSON-decoded and
+the result is JSON-encoded on the way back, but there is no socket or
+HTTP parsing. Both sides run the same api_handler, so the difference is
+the transport.
+
+    python benchmarks/bench_transport.py --sizes 1000 100000 --requests 200
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import http.client
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_server import git_commit, isolate_data_dir, percentile, request, synthetic_manuscript  # noqa: E402
+import toshu_app  # noqa: E402
+import toshu_bridge  # noqa: E402
+
+DEFAULT_SIZES = [1000, 100000]
+
+# (label, method, path); the grammar body is filled in per manuscript
+ROUTES: List[Tuple[str, str, str]] = [
+    ("theme", "GET", "/api/theme"),
+    ("stats", "GET", "/api/stats"),
+    ("grammar", "POST", "/api/grammar"),
+    ("document", "GET", "/api/document"),
+]
+
+
+def time_calls(call: Callable[[], None], requests: int) -> Dict[str, Any]:
+    call()  # warm caches so both transports see the same server-side work
+    latencies: List[float] = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+    }
+
+
+def http_call(port: int, method: str, path: str, payload: Optional[Dict[str, Any]]) -> Callable[[], None]:
+    body = json.dumps(payload).encode("utf-8") if payload is not None else None
+
+    def call() -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        try:
+            status, _ = request(conn, method, path, body)
+        finally:
+            conn.close()
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} -> {status}")
+    return call
+
+
+def bridge_call(bridge: toshu_bridge.Bridge, method: str, path: str,
+                payload: Optional[Dict[str, Any]]) -> Callable[[], None]:
+    # pywebview serialises arguments from JS and the return value back to JS
+    wire = json.dumps([path, method, payload])
+
+    def call() -> None:
+        result = bridge.call(*json.loads(wire))
+        json.dumps(result)
+        if result["status"] >= 400:
+            raise RuntimeError(f"{method} {path} -> {result['status']}")
+    return call
+
+
+def run_benchmark(sizes: List[int], requests: int, routes: List[str]) -> Dict[str, Any]:
+    isolate_data_dir()
+    httpd = toshu_app.make_server(port=0)
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    bridge = toshu_bridge.Bridge(toshu_app.dispatch)
+
+    results: List[Dict[str, Any]] = []
+    try:
+        for size in sizes:
+            text = synthetic_manuscript(size)
+            toshu_app.set_document(text)
+            for label, method, path in ROUTES:
+                if label not in routes:
+                    continue
+                payload = {"text": text} if method == "POST" else None
+                for transport, make in (("http", lambda: http_call(port, method, path, payload)),
+                                        ("bridge", lambda: bridge_call(bridge, method, path, payload))):
+                    print(f"  {size:>7} words  {label:<10} {transport:<7} x{requests}", flush=True)
+                    row = {"size_words": size, "route": label, "transport": transport}
+                    row.update(time_calls(make(), requests))
+                    results.append(row)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sizes": sizes,
+            "requests_per_route": requests,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare HTTP and in-process bridge latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="manuscript sizes in words (default: %(default)s)")
+    parser.add_argument("--requests", type=int, default=200, help="calls per route, size and transport (default: %(default)s)")
+    parser.add_argument("--routes", nargs="+", default=[r[0] for r in ROUTES],
+                        choices=[r[0] for r in ROUTES], help="routes to exercise")
+    parser.add_argument("--output", default="bench_results_transport.json", help="JSON report path (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, max(1, args.requests), args.routes)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for row in report["results"]:
+        print(f"{row['size_words']:>7} {row['route']:<10} {row['transport']:<7} "
+              f"p50 {row['p50_ms']:>8.3f} ms  p95 {row['p95_ms']:>8.3f} ms")
+    print(f"Wrote {len(report['results'])} results to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,31 +7,16 @@ Fixed issues:
 - Reduced cognitive complexity by extracting helpers
 - Added type hints to satisfy Pylance
 - Checked for None on proc.stdin/proc.stdout before calling methods
+- Pipelines all requests through toshu_rpc.SidecarClient instead of
+  blocking on one readline() per call; no hardcoded project path
 """
-from typing import Any, Dict, List, Optional
-import subprocess
+from typing import Any, Dict, List
 import json
+import os
 
+from toshu_rpc import RpcError, SidecarClient
 
-def send_request(proc: subprocess.Popen, payload: str) -> None:
-    """Write payload to proc.stdin (safe: checks for None)."""
-    if proc.stdin is None:
-        raise RuntimeError("Process stdin is not available")
-    proc.stdin.write(payload + "\n")
-    proc.stdin.flush()
-
-
-def read_response(proc: subprocess.Popen) -> Optional[Dict[str, Any]]:
-    """Read one line from proc.stdout and decode JSON. Returns None if no line.
-
-    Defensive: checks proc.stdout for None (Pylance warning fix).
-    """
-    if proc.stdout is None:
-        raise RuntimeError("Process stdout is not available")
-    resp_line = proc.stdout.readline()
-    if not resp_line:
-        return None
-    return json.loads(resp_line)
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 
 
 def truncate_result(result: Any, max_len: int = 200) -> Any:
@@ -52,63 +37,32 @@ def truncate_result(result: Any, max_len: int = 200) -> Any:
 
 
 def test_rpc() -> None:
-    # Start sidecar
-    proc = subprocess.Popen(
-        ["python", "sidecar/sidecar.py"],
-        cwd=r"c:\Toshu",
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
-    )
-
     tests: List[Dict[str, Any]] = [
         {"method": "academize", "params": {"text": "this is really cool and great stuff"}, "name": "academize"},
         {"method": "build_preview", "params": {"text": "# Research Paper\n\nThis is **important**."}, "name": "build_preview"},
         {"method": "auto_ingest", "params": {}, "name": "auto_ingest"},
     ]
 
-    for i, test in enumerate(tests, 1):
-        # attach id
-        test["id"] = i
-        try:
-            req_json = json.dumps(test)
-            # Use .format() instead of f-string to satisfy Sonar rule
-            print("\n[Test {0}] Sending: {{name}}".format(i).replace("{name}", str(test.get("name"))))
-
-            # send
-            send_request(proc, req_json)
-
-            # read
-            resp = read_response(proc)
-            if resp is None:
-                print("  No response")
+    with SidecarClient(cwd=PROJECT_ROOT) as client:
+        # Pipeline every request up front; replies are matched by id
+        futures = []
+        for i, test in enumerate(tests, 1):
+            print("\n[Test {0}] Sending: {1}".format(i, test["name"]))
+            on_partial = lambda chunk, n=test["name"]: print("  [{0}] partial: {1}".format(n, json.dumps(chunk)[:120]))
+            futures.append(client.call_async(test["method"], test["params"], on_partial=on_partial))
+
+        for i, (test, future) in enumerate(zip(tests, futures), 1):
+            try:
+                result = future.result(timeout=120)
+            except RpcError as exc:
+                print("[Test {0}] {1} ERROR: {2}".format(i, test["name"], exc))
                 continue
-
-            if "error" in resp:
-                print("  ERROR: {}".format(resp["error"]))
+            except Exception as exc:  # pragma: no cover - surface runtime faults
+                print("[Test {0}] {1} Exception: {2}".format(i, test["name"], exc))
                 continue
-
-            if "result" in resp:
-                result = resp["result"]
-                truncated = truncate_result(result)
-                printed = json.dumps(truncated)
-                # keep output short
-                print("  OK: {}".format(printed[:300]))
-        except Exception as exc:  # pragma: no cover - surface runtime faults
-            print("  Exception: {}".format(exc))
-
-    # terminate process
-    try:
-        proc.terminate()
-        proc.wait(timeout=5)
-    except Exception:
-        # fallback to kill if terminate failed
-        try:
-            proc.kill()
-        except Exception:
-            pass
+            printed = json.dumps(truncate_result(result))
+            # keep output short
+            print("[Test {0}] {1} OK: {2}".format(i, test["name"], printed[:300]))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""OutlineIndex: patching the sections around an edit must give the same
+outline as scanning the whole document again, malformed markup included.
+
+    python -m pytest -q test_outline.py
+"""
+from typing import List, Tuple
+import random
+
+import toshu_outline
+import toshu_text
+
+PIECES = [
+    '<h1>A</h1>', '<h2>B c</h2>', '<h3 class="x">T</h3>', '<H2>up</H2>', '<h1 class="a\nb">',
+    '\n# one\n', '\n## two', '\n### ', '<h1>a b', '</h2>x', '<h4\n', '\t#', '#x', '# ', '\n#',
+    '<h1>', '</h1>', '<h2>', '</h2>', '</h3 >', '<p>', '</p>', '<h', 'h1>', '</', 'h2', '<', '>',
+    'h', '1', '2', '#', ' ', '\n', '\n\n', '\r\n', 'x\n#', 'word ', 'more words ',
+]
+
+
+def random_markup(rng: random.Random, pieces: int) -> str:
+    return ''.join(rng.choice(PIECES) for _ in range(pieces))
+
+
+def outline(index: toshu_outline.OutlineIndex) -> List[Tuple[int, str, int, int, int]]:
+    return [(s.level, s.title, s.start, s.end, s.words) for s in index.sections]
+
+
+def full_scan(raw: str) -> List[Tuple[int, str, int, int, int]]:
+    index = toshu_outline.OutlineIndex()
+    index.update(raw, 1)
+    return outline(index)
+
+
+def check_edits(seed: int) -> None:
+    rng = random.Random(seed)
+    old = random_markup(rng, rng.randint(1, 30))
+    index = toshu_outline.OutlineIndex()
+    index.update(old, 1)
+    for _ in range(3):
+        start = rng.randint(0, len(old))
+        end = rng.randint(start, min(len(old), start + 6))
+        new = old[:start] + random_markup(rng, rng.randint(0, 3)) + old[end:]
+        if new == old:
+            continue
+        index.update(new, index.revision + 1, toshu_text.changed_span(old, new))
+        assert outline(index) == full_scan(new), (seed, old, new)
+        old = new
+
+
+def test_patch_matches_full_scan() -> None:
+    for seed in range(5000):
+        check_edits(seed)
+
+
+def test_heading_attributes_stop_at_markdown_heading() -> None:
+    old = '<h2>B c</h2><h2>><h1\n# one\n\n## two>\n# one\n</h1>\n<H2>up</H2>'
+    new = old.replace('\n# one\n</h1>', '\n#e\n</h1>')
+    index = toshu_outline.OutlineIndex()
+    index.update(old, 1)
+    index.update(new, 2, toshu_text.changed_span(old, new))
+    assert outline(index) == full_scan(new)
+    assert [s.title for s in index.sections] == ['B c', 'one', 'two>', 'up']
+
+
+def test_broken_heading_merges_into_previous_section() -> None:
+    old = '<h1>Intro</h1> some words <h2>Body</h2> more words'
+    new = old.replace('<h2>', '<x2>')
+    index = toshu_outline.OutlineIndex()
+    index.update(old, 1)
+    index.update(new, 2, toshu_text.changed_span(old, new))
+    assert outline(index) == full_scan(new)
+    assert [s.title for s in index.sections] == ['Intro']
+
+
+if __name__ == '__main__':
+    test_patch_matches_full_scan()
+    test_heading_attributes_stop_at_markdown_heading()
+    test_broken_heading_merges_into_previous_section()
+    print('ok')
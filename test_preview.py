@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""render_inline: link URLs and code spans come through the emphasis
+passes untouched.
+
+    python -m pytest -q test_preview.py
+"""
+import toshu_preview
+
+
+def test_link_url_with_emphasis_characters() -> None:
+    assert (toshu_preview.render_inline("[docs](http://a.com/foo_bar_baz)")
+            == '<a href="http://a.com/foo_bar_baz">docs</a>')
+    assert (toshu_preview.render_inline("see [docs](http://a.com/a*b*c) and *this*")
+            == 'see <a href="http://a.com/a*b*c">docs</a> and <em>this</em>')
+
+
+def test_link_label_and_surrounding_emphasis() -> None:
+    assert (toshu_preview.render_inline("*see [**x** `a_b`](http://u/_x_) here*")
+            == '<em>see <a href="http://u/_x_"><strong>x</strong> <code>a_b</code></a> here</em>')
+
+
+def test_disallowed_scheme_renders_label() -> None:
+    assert toshu_preview.render_inline("[__x__](javascript:void)") == "<strong>x</strong>"
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""SidecarSupervisor against a small stand-in sidecar: calls reach a warm
+worker, and crashed, hung or killed workers are replaced.
+
+    python -m pytest -q test_supervisor.py
+"""
+from typing import Any, Callable
+import os
+import sys
+import time
+
+import pytest
+
+from toshu_rpc import RpcError
+from toshu_supervisor import SidecarSupervisor
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SIDECAR = '''
+import os, sys, time
+sys.path.insert(0, {root!r})
+from toshu_rpc import RpcServer
+
+server = RpcServer(workers=2)
+server.register("echo", lambda params: params)
+server.register("crash", lambda params: os._exit(1))
+server.register("hang", lambda params: time.sleep(60))
+server.serve()
+'''
+
+
+def wait_for(condition: Callable[[], Any], seconds: float = 20.0) -> Any:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError("condition not met in time")
+
+
+@pytest.fixture
+def supervisor(tmp_path):
+    script = tmp_path / "sidecar.py"
+    script.write_text(SIDECAR.format(root=PROJECT_ROOT))
+    pool = SidecarSupervisor(workers=2, command=[sys.executable, str(script)], cwd=str(tmp_path),
+                             call_timeout=10, heartbeat_interval=0.2, heartbeat_timeout=2)
+    with pool:
+        yield pool
+
+
+def restarts(pool: SidecarSupervisor) -> int:
+    return sum(w["restarts"] for w in pool.stats()["workers"])
+
+
+def all_alive(pool: SidecarSupervisor) -> bool:
+    return all(w["alive"] for w in pool.stats()["workers"])
+
+
+def test_calls_reach_warm_workers(supervisor: SidecarSupervisor) -> None:
+    futures = [supervisor.submit("echo", {"n": n}) for n in range(20)]
+    assert [f.result(timeout=20) for f in futures] == [{"n": n} for n in range(20)]
+    stats = supervisor.stats()
+    assert stats["methods"]["echo"]["samples"] == 20
+    assert sum(w["served"] for w in stats["workers"]) == 20
+
+
+def test_crashed_worker_is_replaced(supervisor: SidecarSupervisor) -> None:
+    with pytest.raises(RpcError):
+        supervisor.call("crash")
+    assert supervisor.call("echo", {"after": "crash"}) == {"after": "crash"}
+    wait_for(lambda: restarts(supervisor) >= 1 and all_alive(supervisor))
+
+
+def test_hung_call_times_out_and_worker_is_replaced(supervisor: SidecarSupervisor) -> None:
+    with pytest.raises(RpcError, match="timed out"):
+        supervisor.call("hang", timeout=0.5)
+    assert supervisor.call("echo", {"after": "hang"}) == {"after": "hang"}
+    wait_for(lambda: restarts(supervisor) >= 1 and all_alive(supervisor))
+
+
+def test_heartbeat_replaces_killed_idle_worker(supervisor: SidecarSupervisor) -> None:
+    pid = supervisor.stats()["workers"][0]["pid"]
+    supervisor._workers[0].client.proc.kill()
+    wait_for(lambda: supervisor.stats()["workers"][0]["pid"] not in (None, pid) and all_alive(supervisor))
+    assert restarts(supervisor) >= 1
+    assert supervisor.call("echo", {}) == {}
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""tokenize: sentence boundaries around abbreviations and initials.
+
+    python -m pytest -q test_text.py
+"""
+import toshu_text
+
+
+def sentences(text: str) -> int:
+    return toshu_text.tokenize(text).sentence_count
+
+
+def test_dotted_abbreviations_do_not_end_sentences() -> None:
+    assert sentences("We use tools, e.g. hammers and saws.") == 1
+    assert sentences("It works, i.e. it runs. Then it stops.") == 2
+    assert sentences("Tools (E.G. hammers) help.") == 1
+
+
+def test_single_word_abbreviations_and_initials() -> None:
+    assert sentences("See Fig. 2 and Smith et al. for more. Next one.") == 2
+    assert sentences("J. Smith wrote it. Then he left.") == 2
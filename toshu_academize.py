@@ -0,0 +1,174 @@
+"""Informal -> academic phrase substitution, batched.
+
+Rules live in a word-level trie built once. Matching walks the trie from
+each word of the text and keeps the longest phrase that starts there, so
+the cost grows with text length (times the longest phrase, a few words),
+not with the number of rules.
+
+Results are cached per paragraph by content digest. Re-running over a
+mostly unchanged document only rewrites the paragraphs that changed.
+
+Sidecar RPC handlers::
+
+    academize        {"text": "..."}                 -> {"text": "...", "changes": [...]}
+    academize_batch  {"paragraphs": ["...", ...]}    -> {"results": [...], "cached": 3}
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import re
+import threading
+
+CACHE_SIZE = 50000  # paragraphs; sized so a whole thesis stays resident
+
+DEFAULT_RULES: Dict[str, str] = {
+    "a lot of": "a considerable amount of",
+    "lots of": "numerous",
+    "a bit": "somewhat",
+    "kind of": "somewhat",
+    "sort of": "somewhat",
+    "really": "considerably",
+    "very": "highly",
+    "pretty much": "largely",
+    "cool": "noteworthy",
+    "great": "substantial",
+    "big": "substantial",
+    "huge": "considerable",
+    "stuff": "material",
+    "things": "factors",
+    "thing": "factor",
+    "get": "obtain",
+    "gets": "obtains",
+    "got": "obtained",
+    "show": "demonstrate",
+    "shows": "demonstrates",
+    "showed": "demonstrated",
+    "find out": "determine",
+    "found out": "determined",
+    "look at": "examine",
+    "looked at": "examined",
+    "talk about": "discuss",
+    "talks about": "discusses",
+    "figure out": "ascertain",
+    "come up with": "develop",
+    "point out": "indicate",
+    "pointed out": "indicated",
+    "go up": "increase",
+    "went up": "increased",
+    "go down": "decrease",
+    "went down": "decreased",
+    "also": "additionally",
+    "maybe": "perhaps",
+    "nowadays": "currently",
+    "anyway": "nevertheless",
+    "ok": "acceptable",
+    "okay": "acceptable",
+    "bad": "detrimental",
+    "good": "favourable",
+    "don't": "do not",
+    "doesn't": "does not",
+    "can't": "cannot",
+    "won't": "will not",
+    "isn't": "is not",
+    "aren't": "are not",
+    "it's": "it is",
+}
+
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_END = ""  # trie key marking "a phrase ends here"
+
+
+class PhraseTable:
+    def __init__(self, rules: Dict[str, str], cache_size: int = CACHE_SIZE) -> None:
+        self.trie: Dict[str, Any] = {}
+        self.max_words = 0
+        for phrase, replacement in rules.items():
+            words = phrase.lower().split()
+            node = self.trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[_END] = replacement
+            self.max_words = max(self.max_words, len(words))
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[bytes, Tuple[str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _matches(self, text: str) -> Iterable[Tuple[int, int, str]]:
+        """Yield non-overlapping (start, end, replacement), leftmost-longest."""
+        words = [(m.start(), m.end(), m.group().lower()) for m in _WORD.finditer(text)]
+        i, n = 0, len(words)
+        while i < n:
+            node = self.trie.get(words[i][2])
+            best: Optional[Tuple[int, str]] = None
+            j = i
+            while node is not None:
+                if _END in node:
+                    best = (j, node[_END])
+                j += 1
+                # Phrases only span plain whitespace, never punctuation
+                if j >= n or not text[words[j - 1][1]:words[j][0]].isspace():
+                    break
+                node = node.get(words[j][2])
+            if best is None:
+                i += 1
+                continue
+            last, replacement = best
+            yield words[i][0], words[last][1], replacement
+            i = last + 1
+
+    def rewrite(self, text: str) -> Tuple[str, List[Dict[str, Any]]]:
+        out: List[str] = []
+        changes: List[Dict[str, Any]] = []
+        pos = 0
+        for start, end, replacement in self._matches(text):
+            original = text[start:end]
+            out.append(text[pos:start])
+            out.append(_match_case(original, replacement))
+            changes.append({"offset": start, "from": original, "to": out[-1]})
+            pos = end
+        out.append(text[pos:])
+        return "".join(out), changes
+
+    def rewrite_cached(self, text: str) -> Tuple[str, List[Dict[str, Any]], bool]:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return hit[0], hit[1], True
+        result = self.rewrite(text)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result[0], result[1], False
+
+
+def _match_case(original: str, replacement: str) -> str:
+    if len(original) > 1 and original.isupper():
+        return replacement.upper()
+    if original[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+
+_table = PhraseTable(DEFAULT_RULES)
+
+
+def academize(params: Dict[str, Any]) -> Dict[str, Any]:
+    text, changes, _ = _table.rewrite_cached(params.get("text", ""))
+    return {"text": text, "changes": changes}
+
+
+def academize_batch(params: Dict[str, Any]) -> Dict[str, Any]:
+    results = []
+    cached = 0
+    for paragraph in params.get("paragraphs", []):
+        text, changes, hit = _table.rewrite_cached(paragraph)
+        cached += hit
+        results.append({"text": text, "changes": changes})
+    return {"results": results, "cached": cached}
@@ -1,14 +1,42 @@
+import functools
 import http.server
 import socketserver
 import threading
 import json
 import os
 import re
-import winsound
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from pathlib import Path
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, parse_qs, unquote
 from datetime import datetime
 
+import toshu_bridge
+import toshu_cache
+import toshu_citations
+import toshu_executor
+import toshu_flight
+import toshu_grammar
+import toshu_metrics
+import toshu_outline
+import toshu_pdf_pages
+import toshu_profiler
+import toshu_readability
+import toshu_spelling
+import toshu_text
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import winsound  # Windows only; /api/alarm reports 501 elsewhere
+except ImportError:
+    winsound = None
+
 # Config
 PORT = 5174
 BUILD_DIR = os.path.join(os.path.dirname(__file__), 'web_ui', 'build')
@@ -16,13 +44,32 @@ DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 DOCUMENT_PATH = os.path.join(DATA_DIR, 'document.txt')
 REFS_PATH = os.path.join(DATA_DIR, 'references.json')
 STICKY_PATH = os.path.join(DATA_DIR, 'sticky_notes.json')
+STICKY_FLUSH_DELAY = 1.0  # seconds; rapid note drags are coalesced into one write
+METRICS_LOG_PATH = os.path.join(os.path.dirname(__file__), 'toshu_server.log')
+METRICS_LOG_INTERVAL = float(os.environ.get('TOSHU_METRICS_LOG_INTERVAL', '0'))  # seconds, 0 = off
+PROFILE_DIR = os.path.join(DATA_DIR, 'profiles')
+ANALYSIS_CACHE_DIR = os.path.join(DATA_DIR, 'analysis_cache')
+ANALYSIS_VERSION = 1  # bump when the counts or grammar checks below change
+GRAMMAR_REGION_CHARS = 4000  # most raw text checked in-line by a budgeted grammar request
+PDF_LIBRARY = os.path.join(os.path.dirname(__file__), 'pdf_library')
+MAX_BODY_BYTES = int(float(os.environ.get('TOSHU_MAX_BODY_MB', '64')) * 1024 * 1024)
+MAX_UPLOAD_BYTES = int(float(os.environ.get('TOSHU_MAX_UPLOAD_MB', '512')) * 1024 * 1024)
+READ_CHUNK = 64 * 1024
+GZIP_MIN_BYTES = int(os.environ.get('TOSHU_GZIP_MIN_BYTES', '1024'))  # smaller bodies go out as-is
+GZIP_LEVEL = 5
+WRITE_CHUNK = 256 * 1024
 
 # Ensure data directories exist
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Slow-request profiling: TOSHU_PROFILE=1 or --profile
+if os.environ.get('TOSHU_PROFILE') == '1':
+    toshu_profiler.enable(PROFILE_DIR)
+
 # Global state
 app_state = {
     'document_content': '',
+    'document_revision': 0,
     'theme': 'light',
     'custom_theme': {
         'primaryColor': '#E53E3E',
@@ -31,21 +78,47 @@ app_state = {
         'textColor': '#1F2937'
     },
     'references': [],
+    'references_revision': 0,
     'sticky_notes': []
 }
 
+# Guards app_state against the sticky-note flush timer thread
+state_lock = threading.RLock()
+_sticky_flush_timer = None
+
+# Token stream of the current document, rebuilt once per revision
+_token_cache = toshu_text.StreamCache()
+
+# Analysis results: in memory for the current revision, on disk by content
+_analysis_cache = toshu_cache.AnalysisCache(ANALYSIS_CACHE_DIR)
+_analyses = {}  # analyser -> (revision, result)
+_document_digest = {'revision': None, 'digest': None}
+_flights = toshu_flight.SingleFlight()
+_last_edit = {'revision': 0, 'span': None}  # raw offsets changed by the latest revision
+_outline = toshu_outline.OutlineIndex()  # headings and sections, patched on every save
+_reference_index = {'revision': None, 'index': None}
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix='toshu-analysis')
+_grammar_pass = {'revision': None, 'future': None}  # the queued or running full grammar pass
+
+# Uploaded PDFs are ingested one at a time, in arrival order
+_ingest = ThreadPoolExecutor(max_workers=1, thread_name_prefix='toshu-ingest')
+_uploads = {}  # file name -> 'queued' | 'ingested' | 'failed: ...'
+
 # Load saved data
 def load_data():
     global app_state
     if os.path.exists(DOCUMENT_PATH):
         with open(DOCUMENT_PATH, 'r', encoding='utf-8') as f:
-            app_state['document_content'] = f.read()
+            set_document(f.read())
     if os.path.exists(REFS_PATH):
         with open(REFS_PATH, 'r', encoding='utf-8') as f:
             try:
-                app_state['references'] = json.load(f)
+                references = json.load(f)
             except:
-                app_state['references'] = []
+                references = []
+        with state_lock:
+            app_state['references'] = references
+            app_state['references_revision'] += 1
     if os.path.exists(STICKY_PATH):
         with open(STICKY_PATH, 'r', encoding='utf-8') as f:
             try:
@@ -53,123 +126,601 @@ def load_data():
             except:
                 app_state['sticky_notes'] = []
 
+def write_data_file(path, text):
+    """Write one data file, recording duration and bytes written
+
+    Goes through a temp file and a rename, so a crash never leaves a
+    half-written file. Callers hold state_lock.
+    """
+    start = time.perf_counter()
+    data = text.encode('utf-8')
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    toshu_metrics.observe_write(os.path.basename(path), time.perf_counter() - start, len(data))
+
 def save_data():
-    with open(DOCUMENT_PATH, 'w', encoding='utf-8') as f:
-        f.write(app_state['document_content'])
-    with open(REFS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(app_state['references'], f, ensure_ascii=False, indent=2)
-    with open(STICKY_PATH, 'w', encoding='utf-8') as f:
-        json.dump(app_state['sticky_notes'], f, ensure_ascii=False, indent=2)
+    with state_lock:
+        write_data_file(DOCUMENT_PATH, app_state['document_content'])
+        write_data_file(REFS_PATH, json.dumps(app_state['references'], ensure_ascii=False, indent=2))
+
+def save_sticky_notes():
+    write_data_file(STICKY_PATH, json.dumps(app_state['sticky_notes'], ensure_ascii=False, indent=2))
+
+def flush_sticky_notes():
+    """Write sticky notes now, cancelling any scheduled flush"""
+    global _sticky_flush_timer
+    with state_lock:
+        if _sticky_flush_timer is not None:
+            _sticky_flush_timer.cancel()
+            _sticky_flush_timer = None
+        save_sticky_notes()
+
+def schedule_sticky_flush():
+    """Batch position updates: the first one arms a timer, later ones ride along"""
+    global _sticky_flush_timer
+    with state_lock:
+        if _sticky_flush_timer is None:
+            _sticky_flush_timer = threading.Timer(STICKY_FLUSH_DELAY, flush_sticky_notes)
+            _sticky_flush_timer.daemon = True
+            _sticky_flush_timer.start()
+
+# Sticky notes
+STICKY_FIELDS = ('content', 'color', 'x', 'y')
+POSITION_FIELDS = {'x', 'y'}
+
+def find_sticky_note(note_id):
+    for note in app_state['sticky_notes']:
+        if note.get('id') == note_id:
+            return note
+    return None
+
+def create_sticky_note(data):
+    with state_lock:
+        notes = app_state['sticky_notes']
+        note = {k: data[k] for k in STICKY_FIELDS if k in data}
+        note['id'] = max((n.get('id', 0) for n in notes), default=0) + 1
+        note['version'] = 1
+        notes.append(note)
+        flush_sticky_notes()
+        return note
+
+def patch_sticky_note(note_id, data):
+    """Apply a partial update; position-only patches are flushed in batches"""
+    with state_lock:
+        note = find_sticky_note(note_id)
+        if note is None:
+            return {'error': 'Note not found'}, 404
+        version = data.get('version')
+        if version is not None and version != note.get('version', 0):
+            return {'error': 'Version conflict', 'note': note}, 409
+        changes = {k: data[k] for k in STICKY_FIELDS if k in data and note.get(k) != data[k]}
+        if not changes:
+            return {'status': 'unchanged', 'id': note_id, 'version': note.get('version', 0)}
+        note.update(changes)
+        note['version'] = note.get('version', 0) + 1
+        if changes.keys() <= POSITION_FIELDS:
+            schedule_sticky_flush()
+        else:
+            flush_sticky_notes()
+        return {'status': 'updated', 'id': note_id, 'version': note['version']}
+
+def delete_sticky_note(note_id):
+    with state_lock:
+        notes = app_state['sticky_notes']
+        remaining = [n for n in notes if n.get('id') != note_id]
+        if len(remaining) == len(notes):
+            return {'error': 'Note not found'}, 404
+        app_state['sticky_notes'] = remaining
+        flush_sticky_notes()
+        return {'status': 'deleted'}
+
+# References
+def add_reference(text):
+    with state_lock:
+        references = app_state['references']
+        references.append({
+            'id': max((r.get('id', 0) for r in references), default=0) + 1,
+            'text': text,
+            'added': datetime.now().isoformat()
+        })
+        app_state['references_revision'] += 1
+        save_data()
+        return len(references)
+
+def delete_reference(ref_id):
+    with state_lock:
+        app_state['references'] = [r for r in app_state['references'] if r.get('id') != ref_id]
+        app_state['references_revision'] += 1
+        save_data()
 
 # API handlers
+def set_document(content):
+    with state_lock:
+        old = app_state['document_content']
+        if content != old:
+            app_state['document_content'] = content
+            app_state['document_revision'] += 1
+            _last_edit['revision'] = app_state['document_revision']
+            _last_edit['span'] = toshu_text.changed_span(old, content) if old else None
+            _outline.update(content, _last_edit['revision'], _last_edit['span'])
+
+def document_tokens():
+    with state_lock:
+        revision = app_state['document_revision']
+        raw = app_state['document_content']
+    stream, hit = _token_cache.get(revision, raw)
+    toshu_metrics.observe_cache('tokens', hit)
+    return stream
+
+def cached_analysis(analyser, version, compute, parallel=None):
+    """compute(token stream) for the current document, memoised per revision and on disk
+
+    The disk cache is keyed by the raw content, so a hit never tokenizes.
+    Concurrent calls for the same content share one computation; a call
+    overtaken by a newer revision answers with the newer revision's result.
+    Large documents go to parallel(plain text) instead when it is given.
+    """
+    while True:
+        with state_lock:
+            revision = app_state['document_revision']
+            raw = app_state['document_content']
+            memo = _analyses.get(analyser)
+            if memo is not None and memo[0] == revision:
+                return memo[1]
+            digest = _document_digest['digest'] if _document_digest['revision'] == revision else None
+        if digest is None:
+            digest = toshu_cache.text_digest(raw)
+            with state_lock:
+                if _document_digest['revision'] is None or _document_digest['revision'] < revision:
+                    _document_digest['revision'], _document_digest['digest'] = revision, digest
+        try:
+            result = _flights.run(analyser, digest, revision,
+                                  lambda flight: run_analysis(flight, analyser, version, compute, parallel,
+                                                              digest, revision, raw))
+        except toshu_flight.Superseded:
+            continue
+        with state_lock:
+            memo = _analyses.get(analyser)
+            if memo is None or memo[0] < revision:
+                _analyses[analyser] = (revision, result)
+        return result
+
+def run_analysis(flight, analyser, version, compute, parallel, digest, revision, raw):
+    version = f'{toshu_text.VERSION}.{version}'
+    result = _analysis_cache.get(analyser, version, digest)
+    if result is None and parallel is not None and toshu_executor.should_parallelize(raw):
+        flight.check()
+        result = parallel(toshu_text.plain_text(raw))
+        _analysis_cache.put(analyser, version, digest, result)
+    elif result is None:
+        stream, hit = _token_cache.get(revision, raw, check=flight.check)
+        toshu_metrics.observe_cache('tokens', hit)
+        flight.check()
+        result = compute(stream)
+        # Content-addressed, so still worth keeping if the text comes back
+        _analysis_cache.put(analyser, version, digest, result)
+    return result
+
+def parallel_readability(text):
+    return toshu_readability.merge(toshu_executor.map_chunks(text, toshu_readability.analyse_text))
+
+def get_readability():
+    return cached_analysis('readability', toshu_readability.VERSION, toshu_readability.analyse,
+                           parallel_readability)
+
+def parallel_counts(text):
+    return toshu_text.merge_counts(toshu_executor.map_chunks(text, toshu_text.count_text))
+
 def get_stats():
-    raw = app_state['document_content']
-    # strip HTML tags if content contains formatted HTML
-    content = re.sub(r'<[^>]+>', '', raw)
-    words = len(content.split()) if content.strip() else 0
-    chars = len(content)
+    counts = cached_analysis('counts', ANALYSIS_VERSION, toshu_text.counts, parallel_counts)
+    return stats_response(counts, get_readability())
+
+def stats_response(counts, readability):
+    words = counts['words']
     pages = max(1, round(words / 250, 1)) if words > 0 else 0
     reading_time_mins = max(1, round(words / 200)) if words > 0 else 0
     
     return {
         'wordCount': words,
-        'characterCount': chars,
+        'characterCount': counts['characters'],
+        'characterCountNoSpaces': counts['charactersNoSpaces'],
         'pageCount': pages,
         'readingTime': f'{reading_time_mins} min',
+        'sentenceCount': counts['sentences'],
+        'paragraphCount': counts['paragraphs'],
+        'fleschReadingEase': readability['fleschReadingEase'],
+        'fleschKincaidGrade': readability['fleschKincaidGrade'],
+        'gunningFog': readability['gunningFog'],
+        'lexicalDensity': readability['lexicalDensity'],
         'lastModified': datetime.now().isoformat()
     }
 
+def get_reference_index():
+    """toshu_citations.ReferenceIndex over the References entries, rebuilt when they change"""
+    with state_lock:
+        revision = app_state['references_revision']
+        if _reference_index['revision'] != revision:
+            _reference_index['index'] = toshu_citations.ReferenceIndex(app_state['references'])
+            _reference_index['revision'] = revision
+        return _reference_index['index']
+
+def get_citations():
+    """In-text citations matched against the References entries
+
+    Extraction follows the document (per revision, per paragraph); the
+    reference index follows the References list, so changing either one
+    leaves the other's work cached.
+    """
+    with state_lock:
+        revision = app_state['document_revision']
+    extracted = cached_analysis('citations', toshu_citations.VERSION, toshu_citations.extract)
+    result = toshu_citations.match(extracted, get_reference_index())
+    result['revision'] = revision
+    return result
+
+def parallel_grammar(text):
+    partials = toshu_executor.map_chunks(text, functools.partial(toshu_grammar.scan_text,
+                                                                 spelling=toshu_spelling.fingerprint()))
+    return toshu_grammar.issues(toshu_grammar.merge(partials, renumber=True))
+
+def grammar_version():
+    return f'{ANALYSIS_VERSION}.{toshu_spelling.fingerprint()}'
+
 def get_grammar_check():
-    raw = app_state['document_content']
-    content = re.sub(r'<[^>]+>', '', raw)
-    issues = []
-    
-    # Simple heuristic checks
-    if len(content.split()) < 10:
-        return issues  # Skip checks for very short text
-    
-    # Check for long sentences
-    sentences = content.split('.')
-    for i, sentence in enumerate(sentences):
-        words_in_sentence = len(sentence.split())
-        if words_in_sentence > 30:
-            issues.append({
-                'id': str(i),
-                'text': sentence.strip()[:50] + '...' if len(sentence) > 50 else sentence.strip(),
-                'suggestion': 'Consider breaking this sentence into shorter ones',
-                'type': 'style',
-                'severity': 'warning'
-            })
-    
-    # Check for multiple spaces
-    if re.search(r'  {2,}', content):
-        issues.append({
-            'id': 'spacing',
-            'text': 'Multiple spaces detected',
-            'suggestion': 'Remove extra spaces between words',
-            'type': 'formatting',
-            'severity': 'info'
-        })
-    
-    # Check for passive voice
-    passive_matches = re.findall(r'\bwas\s+\w+ed\b', content)
-    if len(passive_matches) > 3:
-        issues.append({
-            'id': 'passive',
-            'text': f'Passive voice detected {len(passive_matches)} times',
-            'suggestion': 'Consider using active voice for more engaging writing',
-            'type': 'style',
-            'severity': 'warning'
-        })
-    
-    return issues[:5]  # Return top 5
+    return cached_analysis('grammar', grammar_version(), toshu_grammar.check, parallel_grammar)
+
+def get_grammar_within(max_ms, visible=None):
+    """Grammar issues within a latency budget
+
+    The visible range (raw offsets) or else the last edit is checked first;
+    the full pass then gets whatever budget is left and keeps running in
+    the background if it needs more. Incomplete answers carry the revision
+    to poll with GET /api/grammar?revision=N.
+    """
+    deadline = time.perf_counter() + max(0.0, max_ms) / 1000.0
+    with state_lock:
+        revision = app_state['document_revision']
+        raw = app_state['document_content']
+        memo = _analyses.get('grammar')
+        span = _last_edit['span'] if _last_edit['revision'] == revision else None
+    if memo is not None and memo[0] == revision:
+        return {'issues': memo[1], 'complete': True, 'revision': revision}
+
+    if visible and len(visible) == 2:
+        span = (max(0, int(visible[0])), min(len(raw), int(visible[1])))
+    elif span is None:
+        span = (0, min(len(raw), GRAMMAR_REGION_CHARS))
+    # A paste or replace-all changes everything; only its start is checked now
+    start = span[0]
+    end = min(span[1], start + GRAMMAR_REGION_CHARS)
+    region = toshu_grammar.check_region(raw, start, end, GRAMMAR_REGION_CHARS // 2)
+
+    future = grammar_pass(revision)
+    try:
+        issues = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+    except FutureTimeout:
+        return {'issues': region, 'complete': False, 'revision': revision}
+    with state_lock:
+        memo = _analyses.get('grammar')
+    if memo is not None and memo[0] >= revision:
+        return {'issues': issues, 'complete': True, 'revision': memo[0]}
+    return {'issues': region, 'complete': False, 'revision': revision}
+
+def grammar_pass(revision):
+    """Future for the full-document pass, shared by every caller at ``revision``
+
+    A pass queued for an older revision is superseded by the new one in
+    _flights and then joins it, so at most one full check does real work.
+    """
+    with state_lock:
+        future = _grammar_pass['future']
+        if future is None or future.done() or _grammar_pass['revision'] < revision:
+            future = _background.submit(get_grammar_check)
+            _grammar_pass['revision'], _grammar_pass['future'] = revision, future
+        return future
+
+def get_grammar_result(revision):
+    """Full-document issues once the background pass for ``revision`` (or later) is done"""
+    with state_lock:
+        memo = _analyses.get('grammar')
+        current = app_state['document_revision']
+    if memo is not None and memo[0] >= revision:
+        return {'issues': memo[1], 'complete': True, 'revision': memo[0]}
+    grammar_pass(current)
+    return {'complete': False, 'revision': current}, 202
+
+def get_outline():
+    with state_lock:
+        return {'revision': app_state['document_revision'], 'sections': _outline.entries()}
+
+def find_section(which):
+    """(outline entry, raw content) for a section index, or 'edited' for the
+    section holding the latest edit; None when there is no such section"""
+    with state_lock:
+        revision = app_state['document_revision']
+        if which == 'edited':
+            span = _last_edit['span'] if _last_edit['revision'] == revision else None
+            index = _outline.find(span[0]) if span else 0
+        else:
+            index = int(which)
+        if not 0 <= index < len(_outline.sections):
+            return None
+        section = _outline.sections[index]
+        entry = _outline.entries()[index]
+        entry['revision'] = revision
+        return entry, app_state['document_content'][section.start:section.end]
+
+def section_analyses(raw, analysers):
+    """{analyser: compute(stream)} for part of the document
+
+    Shares the content-addressed disk cache with whole-document results
+    and tokenizes at most once.
+    """
+    digest = toshu_cache.text_digest(raw)
+    stream = None
+    results = {}
+    for analyser, version, compute in analysers:
+        version = f'{toshu_text.VERSION}.{version}'
+        result = _analysis_cache.get(analyser, version, digest)
+        if result is None:
+            if stream is None:
+                stream = toshu_text.tokenize(toshu_text.plain_text(raw))
+            result = compute(stream)
+            _analysis_cache.put(analyser, version, digest, result)
+        results[analyser] = result
+    return results
+
+def get_section_stats(which):
+    found = find_section(which)
+    if found is None:
+        return {'error': 'No such section'}, 404
+    entry, raw = found
+    results = section_analyses(raw, [('counts', ANALYSIS_VERSION, toshu_text.counts),
+                                     ('readability', toshu_readability.VERSION, toshu_readability.analyse)])
+    stats = stats_response(results['counts'], results['readability'])
+    stats['section'] = entry
+    return stats
+
+def get_section_grammar(which):
+    found = find_section(which)
+    if found is None:
+        return {'error': 'No such section'}, 404
+    entry, raw = found
+    issues = section_analyses(raw, [('grammar', grammar_version(), toshu_grammar.check)])['grammar']
+    return {'issues': issues, 'complete': True, 'revision': entry['revision'], 'section': entry}
+
+def get_user_dictionary():
+    spell = toshu_spelling.checker()
+    return {
+        'words': sorted(spell.user_words),
+        'dictionaries': [os.path.basename(d.path) for d in spell.dictionaries],
+        'dictionaryWords': sum(len(d) for d in spell.dictionaries),
+    }
+
+def set_user_dictionary(words):
+    """Replace the user dictionary; grammar results are rechecked against it"""
+    toshu_spelling.set_user_words(words)
+    with state_lock:
+        _analyses.pop('grammar', None)
+    return get_user_dictionary()
+
+# PDF uploads
+class BodyTooLarge(Exception):
+    pass
+
+_UNSAFE_NAME = re.compile(r'[^\w .()-]+')
+
+def upload_target(name):
+    """Free path in PDF_LIBRARY for an uploaded file called ``name``"""
+    stem = _UNSAFE_NAME.sub('_', os.path.basename(name or '')).strip(' .') or 'upload'
+    if stem.lower().endswith('.pdf'):
+        stem = stem[:-4]
+    os.makedirs(PDF_LIBRARY, exist_ok=True)
+    candidate = os.path.join(PDF_LIBRARY, stem + '.pdf')
+    n = 1
+    while os.path.exists(candidate):
+        candidate = os.path.join(PDF_LIBRARY, f'{stem}-{n}.pdf')
+        n += 1
+    return candidate
+
+def save_pdf_upload(name, chunks):
+    """Stream ``chunks`` to PDF_LIBRARY; returns the final path or None if not a PDF"""
+    path = upload_target(name)
+    tmp = path + '.part'
+    size = 0
+    try:
+        with open(tmp, 'wb') as f:
+            for chunk in chunks:
+                if size == 0 and not chunk.startswith(b'%PDF-'):
+                    raise ValueError('not a PDF')
+                f.write(chunk)
+                size += len(chunk)
+        if size == 0:
+            raise ValueError('empty upload')
+        # The final name only appears once the file is complete
+        os.replace(tmp, path)
+    except ValueError:
+        os.remove(tmp)
+        return None
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+def ingest_pdf(path):
+    name = os.path.basename(path)
+    try:
+        doc = toshu_pdf_pages.open_pdf(path)
+        try:
+            for _ in doc.pages():
+                pass
+        finally:
+            doc.close()
+        _uploads[name] = 'ingested'
+    except Exception as e:
+        _uploads[name] = f'failed: {e}'
+
+def queue_pdf_ingest(path):
+    _uploads[os.path.basename(path)] = 'queued'
+    _ingest.submit(ingest_pdf, path)
+
+# Responses
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+def encode_json(response):
+    """JSON body: one bytes object from orjson, or UTF-8 chunks from the stdlib encoder"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(response)
+        except TypeError:
+            pass  # e.g. non-string keys; the stdlib encoder copes
+    return _json_chunks(response)
+
+def _json_chunks(response):
+    pending, size = [], 0
+    for piece in _json_encoder.iterencode(response):
+        if len(piece) >= WRITE_CHUNK:
+            # A whole manuscript arrives as one piece; encode it a slice at a time
+            if pending:
+                yield ''.join(pending).encode('utf-8')
+                pending, size = [], 0
+            for i in range(0, len(piece), WRITE_CHUNK):
+                yield piece[i:i + WRITE_CHUNK].encode('utf-8')
+            continue
+        pending.append(piece)
+        size += len(piece)
+        if size >= WRITE_CHUNK:
+            yield ''.join(pending).encode('utf-8')
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending).encode('utf-8')
+
+def load_body(body):
+    """Request payload: JSON text over HTTP, already decoded over the desktop bridge"""
+    return json.loads(body) if isinstance(body, (str, bytes, bytearray)) else body
 
 def api_handler(path, method, body):
-    """Handle API requests"""
+    """Handle API requests
+
+    Shared by both transports: the HTTP handler passes the raw body,
+    toshu_bridge passes the decoded payload. Returns a JSON-serialisable
+    object, (object, status), or (raw body, status, content type) for
+    non-JSON responses.
+    """
     
-    if path == '/api/document' and method == 'GET':
+    if path == '/api/metrics' and method == 'GET':
+        return toshu_metrics.render(), 200, 'text/plain; version=0.0.4; charset=utf-8'
+
+    elif path == '/api/profiles' and method == 'GET':
+        return {'enabled': toshu_profiler.ENABLED,
+                'thresholdMs': toshu_profiler.THRESHOLD_MS,
+                'profiles': toshu_profiler.list_profiles()}
+
+    elif path.startswith('/api/profiles/') and method == 'GET':
+        url = urlparse(path)
+        profile_path = toshu_profiler.profile_path(url.path.split('/')[-1])
+        if profile_path is None:
+            return {'error': 'Profile not found'}, 404
+        if parse_qs(url.query).get('format') == ['text']:
+            return toshu_profiler.summary(profile_path), 200, 'text/plain; charset=utf-8'
+        with open(profile_path, 'rb') as f:
+            return f.read(), 200, 'application/octet-stream'
+
+    elif path.split('?', 1)[0] == '/api/document' and method == 'GET':
+        with state_lock:
+            revision = app_state['document_revision']
+            content = app_state['document_content']
+        # ?revision=N: skip resending a manuscript the client already has
+        known = parse_qs(urlparse(path).query).get('revision')
+        if known and known[0] == str(revision):
+            return {'unchanged': True, 'revision': revision}
         return {
             'title': 'Document',
-            'content': app_state['document_content']
+            'content': content,
+            'revision': revision
         }
     
     elif path == '/api/document' and method == 'POST':
         try:
-            data = json.loads(body)
-            app_state['document_content'] = data.get('content', '')
-            save_data()
+            data = load_body(body)
+            with state_lock:
+                set_document(data.get('content', ''))
+                save_data()
             return {'status': 'saved'}
         except:
             return {'error': 'Invalid request'}, 400
     
-    elif path == '/api/stats' and method == 'GET':
+    elif path.split('?', 1)[0] == '/api/stats' and method == 'GET':
+        section = parse_qs(urlparse(path).query).get('section')
+        if section:
+            try:
+                return get_section_stats(section[0])
+            except ValueError:
+                return {'error': 'section must be an index or "edited"'}, 400
         return get_stats()
     
+    elif path == '/api/outline' and method == 'GET':
+        return get_outline()
+    
+    elif path == '/api/readability' and method == 'GET':
+        return get_readability()
+    
+    elif path == '/api/citations' and method == 'GET':
+        return get_citations()
+    
     elif path == '/api/grammar' and method == 'POST':
         try:
-            data = json.loads(body)
+            data = load_body(body)
             content = data.get('text', '')
             if content:
-                app_state['document_content'] = content
+                set_document(content)
+            if data.get('section') is not None:
+                return get_section_grammar(data['section'])
+            if data.get('max_ms') is not None:
+                return get_grammar_within(float(data['max_ms']), data.get('visible'))
             return {'issues': get_grammar_check()}
         except:
             return {'issues': []}
     
+    elif path.startswith('/api/grammar?') and method == 'GET':
+        try:
+            revision = int(parse_qs(urlparse(path).query)['revision'][0])
+        except (KeyError, ValueError):
+            return {'error': 'revision is required'}, 400
+        return get_grammar_result(revision)
+    
+    elif path == '/api/dictionary' and method == 'GET':
+        return get_user_dictionary()
+    
+    elif path == '/api/dictionary' and method == 'POST':
+        try:
+            word = load_body(body).get('word', '').strip()
+        except:
+            return {'error': 'Invalid request'}, 400
+        if not word or len(word.split()) != 1:
+            return {'error': 'A single word is required'}, 400
+        return set_user_dictionary(toshu_spelling.user_words() + [word])
+    
+    elif path.startswith('/api/dictionary/') and method == 'DELETE':
+        word = unquote(path[len('/api/dictionary/'):]).lower()
+        return set_user_dictionary([w for w in toshu_spelling.user_words() if w != word])
+    
+    elif path == '/api/pdf-uploads' and method == 'GET':
+        return {'uploads': dict(_uploads)}
+    
     elif path == '/api/references' and method == 'GET':
-        return {'references': app_state['references']}
+        with state_lock:
+            return {'references': list(app_state['references'])}
     
     elif path == '/api/references' and method == 'POST':
         try:
-            data = json.loads(body)
+            data = load_body(body)
             text = data.get('text', '')
             if text:
-                app_state['references'].append({
-                    'id': len(app_state['references']) + 1,
-                    'text': text,
-                    'added': datetime.now().isoformat()
-                })
-                save_data()
-                return {'status': 'added', 'count': len(app_state['references'])}
+                return {'status': 'added', 'count': add_reference(text)}
             return {'error': 'No text provided'}, 400
         except:
             return {'error': 'Invalid request'}, 400
@@ -177,8 +728,7 @@ def api_handler(path, method, body):
     elif path.startswith('/api/references/') and method == 'DELETE':
         try:
             ref_id = int(path.split('/')[-1])
-            app_state['references'] = [r for r in app_state['references'] if r.get('id') != ref_id]
-            save_data()
+            delete_reference(ref_id)
             return {'status': 'deleted'}
         except:
             return {'error': 'Invalid id'}, 400
@@ -188,7 +738,7 @@ def api_handler(path, method, body):
     
     elif path == '/api/theme' and method == 'POST':
         try:
-            data = json.loads(body)
+            data = load_body(body)
             app_state['theme'] = data.get('theme', 'light')
             return {'status': 'updated', 'theme': app_state['theme']}
         except:
@@ -199,7 +749,7 @@ def api_handler(path, method, body):
     
     elif path == '/api/custom-theme' and method == 'POST':
         try:
-            data = json.loads(body)
+            data = load_body(body)
             app_state['custom_theme'].update(data)
             return {'status': 'updated', 'theme': app_state['custom_theme']}
         except:
@@ -210,22 +760,51 @@ def api_handler(path, method, body):
 
     elif path == '/api/sticky-notes' and method == 'POST':
         try:
-            data = json.loads(body)
+            data = load_body(body)
             notes = data.get('notes')
             if isinstance(notes, list):
-                app_state['sticky_notes'] = notes
-                save_data()
+                with state_lock:
+                    app_state['sticky_notes'] = notes
+                    flush_sticky_notes()
                 return {'status': 'saved', 'count': len(notes)}
             else:
                 return {'error': 'Invalid notes format'}, 400
         except Exception:
             return {'error': 'Invalid request'}, 400
 
+    elif path == '/api/sticky-notes/create' and method == 'POST':
+        try:
+            data = load_body(body) if body else {}
+            if not isinstance(data, dict):
+                return {'error': 'Expected a JSON object'}, 400
+            return {'status': 'created', 'note': create_sticky_note(data)}
+        except Exception:
+            return {'error': 'Invalid request'}, 400
+
+    elif path.startswith('/api/sticky-notes/') and method == 'PATCH':
+        try:
+            note_id = int(path.split('/')[-1])
+            data = load_body(body)
+        except Exception:
+            return {'error': 'Invalid request'}, 400
+        if not isinstance(data, dict):
+            return {'error': 'Expected a JSON object'}, 400
+        return patch_sticky_note(note_id, data)
+
+    elif path.startswith('/api/sticky-notes/') and method == 'DELETE':
+        try:
+            note_id = int(path.split('/')[-1])
+        except Exception:
+            return {'error': 'Invalid id'}, 400
+        return delete_sticky_note(note_id)
+
     elif path == '/api/alarm' and method == 'POST':
         try:
-            data = json.loads(body)
+            data = load_body(body)
             duration = data.get('duration', 500)
             frequency = data.get('frequency', 1000)
+            if winsound is None:
+                return {'error': 'Alarm sound is only available on Windows'}, 501
             # Beep 3 times with short duration
             for _ in range(3):
                 winsound.Beep(frequency, duration)
@@ -235,70 +814,205 @@ def api_handler(path, method, body):
     
     return {'error': 'Not found'}, 404
 
+def dispatch(path, method, body):
+    """Run api_handler and normalise its result to (response, status, content type)"""
+    content_type = 'application/json'
+    try:
+        result = api_handler(path, method, body)
+        if isinstance(result, tuple) and len(result) == 3:
+            response, status, content_type = result
+        elif isinstance(result, tuple) and len(result) == 2:
+            response, status = result
+        else:
+            response = result
+            status = 200
+    except Exception as e:
+        response = {'error': 'Server error', 'detail': str(e)}
+        status = 500
+    return response, (status if isinstance(status, int) else 200), content_type
+
 class ToshuHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    def handle_api(self, method, body=''):
+        timed = toshu_metrics.ENABLED or toshu_profiler.ENABLED
+        start = time.perf_counter() if timed else 0.0
+        profile = toshu_profiler.start() if toshu_profiler.ENABLED else None
+        response, status, content_type = dispatch(self.path, method, body)
+        if profile is not None:
+            toshu_profiler.finish(profile, self.path, method, (time.perf_counter() - start) * 1000, len(body))
+
+        if content_type == 'application/json':
+            payload = encode_json(response)
+        else:
+            payload = response.encode('utf-8') if isinstance(response, str) else response
+        sent = self.send_body(status, content_type, payload)
+        self.observe(method, status, start, len(body), sent)
+
+    def observe(self, method, status, start, request_bytes, sent):
+        """Record a finished API request in toshu_metrics"""
+        if toshu_metrics.ENABLED:
+            toshu_metrics.observe_request(
+                self.path, method, status, time.perf_counter() - start,
+                request_bytes, sent)
+
+    def send_json(self, response, status):
+        return self.send_body(status, 'application/json', encode_json(response))
+
+    def reject(self, method, start, response, status):
+        """Answer a request whose body was not accepted, close the
+        connection (the rest of the body is unread) and record it"""
+        self.close_connection = True
+        sent = self.send_json(response, status)
+        try:
+            declared = int(self.headers.get('Content-Length', 0) or 0)
+        except ValueError:
+            declared = 0
+        self.observe(method, status, start, declared, sent)
+
+    def send_body(self, status, content_type, payload):
+        """Write bytes or an iterable of byte chunks, gzipped when the client
+        accepts it and the body is text of at least GZIP_MIN_BYTES.
+        Returns the number of body bytes put on the wire.
+        """
+        whole = isinstance(payload, (bytes, bytearray))
+        compress = ('gzip' in self.headers.get('Accept-Encoding', '')
+                    and (content_type.startswith(('application/json', 'text/')))
+                    and (not whole or len(payload) >= GZIP_MIN_BYTES))
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Vary', 'Accept-Encoding')
+        elif whole:
+            self.send_header('Content-Length', str(len(payload)))
+        # Without a length the body ends when the (HTTP/1.0) connection closes
+        self.end_headers()
+
+        if whole:
+            view = memoryview(payload)
+            chunks = (view[i:i + WRITE_CHUNK] for i in range(0, len(view), WRITE_CHUNK))
+        else:
+            chunks = payload
+        sent = 0
+        if compress:
+            deflate = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = gzip framing
+            for chunk in chunks:
+                data = deflate.compress(chunk)
+                if data:
+                    self.wfile.write(data)
+                    sent += len(data)
+            data = deflate.flush()
+            self.wfile.write(data)
+            sent += len(data)
+        else:
+            for chunk in chunks:
+                self.wfile.write(chunk)
+                sent += len(chunk)
+        return sent
+
+    def iter_body(self, limit):
+        """Yield the request body in chunks (Content-Length or chunked)
+
+        Raises BodyTooLarge as soon as the body is known to exceed ``limit``
+        and ValueError on malformed chunked framing.
+        """
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            total = 0
+            while True:
+                line = self.rfile.readline(1024)
+                if not line:
+                    raise ValueError('body ended early')
+                size = int(line.split(b';', 1)[0].strip(), 16)
+                if size == 0:
+                    # Skip any trailers
+                    while self.rfile.readline(1024) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return
+                total += size
+                if total > limit:
+                    raise BodyTooLarge()
+                while size:
+                    chunk = self.rfile.read(min(size, READ_CHUNK))
+                    if not chunk:
+                        raise ValueError('body ended early')
+                    size -= len(chunk)
+                    yield chunk
+                self.rfile.readline(1024)
+        else:
+            remaining = int(self.headers.get('Content-Length', 0) or 0)
+            if remaining > limit:
+                raise BodyTooLarge()
+            while remaining:
+                chunk = self.rfile.read(min(remaining, READ_CHUNK))
+                if not chunk:
+                    raise ValueError('body ended early')
+                remaining -= len(chunk)
+                yield chunk
+
+    def read_body(self):
+        """Whole body as bytes; json.loads takes it without decoding to str first"""
+        if 'chunked' not in self.headers.get('Transfer-Encoding', '').lower():
+            length = int(self.headers.get('Content-Length', 0) or 0)
+            if length > MAX_BODY_BYTES:
+                raise BodyTooLarge()
+            return self.rfile.read(length)
+        body = bytearray()
+        for chunk in self.iter_body(MAX_BODY_BYTES):
+            body += chunk
+        return body
+
+    def handle_api_with_body(self, method):
+        start = time.perf_counter()
+        try:
+            body = self.read_body()
+        except BodyTooLarge:
+            return self.reject(method, start, {'error': 'Request body too large', 'limit': MAX_BODY_BYTES}, 413)
+        except ValueError:
+            return self.reject(method, start, {'error': 'Malformed request body'}, 400)
+        self.handle_api(method, body)
+
+    def handle_pdf_upload(self):
+        """POST /api/pdf-upload?name=paper.pdf with the raw PDF as the body"""
+        start = time.perf_counter()
+        name = parse_qs(urlparse(self.path).query).get('name', [''])[0] or self.headers.get('X-Filename', '')
+        try:
+            path = save_pdf_upload(name, self.iter_body(MAX_UPLOAD_BYTES))
+        except BodyTooLarge:
+            return self.reject('POST', start, {'error': 'Upload too large', 'limit': MAX_UPLOAD_BYTES}, 413)
+        except (ValueError, ConnectionError):
+            return self.reject('POST', start, {'error': 'Upload interrupted'}, 400)
+        if path is None:
+            return self.reject('POST', start, {'error': 'Only PDF files can be uploaded'}, 415)
+        size = os.path.getsize(path)
+        queue_pdf_ingest(path)
+        sent = self.send_json({'status': 'queued', 'file': os.path.basename(path), 'bytes': size}, 202)
+        self.observe('POST', 202, start, size, sent)
+
     def do_GET(self):
         if self.path.startswith('/api/'):
-            try:
-                result = api_handler(self.path, 'GET', '')
-                if isinstance(result, tuple) and len(result) == 2:
-                    response, status = result
-                else:
-                    response = result
-                    status = 200
-            except Exception as e:
-                response = {'error': 'Server error', 'detail': str(e)}
-                status = 500
-
-            self.send_response(status if isinstance(status, int) else 200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+            self.handle_api('GET')
         else:
             super().do_GET()
     
     def do_POST(self):
-        if self.path.startswith('/api/'):
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length).decode('utf-8')
-            try:
-                result = api_handler(self.path, 'POST', body)
-                if isinstance(result, tuple) and len(result) == 2:
-                    response, status = result
-                else:
-                    response = result
-                    status = 200
-            except Exception as e:
-                response = {'error': 'Server error', 'detail': str(e)}
-                status = 500
-
-            self.send_response(status if isinstance(status, int) else 200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
+        if self.path.split('?', 1)[0] == '/api/pdf-upload':
+            self.handle_pdf_upload()
+        elif self.path.startswith('/api/'):
+            self.handle_api_with_body('POST')
+        else:
+            self.send_response(404)
             self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+    
+    def do_PATCH(self):
+        if self.path.startswith('/api/'):
+            self.handle_api_with_body('PATCH')
         else:
             self.send_response(404)
             self.end_headers()
     
     def do_DELETE(self):
         if self.path.startswith('/api/'):
-            try:
-                result = api_handler(self.path, 'DELETE', '')
-                if isinstance(result, tuple) and len(result) == 2:
-                    response, status = result
-                else:
-                    response = result
-                    status = 200
-            except Exception as e:
-                response = {'error': 'Server error', 'detail': str(e)}
-                status = 500
-
-            self.send_response(status if isinstance(status, int) else 200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+            self.handle_api('DELETE')
         else:
             self.send_response(404)
             self.end_headers()
@@ -306,24 +1020,34 @@ class ToshuHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PATCH, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
     
     def log_message(self, format, *args):
         pass
 
+class ToshuHTTPServer(socketserver.ThreadingTCPServer):
+    # Concurrent analyses of the same text are coalesced in cached_analysis
+    daemon_threads = True
+
+def make_server(host="127.0.0.1", port=PORT):
+    return ToshuHTTPServer((host, port), ToshuHTTPRequestHandler)
+
 def start_server():
     os.chdir(BUILD_DIR)
-    handler = ToshuHTTPRequestHandler
-    with socketserver.TCPServer(("127.0.0.1", PORT), handler) as httpd:
+    with make_server() as httpd:
         print(f"Toshu serving at http://127.0.0.1:{PORT}")
         httpd.serve_forever()
 
 if __name__ == '__main__':
     import webview
     
+    if '--profile' in sys.argv:
+        toshu_profiler.enable(PROFILE_DIR)
+
     load_data()
+    toshu_metrics.start_log_dump(METRICS_LOG_PATH, METRICS_LOG_INTERVAL)
     
     # Start HTTP server
     server_thread = threading.Thread(target=start_server, daemon=True)
@@ -331,9 +1055,15 @@ if __name__ == '__main__':
 
     url = f'http://127.0.0.1:{PORT}/index.html'
 
-    # Open in native window
+    # Open in native window; the UI calls the API through the bridge, HTTP
+    # stays up for static files and for running in a browser
     try:
-        webview.create_window('Toshu — Advanced Writing Environment', url, width=1400, height=900)
+        webview.create_window('Toshu — Advanced Writing Environment', url, width=1400, height=900,
+                              js_api=toshu_bridge.Bridge(dispatch))
         webview.start()
     except Exception as e:
         print('Error:', e)
+    finally:
+        # Persist any note moves still waiting in the coalescing window
+        if _sticky_flush_timer is not None:
+            flush_sticky_notes()
@@ -0,0 +1,51 @@
+"""
+Toshu - in-process API transport for the desktop window
+Exposed to the page as window.pywebview.api; calls reach the same
+api_handler as HTTP without a socket, HTTP parsing or decoding the
+request body. pywebview already runs each js_api call on its own
+thread, so call() dispatches directly on it.
+"""
+
+import json
+import time
+
+import toshu_metrics
+import toshu_profiler
+
+
+def _encoded_size(value):
+    """Bytes ``value`` would take as a compact JSON body, for metrics"""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    return len(json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8'))
+
+
+class Bridge:
+    """pywebview js_api object; every public method is callable from JavaScript
+
+    ``dispatch(path, method, payload)`` must return (response, status,
+    content type), as toshu_app.dispatch does.
+    """
+
+    def __init__(self, dispatch):
+        self._dispatch = dispatch
+
+    def call(self, path, method='GET', payload=None):
+        """Returns {'status': int, 'body': response} to the page"""
+        method = (method or 'GET').upper()
+        if payload is None:
+            payload = ''
+        timed = toshu_metrics.ENABLED or toshu_profiler.ENABLED
+        start = time.perf_counter() if timed else 0.0
+        profile = toshu_profiler.start() if toshu_profiler.ENABLED else None
+        response, status, content_type = self._dispatch(path, method, payload)
+        if profile is not None:
+            toshu_profiler.finish(profile, path, method, (time.perf_counter() - start) * 1000,
+                                  _encoded_size(payload))
+        if isinstance(response, bytes):
+            # Profile downloads and the like stay on HTTP
+            response, status = {'error': f'{content_type} response; request it over HTTP'}, 406
+        if toshu_metrics.ENABLED:
+            toshu_metrics.observe_request(path, method, status, time.perf_counter() - start,
+                                          _encoded_size(payload), _encoded_size(response))
+        return {'status': status, 'body': response}
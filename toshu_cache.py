@@ -0,0 +1,148 @@
+"""
+Toshu - persistent, content-addressed analysis cache
+Results are stored one file per (analyser, version, text digest), so a
+reopened manuscript gets its analyses back without recomputing. Entries
+are checksummed, the directory is bounded in bytes and trimmed least
+recently used first.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+
+import toshu_metrics
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'analysis_cache')
+MAX_BYTES = int(float(os.environ.get('TOSHU_ANALYSIS_CACHE_MB', '64')) * 1024 * 1024)
+
+# Entry layout: magic, CRC32 of the payload, payload length, then the
+# payload (zlib-compressed JSON)
+_MAGIC = b'TAC1'
+_HEADER = struct.Struct('<4sII')
+_SUFFIX = '.tac'
+
+
+def text_digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0
+        self.evictions = 0
+        self._sizes = None  # file name -> size, loaded on first use
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _name(self, analyser, version, digest):
+        key = hashlib.blake2b(f'{analyser}\0{version}\0{digest}'.encode('utf-8'), digest_size=16)
+        return f'{analyser}-{key.hexdigest()}{_SUFFIX}'
+
+    def _index(self):
+        if self._sizes is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._sizes = {}
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(_SUFFIX):
+                    self._sizes[entry.name] = entry.stat().st_size
+                elif entry.name.endswith('.tmp'):
+                    # Left behind by a crash mid-write
+                    os.remove(entry.path)
+            self._total = sum(self._sizes.values())
+        return self._sizes
+
+    def _drop(self, name):
+        size = self._sizes.pop(name, 0)
+        self._total -= size
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+
+    def get(self, analyser, version, digest):
+        """Stored result, or None if absent or failing its checksum"""
+        name = self._name(analyser, version, digest)
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self._count(analyser, False)
+            return None
+        value = None
+        if len(data) >= _HEADER.size:
+            magic, crc, length = _HEADER.unpack_from(data)
+            payload = data[_HEADER.size:]
+            if magic == _MAGIC and length == len(payload) and zlib.crc32(payload) == crc:
+                try:
+                    value = json.loads(zlib.decompress(payload))
+                except (zlib.error, ValueError):
+                    value = None
+        if value is None:
+            with self._lock:
+                self.corrupt += 1
+                self._index()
+                self._drop(name)
+            self._count(analyser, False)
+            return None
+        try:
+            os.utime(path)  # recency for LRU eviction
+        except OSError:
+            pass
+        self._count(analyser, True)
+        return value
+
+    def put(self, analyser, version, digest, value):
+        payload = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'), 1)
+        data = _HEADER.pack(_MAGIC, zlib.crc32(payload), len(payload)) + payload
+        name = self._name(analyser, version, digest)
+        with self._lock:
+            sizes = self._index()
+            tmp = self._path(name) + '.%d.tmp' % threading.get_ident()
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._path(name))
+            self._total += len(data) - sizes.get(name, 0)
+            sizes[name] = len(data)
+            if self._total > self.max_bytes:
+                self._evict(keep=name)
+
+    def _evict(self, keep):
+        """Remove least recently used entries until under 90% of the limit"""
+        aged = []
+        for name in self._sizes:
+            try:
+                aged.append((os.stat(self._path(name)).st_mtime_ns, name))
+            except OSError:
+                aged.append((0, name))
+        aged.sort()
+        target = self.max_bytes * 0.9
+        for _, name in aged:
+            if self._total <= target:
+                break
+            if name != keep:
+                self._drop(name)
+                self.evictions += 1
+
+    def _count(self, analyser, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        toshu_metrics.observe_cache('disk:' + analyser, hit)
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._index()):
+                self._drop(name)
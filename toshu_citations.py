@@ -0,0 +1,292 @@
+"""
+Toshu - in-text citations and reference matching
+extract() finds author-year and numeric citations in one regex pass per
+paragraph; paragraphs are cached by content, so an edit only rescans the
+paragraphs it touched. ReferenceIndex parses the free-text References
+entries once into first-author/year, number and title-word lookups, and
+match() resolves every citation with dictionary lookups, reporting
+citations with no reference and references never cited.
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+VERSION = 1  # bump when the patterns or the extract() result shape change
+PARAGRAPH_CACHE_SIZE = 20000
+MAX_RANGE = 100      # [3-7] expands; [1-5000] is a typo, not 5000 citations
+MISSING_LIMIT = 100
+SNIPPET_CHARS = 80
+
+_YEAR = r'(?:1[5-9]\d\d|20\d\d)[a-z]?|n\.d\.'
+_NAME = r"[A-Z][\w'’-]+"
+_PARTICLE = r"(?:van|von|der|den|de|da|di|du|la|le|del|dos)"
+_CITATION = re.compile(
+    # Smith (2020), Smith and Jones (2019, 2020a), Smith et al. (2021)
+    rf"(?P<narrative>{_NAME}(?:\s+(?:et\s+al\.|(?:and|&)\s+{_NAME}))?)\s+"
+    rf"\((?P<narrative_years>(?:{_YEAR})(?:,\s*(?:{_YEAR}))*)(?:,\s*(?:pp?\.|ch\.)\s*[\w–-]+)?\)"
+    # (Smith, 2020; Jones & Lee, 2019, p. 4)
+    rf"|\((?P<parenthetical>[^()]*?\b(?:{_YEAR})[^()]*)\)"
+    # [1], [2, 4-6]
+    r"|\[(?P<numeric>\d+(?:\s*[-–]\s*\d+)?(?:\s*,\s*\d+(?:\s*[-–]\s*\d+)?)*)\]"
+)
+_PAREN_PART = re.compile(
+    rf"^(?:(?:e\.g\.|i\.e\.|see(?:\s+also)?|cf\.)[,\s]+)?(?P<authors>(?:{_PARTICLE}\s+)*{_NAME}.*?),?\s+"
+    rf"(?P<years>(?:{_YEAR})(?:,\s*(?:{_YEAR}))*)(?:,\s*(?:pp?\.|ch\.)\s*[\w–-]+)?$"
+)
+_YEARS = re.compile(_YEAR)
+_AUTHOR_SPLIT = re.compile(r'\s*(?:;|,|&|\band\b|\bet\s+al\.?)\s*')
+_INITIAL = re.compile(r'^(?:[A-Z]\.?-?)+$')
+_WORD = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+_REF_NUMBER = re.compile(r'^\s*(?:\[(\d+)\]|(\d+)[.)])\s+')
+_REF_PAREN_YEAR = re.compile(rf'\((?P<year>{_YEAR})\)')
+_REF_YEAR = re.compile(rf'\b(?P<year>{_YEAR})')
+_REF_AUTHOR_END = re.compile(r'\.\s|[("“]')
+_NOT_AUTHORS = frozenset('''
+in as see the table figure fig since from until by and of on at to for between after before during
+january february march april may june july august september october november december spring summer
+'''.split())
+_TITLE_STOP = frozenset('''
+a an and the of in on for to with from by at as is are its their into via using towards toward
+'''.split())
+
+
+def name_key(name):
+    """Matching key for an author: the last word, case- and accent-folded
+
+    "van der Berg", "Berg" and "Bérg" all give "berg"; corporate authors
+    ("World Health Organization") key on their last word on both sides.
+    """
+    words = _WORD.findall(name)
+    if not words:
+        return ''
+    folded = unicodedata.normalize('NFKD', words[-1].casefold())
+    return ''.join(c for c in folded if not unicodedata.combining(c))
+
+
+def _first_author(authors):
+    for part in _AUTHOR_SPLIT.split(authors):
+        part = part.strip()
+        if part and not _INITIAL.match(part):
+            words = [w for w in part.split() if not _INITIAL.match(w)]
+            if words:
+                return name_key(' '.join(words))
+    return ''
+
+
+def _last_word(text, end):
+    start = end
+    while start > 0 and not text[start - 1].isspace():
+        start -= 1
+    return text[start:end]
+
+
+def _numbers(spec):
+    found = []
+    for item in spec.split(','):
+        bounds = re.split(r'\s*[-–]\s*', item.strip())
+        lo = int(bounds[0])
+        hi = int(bounds[-1])
+        if lo <= hi <= lo + MAX_RANGE:
+            found.extend(range(lo, hi + 1))
+        else:
+            found.append(lo)
+    return found
+
+
+def _scan(paragraph):
+    """[[text, style, keys]] for one paragraph
+
+    Author-year keys are [author key, year] pairs; numeric keys are ints.
+    """
+    found = []
+    for m in _CITATION.finditer(paragraph):
+        if m.group('numeric') is not None:
+            found.append([m.group(0), 'numeric', _numbers(m.group('numeric'))])
+        elif m.group('narrative') is not None:
+            author = _first_author(m.group('narrative'))
+            if author in _NOT_AUTHORS:
+                continue
+            keys = [[author, year] for year in _YEARS.findall(m.group('narrative_years'))]
+            found.append([m.group(0), 'author-year', keys])
+        else:
+            keys = []
+            for part in m.group('parenthetical').split(';'):
+                cite = _PAREN_PART.match(part.strip())
+                if cite is not None:
+                    author = _first_author(cite.group('authors'))
+                    if author and author not in _NOT_AUTHORS:
+                        keys.extend([author, year] for year in _YEARS.findall(cite.group('years')))
+            if keys:
+                found.append([m.group(0), 'author-year', keys])
+    return found
+
+
+class CitationExtractor:
+    def __init__(self, cache_size=PARAGRAPH_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _paragraph(self, paragraph):
+        key = hashlib.blake2b(paragraph.encode('utf-8'), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+        found = _scan(paragraph)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = found
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return found
+
+    def extract_text(self, text):
+        """{'paragraphs': n, 'citations': [[paragraph, text, style, keys]]} for plain text"""
+        citations = []
+        paragraphs = 0
+        for paragraphs, paragraph in enumerate(_PARAGRAPH_BREAK.split(text), 1):
+            if '(' in paragraph or '[' in paragraph:
+                citations.extend([paragraphs - 1] + c for c in self._paragraph(paragraph))
+        return {'paragraphs': paragraphs, 'citations': citations}
+
+    def extract(self, stream):
+        return self.extract_text(stream.text)
+
+
+class Reference:
+    __slots__ = ('id', 'text', 'number', 'author', 'year', 'title')
+
+    def __init__(self, ref_id, text, position):
+        self.id = ref_id
+        self.text = text
+        number = _REF_NUMBER.match(text)
+        self.number = int(number.group(1) or number.group(2)) if number else position
+        body = text[number.end():] if number else text
+
+        year = _REF_PAREN_YEAR.search(body) or _REF_YEAR.search(body)
+        self.year = year.group('year') if year else None
+        end = _REF_AUTHOR_END.search(body)
+        while end is not None and end.group(0)[0] == '.' and _INITIAL.match(_last_word(body, end.start())):
+            end = _REF_AUTHOR_END.search(body, end.end())
+        stop = min(end.start() if end else len(body), year.start() if year else len(body))
+        self.author = _first_author(body[:stop])
+
+        # "Smith, J. (2020). Title." and "Org. (2021). Title." both title after the year
+        rest = body[year.end():] if year and not body[stop:year.start()].strip(' .(') else body[stop:]
+        title = re.match(r'[\s).,"“]*(.+?)(?:[.?!"”](?:\s|$)|$)', rest)
+        self.title = title.group(1).rstrip(' ,;:') if title else ''
+
+    def snippet(self):
+        return self.text if len(self.text) <= SNIPPET_CHARS else self.text[:SNIPPET_CHARS] + '...'
+
+
+class ReferenceIndex:
+    """Lookups over the References entries; build once per change to the list"""
+
+    def __init__(self, references):
+        self.references = []
+        self.by_author_year = {}  # (author key, year) -> [Reference]
+        self.by_author = {}       # author key -> [Reference]
+        self.by_number = {}       # citation number -> Reference
+        self.by_title_word = {}   # folded title word -> [Reference]
+        for position, entry in enumerate(references, 1):
+            text = entry.get('text', '') if isinstance(entry, dict) else str(entry)
+            ref = Reference(entry.get('id', position) if isinstance(entry, dict) else position, text, position)
+            self.references.append(ref)
+            self.by_number.setdefault(ref.number, ref)
+            if ref.author:
+                self.by_author.setdefault(ref.author, []).append(ref)
+                if ref.year:
+                    self.by_author_year.setdefault((ref.author, ref.year), []).append(ref)
+            for word in set(_WORD.findall(ref.title)):
+                word = name_key(word)
+                if len(word) > 3 and word not in _TITLE_STOP:
+                    self.by_title_word.setdefault(word, []).append(ref)
+
+    def find(self, key):
+        """References a single citation key resolves to"""
+        if isinstance(key, int):
+            ref = self.by_number.get(key)
+            return [ref] if ref is not None else []
+        author, year = key
+        found = self.by_author_year.get((author, year))
+        if found is None and year[-1].isalpha() and year != 'n.d.':
+            # (Smith, 2020a) against an entry that only says 2020
+            found = self.by_author_year.get((author, year[:-1]))
+        return found or []
+
+    def suggest(self, key):
+        """Likely intended references for an unresolved author-year key:
+        same author in another year, or the author named in a title"""
+        if isinstance(key, int):
+            return []
+        author, year = key
+        seen = {}
+        for ref in self.by_author.get(author, []) + self.by_title_word.get(author, []):
+            if ref.year is None or ref.year[:4] == year[:4] or ref.author == author:
+                seen.setdefault(ref.id, ref)
+        return [ref.id for ref in seen.values()]
+
+
+def _key_label(key):
+    if isinstance(key, int):
+        return f'[{key}]'
+    return f'{key[0].capitalize()} {key[1]}'
+
+
+def match(extracted, index, limit=MISSING_LIMIT):
+    """Resolve extract() output against a ReferenceIndex"""
+    cited = Counter()
+    missing = OrderedDict()
+    styles = Counter()
+    total = 0
+    for paragraph, text, style, keys in extracted['citations']:
+        styles[style] += 1
+        for key in keys:
+            if not isinstance(key, int):
+                key = tuple(key)
+            total += 1
+            refs = index.find(key)
+            if refs:
+                cited.update(ref.id for ref in refs)
+                continue
+            entry = missing.get(key)
+            if entry is None:
+                entry = missing[key] = {'key': _key_label(key), 'text': text, 'paragraph': paragraph,
+                                        'count': 0, 'suggestions': index.suggest(key)}
+            entry['count'] += 1
+
+    if len(styles) > 1:
+        style = 'mixed'
+    else:
+        style = next(iter(styles), None)
+    return {
+        'style': style,
+        'citationCount': total,
+        'matchedCount': total - sum(entry['count'] for entry in missing.values()),
+        'missing': list(missing.values())[:limit],
+        'missingCount': len(missing),
+        'unused': [{'id': ref.id, 'text': ref.snippet()} for ref in index.references if ref.id not in cited],
+        'cited': {str(ref_id): count for ref_id, count in cited.items()},
+    }
+
+
+_extractor = CitationExtractor()
+
+
+def extract(stream):
+    return _extractor.extract(stream)
+
+
+def extract_text(text):
+    return _extractor.extract_text(text)
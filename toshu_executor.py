@@ -0,0 +1,87 @@
+"""
+Toshu - process pool for CPU-bound analysers
+Large documents are copied once into shared memory and split at paragraph
+breaks; each worker attaches to the block, decodes only its own chunk
+and returns a small partial result, so nothing multi-megabyte is pickled
+and the server's own threads keep the GIL
+"""
+
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+WORKERS = int(os.environ.get('TOSHU_ANALYSIS_WORKERS', '0')) or max(1, (os.cpu_count() or 2) - 1)
+PARALLEL_MIN_CHARS = int(os.environ.get('TOSHU_PARALLEL_MIN_CHARS', '300000'))
+MIN_CHUNK_BYTES = 64 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS)
+            atexit.register(shutdown)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def should_parallelize(text):
+    return WORKERS > 1 and len(text) >= PARALLEL_MIN_CHARS
+
+
+def split_points(data, parts, separator=b'\n\n'):
+    """Byte offsets cutting ``data`` into about ``parts`` chunks at ``separator``"""
+    size = max(MIN_CHUNK_BYTES, len(data) // max(1, parts) + 1)
+    points = [0]
+    while points[-1] + size < len(data):
+        cut = data.find(separator, points[-1] + size)
+        if cut == -1:
+            break
+        points.append(cut + len(separator))
+    points.append(len(data))
+    return points
+
+
+def _run_chunk(name, start, end, func):
+    # Pool workers share the parent's resource tracker, which unlinks the
+    # block only when the parent does
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        text = bytes(block.buf[start:end]).decode('utf-8')
+    finally:
+        block.close()
+    return func(text)
+
+
+def map_chunks(text, func, parts=None):
+    """[func(chunk) for each paragraph-aligned chunk of ``text``], run in the pool
+
+    ``func`` must be a module-level function so workers can import it.
+    """
+    data = text.encode('utf-8')
+    points = split_points(data, parts or WORKERS)
+    if len(points) <= 2:
+        return [func(text)]
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        block.buf[:len(data)] = data
+        del data
+        pool = _executor()
+        futures = [pool.submit(_run_chunk, block.name, points[i], points[i + 1], func)
+                   for i in range(len(points) - 1)]
+        return [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
@@ -0,0 +1,81 @@
+"""
+Toshu - single-flight execution for analyses
+Concurrent callers asking for the same (group, key) share one computation.
+Each group also tracks the newest generation (document revision) asked
+for; older flights in the group are marked cancelled and stop at their
+next checkpoint, so rapid edits only pay for the latest text.
+"""
+
+import threading
+
+import toshu_metrics
+
+
+class Superseded(Exception):
+    """A newer generation of the same group was requested; ask again"""
+
+
+class Flight:
+    __slots__ = ('generation', 'cancelled', 'done', 'result', 'error')
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.cancelled = False
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def check(self):
+        """Checkpoint for the running computation"""
+        if self.cancelled:
+            raise Superseded()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}  # (group, key) -> Flight
+        self._latest = {}   # group -> newest generation seen
+        self._lock = threading.Lock()
+
+    def run(self, group, key, generation, fn):
+        """Result of ``fn(flight)`` for ``key``, shared with any caller already computing it
+
+        Raises Superseded when a newer generation of ``group`` has started
+        before this one finished.
+        """
+        with self._lock:
+            latest = self._latest.get(group)
+            if latest is not None and generation < latest:
+                toshu_metrics.observe_flight(group, 'superseded')
+                raise Superseded()
+            if latest is None or generation > latest:
+                self._latest[group] = generation
+                for (g, k), other in self._flights.items():
+                    if g == group and k != key:
+                        other.cancelled = True
+            flight = self._flights.get((group, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(group, key)] = Flight(generation)
+            else:
+                # Same text reached again (e.g. an undo): keep it running
+                flight.generation = max(flight.generation, generation)
+                flight.cancelled = False
+
+        if not leader:
+            toshu_metrics.observe_flight(group, 'joined')
+            flight.done.wait()
+        else:
+            try:
+                flight.result = fn(flight)
+            except BaseException as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    if self._flights.get((group, key)) is flight:
+                        del self._flights[(group, key)]
+                flight.done.set()
+            toshu_metrics.observe_flight(group, 'superseded' if isinstance(flight.error, Superseded) else 'ran')
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
@@ -0,0 +1,141 @@
+"""
+Toshu - heuristic grammar, style and spelling checks
+scan() reduces a run of sentences to a small partial result; partials
+from separate chunks or regions merge() into one, and issues() turns
+that into the list the editor shows
+"""
+
+import re
+
+import toshu_spelling
+import toshu_text
+
+LONG_SENTENCE_WORDS = 30
+PASSIVE_REPORT_MIN = 4
+MIN_WORDS = 10  # skip checks for very short text
+ISSUE_LIMIT = 5
+
+_MULTIPLE_SPACES = re.compile(r'  {2,}')
+
+
+def empty():
+    return {'words': 0, 'sentences': 0, 'long': [], 'spacing': False, 'passive': 0, 'spelling': {}}
+
+
+def scan(stream, first=0, last=None):
+    """Check sentences ``first``..``last`` (exclusive) of ``stream``
+
+    Long sentences are reported as [sentence index, snippet] pairs,
+    misspellings as {word: count} in order of first use.
+    """
+    if last is None:
+        last = stream.sentence_count
+    partial = empty()
+    if first >= last:
+        return partial
+    start_word = stream.sentences[first]
+    end_word = stream.sentences[last] if last < stream.sentence_count else stream.word_count
+    partial['words'] = end_word - start_word
+    partial['sentences'] = last - first
+
+    bounds = stream.sentences
+    for i in range(first, last):
+        length = (bounds[i + 1] if i + 1 < len(bounds) else stream.word_count) - bounds[i]
+        if length > LONG_SENTENCE_WORDS:
+            sentence = stream.sentence_text(i)
+            partial['long'].append([i, sentence[:50] + '...' if len(sentence) > 50 else sentence])
+
+    if start_word < end_word:
+        text = stream.text[stream.starts[start_word]:stream.ends[end_word - 1]]
+        partial['spacing'] = _MULTIPLE_SPACES.search(text) is not None
+
+    was = stream.vocab.get('was')
+    if was is not None:
+        ids = stream.ids
+        participles = stream.vocab.ids_ending('ed')
+        passive = 0
+        for i in range(start_word, min(end_word, stream.word_count - 1)):
+            if ids[i] == was and ids[i + 1] in participles and stream.gap(i).isspace():
+                passive += 1
+        partial['passive'] = passive
+    partial['spelling'] = toshu_spelling.scan(stream, start_word, end_word)
+    return partial
+
+
+def merge(partials, renumber=False):
+    """Combine partials; with ``renumber`` each one's sentence indexes are
+    local and get shifted by the sentences before it"""
+    merged = empty()
+    for partial in partials:
+        offset = merged['sentences'] if renumber else 0
+        merged['long'].extend([i + offset, text] for i, text in partial['long'])
+        merged['words'] += partial['words']
+        merged['sentences'] += partial['sentences']
+        merged['spacing'] = merged['spacing'] or partial['spacing']
+        merged['passive'] += partial['passive']
+        for word, count in partial['spelling'].items():
+            merged['spelling'][word] = merged['spelling'].get(word, 0) + count
+    if not renumber:
+        merged['long'].sort()
+    return merged
+
+
+def issues(partial, limit=ISSUE_LIMIT):
+    """Style issues (at most ``limit``) followed by spelling issues"""
+    spelling = toshu_spelling.issues(partial['spelling'], None if limit is None else toshu_spelling.ISSUE_LIMIT)
+    result = []
+    if partial['words'] < MIN_WORDS:
+        return spelling
+    for i, text in partial['long']:
+        result.append({
+            'id': str(i),
+            'text': text,
+            'suggestion': 'Consider breaking this sentence into shorter ones',
+            'type': 'style',
+            'severity': 'warning'
+        })
+    if partial['spacing']:
+        result.append({
+            'id': 'spacing',
+            'text': 'Multiple spaces detected',
+            'suggestion': 'Remove extra spaces between words',
+            'type': 'formatting',
+            'severity': 'info'
+        })
+    if partial['passive'] >= PASSIVE_REPORT_MIN:
+        result.append({
+            'id': 'passive',
+            'text': f"Passive voice detected {partial['passive']} times",
+            'suggestion': 'Consider using active voice for more engaging writing',
+            'type': 'style',
+            'severity': 'warning'
+        })
+    return (result if limit is None else result[:limit]) + spelling
+
+
+def check(stream):
+    return issues(scan(stream))
+
+
+def check_region(raw, start, end, max_chars=20000):
+    """Issues for the paragraphs of raw editor content around ``start``..``end``,
+    widened by at most ``max_chars`` either side
+
+    Ids are prefixed so they never collide with full-document results.
+    """
+    begin, finish = toshu_text.block_window(raw, start, end, max_chars)
+    found = issues(scan(toshu_text.tokenize(toshu_text.plain_text(raw[begin:finish]))))
+    for issue in found:
+        issue['id'] = 'region-' + issue['id']
+    return found
+
+
+def scan_text(text, spelling=None):
+    """Partial for plain text (a process-pool chunk); sentence indexes are local
+
+    ``spelling`` is the parent's toshu_spelling.fingerprint(), so a worker
+    picks up a just-edited user dictionary before checking.
+    """
+    if spelling is not None:
+        toshu_spelling.checker(spelling)
+    return scan(toshu_text.tokenize(text))
@@ -1,10 +1,33 @@
 from core.analysis_basic import analyse_text_basic
-from core.pdf_reader import extract_text_from_pdf
 from core.grammar_checker import check_text, format_issues_for_console
 from core.reporting import save_report
 from core.similarity import compare_texts
 from config.settings import APP_NAME, APP_TAGLINE
+from toshu_pdf_pages import open_pdf
+from toshu_reports import FORMATS, stream_report
+from toshu_watcher import FolderWatcher, REMOVED
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import argparse
+import glob
+import itertools
+import json
 import os
+import sys
+
+PDF_LIBRARY = "pdf_library"
+WATCH_STATE_PATH = os.path.join(PDF_LIBRARY, ".toshu_watch.json")
+REPORT_PART_BYTES = 50 * 1024 * 1024  # start a new report file after this much
+BATCH_WINDOW = 4  # jobs in flight per worker process
+
+# Exit codes for the headless CLI, decided once every row is in; when
+# several apply the highest-precedence one is returned
+EXIT_OK = 0
+EXIT_FAILED = 1      # at least one input could not be processed
+EXIT_USAGE = 2       # bad arguments or no inputs matched
+EXIT_THRESHOLD = 3   # --max-issues / --threshold exceeded
+EXIT_PRECEDENCE = (EXIT_THRESHOLD, EXIT_FAILED, EXIT_OK)
 
 
 def analyse_demo_text() -> str:
@@ -32,9 +55,9 @@ def analyse_pdf() -> str:
         return "\n".join(lines)
 
     lines.append("Reading PDF...")
-    text = extract_text_from_pdf(sample_path)
-    lines.append("\nPDF Loaded Successfully! Showing first 300 characters:\n")
-    lines.append(text[:300] + " ...")
+    doc = open_pdf(sample_path)
+    lines.append(f"\nPDF Loaded Successfully! ({len(doc)} pages) Showing first 300 characters:\n")
+    lines.append(doc.preview(300) + " ...")
     return "\n".join(lines)
 
 
@@ -101,6 +124,108 @@ def compare_two_texts_interactive() -> str:
     return "\n".join(lines)
 
 
+def ingest_pdf(kind: str, path: str):
+    """
+    Called by the watcher for each PDF that settled after being added, changed or removed.
+    """
+    name = os.path.relpath(path, PDF_LIBRARY)
+    if kind == REMOVED:
+        print(f"  - {name} removed from library")
+        return
+    # Extracting every page now fills the page cache for later previews and searches
+    doc = open_pdf(path)
+    words = sum(len(text.split()) for _, text in doc.pages())
+    doc.close()
+    print(f"  + {name} {kind}: {len(doc)} pages, {words} words extracted")
+
+
+_library_watcher = None
+
+
+def toggle_library_watcher() -> str:
+    """
+    Start or stop ingesting PDFs dropped into pdf_library in the background;
+    the menu stays usable meanwhile. Only files that changed since the last
+    run are extracted.
+    """
+    global _library_watcher
+    if _library_watcher is None:
+        _library_watcher = FolderWatcher(PDF_LIBRARY, ingest_pdf, state_path=WATCH_STATE_PATH).start()
+        return f"Watching {PDF_LIBRARY} in the background for new or changed PDFs."
+    return stop_library_watcher()
+
+
+def stop_library_watcher() -> str:
+    global _library_watcher
+    watcher, _library_watcher = _library_watcher, None
+    if watcher is None:
+        return "The library watcher is not running."
+    watcher.stop()
+    return f"Stopped watching. {len(watcher.snapshot)} PDFs tracked in {PDF_LIBRARY}."
+
+
+def iter_library_pdfs():
+    for root, _, files in os.walk(PDF_LIBRARY):
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                yield os.path.join(root, name)
+
+
+def iter_library_grammar():
+    """
+    Yield one row per grammar/style issue, page by page, across the whole library.
+    """
+    for path in iter_library_pdfs():
+        doc = open_pdf(path)
+        name = os.path.relpath(path, PDF_LIBRARY)
+        for index, text in doc.pages():
+            for issue in check_text(text):
+                row = {"file": name, "page": index + 1}
+                row.update(issue if isinstance(issue, dict) else {"issue": str(issue)})
+                yield row
+        doc.close()
+
+
+def iter_library_similarity():
+    """
+    Yield one row per pair of PDFs in the library. Each document's text is held
+    once; the n*(n-1)/2 result rows are streamed, never collected.
+    """
+    docs = []
+    for path in iter_library_pdfs():
+        doc = open_pdf(path)
+        docs.append((os.path.relpath(path, PDF_LIBRARY), doc.text()))
+        doc.close()
+    for i, (name_a, text_a) in enumerate(docs):
+        for name_b, text_b in docs[i + 1:]:
+            scores = compare_texts(text_a, text_b)
+            yield {
+                "file_a": name_a,
+                "file_b": name_b,
+                "jaccard_%": round(scores["jaccard_%"], 2),
+                "cosine_%": round(scores["cosine_%"], 2),
+                "vocab_overlap_%": round(scores["vocab_overlap_%"], 2),
+            }
+
+
+def library_report() -> str:
+    """
+    Stream whole-library grammar and similarity reports straight to disk.
+    """
+    fmt = input(f"\nReport format ({'/'.join(FORMATS)}) [jsonl]: ").strip().lower() or "jsonl"
+    if fmt not in FORMATS:
+        return f"Unknown format: {fmt}"
+    compress = input("Gzip the report files? (y/n): ").strip().lower() == "y"
+
+    lines = []
+    for prefix, rows in (("library_grammar", iter_library_grammar()),
+                         ("library_similarity", iter_library_similarity())):
+        print(f"Writing {prefix} report...")
+        paths = stream_report(rows, prefix, fmt, max_bytes=REPORT_PART_BYTES, compress=compress)
+        lines.append(f"{prefix}: " + (", ".join(paths) if paths else "nothing to report"))
+    return "\n".join(lines)
+
+
 def main_menu():
     while True:
         print("\n" + "=" * 60)
@@ -112,8 +237,10 @@ def main_menu():
         print("  3) Grammar check on sample research paragraph")
         print("  4) Analyse *your* academic paragraph")
         print("  5) Compare two texts (similarity check)")
-        print("  6) Exit")
-        choice = input("\nEnter choice (1–6): ").strip()
+        print(f"  6) {'Stop watching' if _library_watcher else 'Watch'} pdf_library for new PDFs (background)")
+        print("  7) Whole-library grammar & similarity report")
+        print("  8) Exit")
+        choice = input("\nEnter choice (1–8): ").strip()
 
         if choice == "1":
             result = analyse_demo_text()
@@ -141,11 +268,19 @@ def main_menu():
             maybe_save(result, "similarity")
 
         elif choice == "6":
+            result = toggle_library_watcher()
+            print("\n" + result)
+
+        elif choice == "7":
+            result = library_report()
+            print("\n" + result)
+
+        elif choice == "8":
             print("\nExiting Toshu. Goodbye.")
             break
 
         else:
-            print("Invalid choice. Please enter a number from 1 to 6.")
+            print("Invalid choice. Please enter a number from 1 to 8.")
 
 
 def maybe_save(content: str, prefix: str):
@@ -160,5 +295,180 @@ def maybe_save(content: str, prefix: str):
         print("Report not saved.")
 
 
+# Headless batch mode
+
+def expand_inputs(patterns):
+    """
+    Files and globs (** allowed) to a sorted, de-duplicated list of files,
+    plus the paths named without a glob that are not files. A glob that
+    matches nothing is not an error.
+    """
+    found = set()
+    missing = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            found.update(m for m in glob.glob(pattern, recursive=True) if os.path.isfile(m))
+        elif os.path.isfile(pattern):
+            found.add(pattern)
+        elif pattern not in missing:
+            missing.append(pattern)
+    return sorted(found), missing
+
+
+@lru_cache(maxsize=32)
+def read_input(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        doc = open_pdf(path)
+        try:
+            return doc.text()
+        finally:
+            doc.close()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _jsonable(issue):
+    return issue if isinstance(issue, (dict, str, int, float)) else str(issue)
+
+
+def batch_stats(path: str) -> dict:
+    return {"file": path, **analyse_text_basic(read_input(path))}
+
+
+def batch_grammar(path: str) -> dict:
+    issues = check_text(read_input(path))
+    return {"file": path, "count": len(issues), "issues": [_jsonable(i) for i in issues]}
+
+
+def batch_pdf(path: str, full_text: bool = False) -> dict:
+    doc = open_pdf(path)
+    try:
+        row = {"file": path, "pages": len(doc)}
+        if full_text:
+            row["text"] = doc.text()
+            row["words"] = len(row["text"].split())
+        else:
+            row["preview"] = doc.preview(300)
+        return row
+    finally:
+        doc.close()
+
+
+def batch_pdf_text(path: str) -> dict:
+    return batch_pdf(path, full_text=True)
+
+
+def batch_similarity(pair) -> dict:
+    path_a, path_b = pair
+    scores = compare_texts(read_input(path_a), read_input(path_b))
+    return {"file_a": path_a, "file_b": path_b, **{k: round(v, 2) for k, v in scores.items()}}
+
+
+def _guarded(task):
+    """
+    Run one batch job in a worker; errors become rows instead of killing the run.
+    """
+    func, arg = task
+    try:
+        return func(arg)
+    except Exception as e:
+        key = {"file_a": arg[0], "file_b": arg[1]} if isinstance(arg, tuple) else {"file": arg}
+        return {**key, "error": f"{type(e).__name__}: {e}"}
+
+
+def run_batch(func, items, jobs: int):
+    """
+    Yield results in input order, computed across ``jobs`` processes.
+
+    At most ``jobs * BATCH_WINDOW`` tasks are submitted ahead of the
+    result being yielded, so ``items`` can be a lazy iterable of any size.
+    """
+    tasks = ((func, item) for item in items)
+    if jobs <= 1:
+        yield from map(_guarded, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_guarded, task))
+            if len(pending) >= jobs * BATCH_WINDOW:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="toshu_main",
+        description=f"{APP_NAME} – {APP_TAGLINE}. Run without arguments for the interactive menu.",
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="parallel worker processes (default: all cores)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("stats", parents=[common], help="basic text statistics per file")
+    p.add_argument("inputs", nargs="+", help="files or globs (.txt, .md, .pdf, ...)")
+
+    p = sub.add_parser("grammar", parents=[common], help="grammar and style issues per file")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--max-issues", type=int, default=None,
+                   help=f"exit {EXIT_THRESHOLD} if any file has more issues than this")
+
+    p = sub.add_parser("similarity", parents=[common], help="pairwise similarity between files")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--against", help="compare every input with this one file instead of all pairs")
+    p.add_argument("--threshold", type=float, default=None,
+                   help=f"exit {EXIT_THRESHOLD} if any pair's cosine %% reaches this")
+
+    p = sub.add_parser("pdf", parents=[common], help="extract text from PDFs")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--text", action="store_true", help="emit full text instead of a 300-character preview")
+    return parser
+
+
+def run_cli(argv) -> int:
+    args = build_parser().parse_args(argv)
+    paths, missing = expand_inputs(args.inputs)
+    if not paths and not missing:
+        print("No input files matched.", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.command == "stats":
+        func, items = batch_stats, paths
+    elif args.command == "grammar":
+        func, items = batch_grammar, paths
+    elif args.command == "pdf":
+        func, items = (batch_pdf_text if args.text else batch_pdf), paths
+    else:
+        if args.against:
+            items = [(path, args.against) for path in paths if path != args.against]
+        else:
+            items = itertools.combinations(paths, 2)
+        func = batch_similarity
+
+    max_issues = getattr(args, "max_issues", None)
+    threshold = getattr(args, "threshold", None)
+    seen = {EXIT_OK}
+    for path in missing:
+        error = "IsADirectoryError: Is a directory" if os.path.isdir(path) else "FileNotFoundError: No such file"
+        print(json.dumps({"file": path, "error": error}, ensure_ascii=False), flush=True)
+        seen.add(EXIT_FAILED)
+    for row in run_batch(func, items, max(1, args.jobs)):
+        print(json.dumps(row, ensure_ascii=False), flush=True)
+        if "error" in row:
+            seen.add(EXIT_FAILED)
+        elif ((max_issues is not None and row.get("count", 0) > max_issues)
+              or (threshold is not None and row.get("cosine_%", 0) >= threshold)):
+            seen.add(EXIT_THRESHOLD)
+    return next(code for code in EXIT_PRECEDENCE if code in seen)
+
+
 if __name__ == "__main__":
-    main_menu()
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    try:
+        main_menu()
+    finally:
+        if _library_watcher is not None:
+            print(stop_library_watcher())
@@ -0,0 +1,204 @@
+"""
+Toshu - lightweight request and storage metrics
+Counters and histograms rendered in Prometheus text format for /api/metrics
+"""
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+# Set TOSHU_METRICS=0 to turn every observe_* call into a no-op
+ENABLED = os.environ.get('TOSHU_METRICS', '1') != '0'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_buckets = {}     # name -> bucket bounds
+_help = {
+    'toshu_http_requests_total': ('counter', 'API requests by route, method and status'),
+    'toshu_http_request_duration_seconds': ('histogram', 'API request latency'),
+    'toshu_http_request_size_bytes': ('histogram', 'API request body size'),
+    'toshu_http_response_size_bytes': ('histogram', 'API response body size'),
+    'toshu_cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'toshu_save_duration_seconds': ('histogram', 'Time spent writing a data file'),
+    'toshu_save_bytes_total': ('counter', 'Bytes written to data files'),
+    'toshu_sidecar_calls_total': ('counter', 'Sidecar calls by method and outcome'),
+    'toshu_sidecar_call_duration_seconds': ('histogram', 'Sidecar call latency including queueing'),
+    'toshu_sidecar_queue_depth': ('gauge', 'Callers waiting for an idle sidecar'),
+    'toshu_sidecar_restarts_total': ('counter', 'Sidecar processes restarted, by reason'),
+    'toshu_analysis_flights_total': ('counter', 'Analysis calls by analyser and outcome (ran, joined, superseded)'),
+}
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+# Routes of toshu_app.api_handler that end in a path parameter, and the
+# placeholder it is reported as; fixed routes under them are kept
+_PARAM_ROUTES = (
+    ('/api/profiles/', ':name'),
+    ('/api/dictionary/', ':word'),
+    ('/api/references/', ':id'),
+    ('/api/sticky-notes/', ':id'),
+)
+_FIXED_ROUTES = frozenset({'/api/sticky-notes/create'})
+
+
+def route_label(path):
+    """Collapse query strings and path parameters so routes stay low-cardinality"""
+    path = path.split('?', 1)[0]
+    if path in _FIXED_ROUTES:
+        return path
+    for prefix, placeholder in _PARAM_ROUTES:
+        if path.startswith(prefix) and len(path) > len(prefix):
+            return prefix + placeholder
+    return _ID_SEGMENT.sub('/:id', path)
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def _inc(name, labels, amount=1):
+    key = (name, labels)
+    _counters[key] = _counters.get(key, 0) + amount
+
+
+def _observe(name, labels, value, buckets):
+    key = (name, labels)
+    hist = _histograms.get(key)
+    if hist is None:
+        hist = _histograms[key] = [0] * (len(buckets) + 3)
+        _buckets[name] = buckets
+    # Layout: per-bucket counts (last one is +Inf), then sum, then count
+    hist[bisect_left(buckets, value)] += 1
+    hist[-2] += value
+    hist[-1] += 1
+
+
+def observe_request(path, method, status, seconds, request_bytes, response_bytes):
+    if not ENABLED:
+        return
+    route = route_label(path)
+    with _lock:
+        _inc('toshu_http_requests_total', _labels(route=route, method=method, status=str(status)))
+        _observe('toshu_http_request_duration_seconds', _labels(route=route, method=method), seconds, LATENCY_BUCKETS)
+        _observe('toshu_http_request_size_bytes', _labels(route=route, method=method), request_bytes, SIZE_BUCKETS)
+        _observe('toshu_http_response_size_bytes', _labels(route=route, method=method), response_bytes, SIZE_BUCKETS)
+
+
+def observe_cache(cache, hit):
+    if not ENABLED:
+        return
+    with _lock:
+        _inc('toshu_cache_requests_total', _labels(cache=cache, result='hit' if hit else 'miss'))
+
+
+def observe_write(target, seconds, nbytes):
+    if not ENABLED:
+        return
+    with _lock:
+        _observe('toshu_save_duration_seconds', _labels(file=target), seconds, LATENCY_BUCKETS)
+        _inc('toshu_save_bytes_total', _labels(file=target), nbytes)
+
+
+def observe_sidecar(method, seconds, ok):
+    if not ENABLED:
+        return
+    with _lock:
+        _inc('toshu_sidecar_calls_total', _labels(method=method, result='ok' if ok else 'error'))
+        _observe('toshu_sidecar_call_duration_seconds', _labels(method=method), seconds, LATENCY_BUCKETS)
+
+
+def set_sidecar_queue_depth(depth):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[('toshu_sidecar_queue_depth', ())] = depth
+
+
+def observe_sidecar_restart(reason):
+    if not ENABLED:
+        return
+    with _lock:
+        _inc('toshu_sidecar_restarts_total', _labels(reason=reason))
+
+
+def observe_flight(analyser, outcome):
+    if not ENABLED:
+        return
+    with _lock:
+        _inc('toshu_analysis_flights_total', _labels(analyser=analyser, outcome=outcome))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    inner = ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + inner + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Prometheus text exposition (version 0.0.4) of everything recorded so far"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        buckets = dict(_buckets)
+
+    lines = []
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), value in histograms.items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    for name in sorted(by_name):
+        kind, text = _help.get(name, ('untyped', name))
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets[name] + (float('inf'),), value[:-2]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def start_log_dump(path, interval):
+    """Append a metrics snapshot to ``path`` every ``interval`` seconds"""
+    if not ENABLED or interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(f'# metrics snapshot {datetime.now().isoformat()}\n')
+                    f.write(render())
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=loop, name='toshu-metrics-dump', daemon=True)
+    thread.start()
+    return thread
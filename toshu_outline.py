@@ -0,0 +1,138 @@
+"""
+Toshu - document outline
+Headings (<h1>..<h6>, or "#" lines in plain text) split the editor
+content into sections with raw offsets and word counts. A save only
+rescans the sections around the changed span; sections after it are
+shifted by the change in length and keep their counts.
+"""
+
+import re
+from bisect import bisect_right
+
+import toshu_text
+
+TITLE_CHARS = 120
+
+# A heading, tag attributes included, never runs into the start of
+# another one, which keeps a rescan of a few sections identical to a
+# full scan
+_HEADING = re.compile(
+    r'<h([1-6])\b(?:(?!\n#{1,6}[ \t])[^<>])*>((?:(?!</?h[1-6]\b|\n#{1,6}[ \t]).)*?)</h\1\s*>'
+    r'|^(#{1,6})[ \t]+((?:(?!<h[1-6]\b)[^\n])*?)[ \t#]*(?=\n|<h[1-6]\b|\Z)',
+    re.IGNORECASE | re.DOTALL | re.MULTILINE)
+
+
+class Section:
+    __slots__ = ('level', 'title', 'start', 'end', 'words')
+
+    def __init__(self, level, title, start, end):
+        self.level = level  # 0 for text before the first heading
+        self.title = title
+        self.start = start
+        self.end = end
+        self.words = 0
+
+
+def _title(match):
+    inner = match.group(2) if match.group(1) else match.group(4)
+    title = ' '.join(toshu_text.plain_text(inner).split())
+    return title if len(title) <= TITLE_CHARS else title[:TITLE_CHARS] + '...'
+
+
+def scan(raw, start=0, end=None):
+    """Sections of raw[start:end], which must begin at a heading or at 0
+
+    Text before the first heading becomes a level-0 section when it has
+    any words in it.
+    """
+    if end is None:
+        end = len(raw)
+    sections = []
+    for m in _HEADING.finditer(raw, start, end):
+        if sections:
+            sections[-1].end = m.start()
+        elif m.start() > start:
+            sections.append(Section(0, '', start, m.start()))
+        sections.append(Section(int(m.group(1)) if m.group(1) else len(m.group(3)), _title(m), m.start(), end))
+    if not sections and start < end:
+        sections.append(Section(0, '', start, end))
+    for section in sections:
+        section.words = toshu_text.word_count(toshu_text.plain_text(raw[section.start:section.end]))
+    if sections and sections[0].level == 0 and not sections[0].words:
+        del sections[0]
+    return sections
+
+
+class OutlineIndex:
+    """Sections of one document, kept current across saves
+
+    Not locked: toshu_app updates and reads it under state_lock.
+    """
+
+    def __init__(self):
+        self.revision = None
+        self.length = 0
+        self.sections = []
+        self.rescanned = 0  # sections scanned by the latest update
+
+    def update(self, raw, revision, span=None):
+        """Bring the index to ``revision``; ``span`` is the changed (start, end)
+        of ``raw`` when the previous revision is the one indexed"""
+        if span is None or self.revision is None or revision != self.revision + 1:
+            self.sections = scan(raw)
+            self.rescanned = len(self.sections)
+        else:
+            self._patch(raw, span, len(raw) - self.length)
+        self.revision = revision
+        self.length = len(raw)
+
+    def _patch(self, raw, span, delta):
+        start, end = span
+        sections = self.sections
+        starts = [section.start for section in sections]
+        # Rescan from the section before the edit (a removed heading merges
+        # into it) through the one holding the edit's end in old offsets
+        first = max(0, bisect_right(starts, start) - 2)
+        last = bisect_right(starts, end - delta) - 1
+        region_end = starts[last + 1] + delta if last + 1 < len(sections) else len(raw)
+        while True:
+            region_start = starts[first] if first else 0
+            rescanned = scan(raw, region_start, region_end)
+            # The region must still open with its heading; if the edit broke
+            # that one, earlier text may now run on into the region
+            if not first or (rescanned and rescanned[0].start == region_start and rescanned[0].level):
+                break
+            first -= 1
+        tail = sections[last + 1:]
+        for section in tail:
+            section.start += delta
+            section.end += delta
+        self.sections = sections[:first] + rescanned + tail
+        self.rescanned = len(rescanned)
+
+    def find(self, offset):
+        """Index of the section holding raw ``offset``"""
+        i = bisect_right([section.start for section in self.sections], offset) - 1
+        return max(0, i)
+
+    def entries(self):
+        """JSON-ready sections, numbered 1, 1.1, 1.2, 2 ..."""
+        counters = [0] * 7
+        result = []
+        for index, section in enumerate(self.sections):
+            number = ''
+            if section.level:
+                counters[section.level] += 1
+                for deeper in range(section.level + 1, 7):
+                    counters[deeper] = 0
+                number = '.'.join(str(n) for n in counters[1:section.level + 1] if n)
+            result.append({
+                'index': index,
+                'number': number,
+                'level': section.level,
+                'title': section.title,
+                'start': section.start,
+                'end': section.end,
+                'wordCount': section.words,
+            })
+        return result
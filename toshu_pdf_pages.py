@@ -0,0 +1,286 @@
+"""
+Toshu - page-addressable PDF text with an on-disk page cache
+Pages are extracted only when asked for and stored in one cache file per
+PDF (keyed by content hash), read back through mmap. The cache directory
+is bounded in bytes and trimmed least recently opened first.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'pdf_cache')
+MAX_BYTES = int(float(os.environ.get('TOSHU_PDF_CACHE_MB', '256')) * 1024 * 1024)
+HASH_MEMO_SIZE = 1024
+STALE_TMP_SECONDS = 3600  # a .tmp this old was left by a crash mid-create
+
+# Cache file layout:
+#   header  b'TPC1' + uint32 page count
+#   table   page count x (uint64 offset, uint32 length); offset 0 = not extracted yet
+#   data    UTF-8 page text, appended as pages are extracted
+_MAGIC = b'TPC1'
+_HEADER = struct.Struct('<4sI')
+_ENTRY = struct.Struct('<QI')
+_LOCK_BYTE = 0x40000000  # Windows locks a byte range; this one lies past any page data
+
+_hash_memo = OrderedDict()  # (path, mtime_ns, size) -> content hash, least recent first
+_locks = {}
+_in_use = Counter()  # cache path -> open PdfPages in this process
+_locks_guard = threading.Lock()
+
+
+def file_hash(path):
+    """Content hash of a PDF, memoised while its mtime and size are unchanged"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _locks_guard:
+        digest = _hash_memo.get(key)
+        if digest is not None:
+            _hash_memo.move_to_end(key)
+            return digest
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _locks_guard:
+        _hash_memo[key] = digest
+        if len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+    return digest
+
+
+def prune(cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    """Remove least recently opened cache files until under 90% of
+    ``max_bytes``, sparing files open in this process"""
+    aged = []
+    total = 0
+    now = time.time()
+    for entry in os.scandir(cache_dir):
+        try:
+            st = entry.stat()
+            if entry.name.endswith('.tmp') and now - st.st_mtime > STALE_TMP_SECONDS:
+                os.remove(entry.path)
+            elif entry.name.endswith('.pages'):
+                aged.append((st.st_mtime_ns, st.st_size, entry.path))
+                total += st.st_size
+        except OSError:
+            pass  # removed by another process, or still mapped on Windows
+    if total <= max_bytes:
+        return
+    aged.sort()
+    target = max_bytes * 0.9
+    for _, size, path in aged:
+        if total <= target:
+            break
+        with _locks_guard:
+            if _in_use[path]:
+                continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _open_reader(path):
+    try:
+        from PyPDF2 import PdfReader
+    except ImportError:
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise RuntimeError('PDF support needs PyPDF2 (pip install PyPDF2)')
+    return PdfReader(path)
+
+
+def _lock_for(digest):
+    with _locks_guard:
+        return _locks.setdefault(digest, threading.Lock())
+
+
+@contextmanager
+def _locked(f):
+    """Hold an exclusive lock on an open cache file, across processes"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return
+    f.seek(_LOCK_BYTE)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            break
+        except OSError:
+            pass  # LK_LOCK gives up after about 10 seconds; keep waiting
+    try:
+        yield
+    finally:
+        f.seek(_LOCK_BYTE)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PdfPages:
+    """Lazy per-page text for one PDF
+
+    Only the pages that are read get extracted. Once cached, reopening the
+    same file (even under another name) costs a hash and an mmap.
+    """
+
+    def __init__(self, path, cache_dir=CACHE_DIR):
+        self.path = path
+        self.digest = file_hash(path)
+        self.cache_path = os.path.join(cache_dir, self.digest + '.pages')
+        self._lock = _lock_for(self.digest)
+        self._reader = None
+        self._map = None
+        self._mapped_size = 0
+        self._open = False
+        os.makedirs(cache_dir, exist_ok=True)
+        created = not os.path.exists(self.cache_path)
+        if created:
+            self._create()
+        else:
+            os.utime(self.cache_path)  # recency for prune()
+        with open(self.cache_path, 'rb') as f:
+            magic, self.page_count = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            os.remove(self.cache_path)
+            self._create()
+            with open(self.cache_path, 'rb') as f:
+                _, self.page_count = _HEADER.unpack(f.read(_HEADER.size))
+        with _locks_guard:
+            _in_use[self.cache_path] += 1
+        self._open = True
+        if created:
+            prune(cache_dir)
+
+    def _create(self):
+        count = len(self.reader.pages)
+        tmp = self.cache_path + '.%d.tmp' % os.getpid()
+        with open(tmp, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, count))
+            f.write(b'\0' * (_ENTRY.size * count))
+        os.replace(tmp, self.cache_path)
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self._reader = _open_reader(self.path)
+        return self._reader
+
+    def __len__(self):
+        return self.page_count
+
+    def _view(self):
+        size = os.path.getsize(self.cache_path)
+        if self._map is None or size != self._mapped_size:
+            if self._map is not None:
+                self._map.close()
+            with open(self.cache_path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = size
+        return self._map
+
+    def _entry_pos(self, index):
+        return _HEADER.size + index * _ENTRY.size
+
+    def cached(self, index):
+        view = self._view()
+        offset, _ = _ENTRY.unpack_from(view, self._entry_pos(index))
+        return offset != 0
+
+    def page(self, index):
+        """Text of page ``index`` (0-based), extracting and caching it on first use"""
+        if not 0 <= index < self.page_count:
+            raise IndexError(f'page {index} out of range (0-{self.page_count - 1})')
+        view = self._view()
+        offset, length = _ENTRY.unpack_from(view, self._entry_pos(index))
+        if offset:
+            return view[offset:offset + length].decode('utf-8')
+
+        with self._lock:
+            # Another thread may have extracted it while we waited
+            view = self._view()
+            offset, length = _ENTRY.unpack_from(view, self._entry_pos(index))
+            if offset:
+                return view[offset:offset + length].decode('utf-8')
+            text = self.reader.pages[index].extract_text() or ''
+            data = text.encode('utf-8')
+            # Batch workers in other processes append to the same file, so
+            # the end offset and the table entry are settled under a file lock
+            with open(self.cache_path, 'r+b') as f, _locked(f):
+                f.seek(self._entry_pos(index))
+                offset, length = _ENTRY.unpack(f.read(_ENTRY.size))
+                if offset:
+                    f.seek(offset)
+                    return f.read(length).decode('utf-8')
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+                # Publish the table entry only after the text is on disk
+                f.seek(self._entry_pos(index))
+                f.write(_ENTRY.pack(offset, len(data)))
+                f.flush()
+            return text
+
+    def pages(self, start=0, stop=None):
+        for index in range(start, self.page_count if stop is None else min(stop, self.page_count)):
+            yield index, self.page(index)
+
+    def text(self):
+        return '\n'.join(text for _, text in self.pages())
+
+    def preview(self, chars=300):
+        """First ``chars`` characters, touching only as many pages as needed"""
+        out, total = [], 0
+        for _, text in self.pages():
+            out.append(text)
+            total += len(text)
+            if total >= chars:
+                break
+        return '\n'.join(out)[:chars]
+
+    def search(self, term, max_hits=10, context=60):
+        """Yield (page, snippet) for ``term``, stopping after ``max_hits``"""
+        needle = term.lower()
+        hits = 0
+        for index, text in self.pages():
+            lowered = text.lower()
+            pos = lowered.find(needle)
+            while pos != -1:
+                start = max(0, pos - context)
+                yield index, text[start:pos + len(term) + context].replace('\n', ' ')
+                hits += 1
+                if hits >= max_hits:
+                    return
+                pos = lowered.find(needle, pos + len(needle))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._open:
+            self._open = False
+            with _locks_guard:
+                _in_use[self.cache_path] -= 1
+                if not _in_use[self.cache_path]:
+                    del _in_use[self.cache_path]
+
+
+def open_pdf(path, cache_dir=CACHE_DIR):
+    return PdfPages(path, cache_dir)
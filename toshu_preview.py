@@ -0,0 +1,245 @@
+"""Incremental Markdown preview.
+
+The source is split into top-level blocks (headings, paragraphs, lists,
+quotes, fenced code). Rendered HTML is cached per block, and each build is
+diffed against the previous one for the same document. Callers then get a
+patch covering only the changed blocks. An edit in the middle of a
+300-page thesis re-renders one block and ships one block.
+
+Patch format returned by ``PreviewSession.update``::
+
+    {"revision": 12, "base": 11, "blockCount": 840,
+     "patch": {"start": 415, "delete": 1, "insert": [{"id": "9f3a..", "html": "<p>..</p>"}]}}
+
+``start``/``delete`` index into the client's current block list. When the
+client has no base (or the wrong one), ``patch`` covers the whole document.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import html
+import re
+import threading
+
+CACHE_SIZE = 20000  # rendered blocks kept across all documents
+
+_FENCE = re.compile(r"^(```|~~~)")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_HR = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+_UL_ITEM = re.compile(r"^\s{0,3}[-*+]\s+(.*)$")
+_OL_ITEM = re.compile(r"^\s{0,3}\d{1,9}[.)]\s+(.*)$")
+_QUOTE = re.compile(r"^\s{0,3}>\s?(.*)$")
+_HR_CHARS = ("-", "*", "_")
+
+_INLINE_CODE = re.compile(r"`([^`]+)`")
+_STRONG = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1")
+_EM = re.compile(r"(\*|_)(?=\S)(.+?)(?<=\S)\1")
+_LINK = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+_STASHED = re.compile("\x00(\\d+)\x00")
+_SCHEME = re.compile(r"^([a-z][a-z0-9+.-]*):", re.IGNORECASE)
+_CONTROL = re.compile(r"[\x00-\x20\x7f]")
+LINK_SCHEMES = frozenset(("http", "https", "mailto"))
+
+
+def split_blocks(text: str) -> List[str]:
+    """Split Markdown into top-level blocks, keeping fenced code intact."""
+    blocks: List[str] = []
+    current: List[str] = []
+    in_fence: Optional[str] = None
+
+    def flush() -> None:
+        if current:
+            blocks.append("\n".join(current))
+            current.clear()
+
+    for line in text.splitlines():
+        if in_fence is not None:
+            current.append(line)
+            if line.startswith(in_fence):
+                in_fence = None
+                flush()
+            continue
+        # Cheap first-character checks keep the regexes off plain prose lines
+        lead = line.lstrip()[:1]
+        fence = _FENCE.match(line) if lead in ("`", "~") else None
+        if fence:
+            flush()
+            in_fence = fence.group(1)
+            current.append(line)
+        elif not lead:
+            flush()
+        elif (lead == "#" and _HEADING.match(line)) or (lead in _HR_CHARS and _HR.match(line)):
+            # Headings and rules stand alone even without surrounding blank lines
+            flush()
+            blocks.append(line)
+        else:
+            current.append(line)
+    flush()
+    return blocks
+
+
+def _emphasis(text: str) -> str:
+    text = _STRONG.sub(r"<strong>\2</strong>", text)
+    return _EM.sub(r"<em>\2</em>", text)
+
+
+def _link(m: "re.Match[str]") -> str:
+    # The text is already escaped; the URL only needs its quotes escaped
+    url = m.group(2)
+    label = _emphasis(m.group(1))
+    scheme = _SCHEME.match(_CONTROL.sub("", html.unescape(url)))
+    if scheme and scheme.group(1).lower() not in LINK_SCHEMES:
+        return label  # javascript:, data: and the like render as plain text
+    return '<a href="%s">%s</a>' % (url.replace('"', "&quot;"), label)
+
+
+def render_inline(text: str) -> str:
+    # Code spans and finished links are set aside so the emphasis passes
+    # never see their contents (a "_" in a URL is not emphasis)
+    stashed: List[str] = []
+
+    def stash(fragment: str) -> str:
+        stashed.append(fragment)
+        return "\x00%d\x00" % (len(stashed) - 1)
+
+    def restore(m: "re.Match[str]") -> str:
+        return _STASHED.sub(restore, stashed[int(m.group(1))])
+
+    out = html.escape(text, quote=False)
+    out = _INLINE_CODE.sub(lambda m: stash("<code>" + m.group(1) + "</code>"), out)
+    out = _LINK.sub(lambda m: stash(_link(m)), out)
+    return _STASHED.sub(restore, _emphasis(out))
+
+
+def _render_list(lines: List[str], pattern: "re.Pattern[str]", tag: str) -> str:
+    items: List[str] = []
+    for line in lines:
+        m = pattern.match(line)
+        if m:
+            items.append(m.group(1))
+        elif items:
+            items[-1] += " " + line.strip()  # lazy continuation
+    return "<%s>%s</%s>" % (tag, "".join("<li>%s</li>" % render_inline(i) for i in items), tag)
+
+
+def render_block(block: str) -> str:
+    first = block.split("\n", 1)[0]
+    fence = _FENCE.match(first)
+    if fence:
+        body = block.split("\n")[1:]
+        if body and body[-1].startswith(fence.group(1)):
+            body = body[:-1]
+        lang = first[3:].strip()
+        cls = ' class="language-%s"' % html.escape(lang) if lang else ""
+        return "<pre><code%s>%s</code></pre>" % (cls, html.escape("\n".join(body), quote=False))
+    heading = _HEADING.match(first)
+    if heading and "\n" not in block:
+        level = len(heading.group(1))
+        return "<h%d>%s</h%d>" % (level, render_inline(heading.group(2)), level)
+    if _HR.match(block):
+        return "<hr>"
+    lines = block.split("\n")
+    if _UL_ITEM.match(first):
+        return _render_list(lines, _UL_ITEM, "ul")
+    if _OL_ITEM.match(first):
+        return _render_list(lines, _OL_ITEM, "ol")
+    if _QUOTE.match(first):
+        inner = "\n".join(m.group(1) if m else line for line, m in ((ln, _QUOTE.match(ln)) for ln in lines))
+        return "<blockquote>%s</blockquote>" % "".join(render_block(b) for b in split_blocks(inner))
+    return "<p>%s</p>" % "<br>".join(render_inline(line.strip()) for line in lines)
+
+
+class BlockCache:
+    """LRU of block source -> rendered HTML, shared by every session."""
+
+    def __init__(self, size: int = CACHE_SIZE) -> None:
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, block: str) -> str:
+        with self._lock:
+            cached = self._items.get(block)
+            if cached is not None:
+                self._items.move_to_end(block)
+                self.hits += 1
+                return cached
+        rendered = render_block(block)
+        with self._lock:
+            self.misses += 1
+            self._items[block] = rendered
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return rendered
+
+
+def block_id(block: str) -> str:
+    # Stable across processes and restarts, unlike hash()
+    return hashlib.blake2b(block.encode("utf-8"), digest_size=6).hexdigest()
+
+
+class PreviewSession:
+    """Preview state for one document: the last block list and its revision."""
+
+    def __init__(self, cache: BlockCache) -> None:
+        self.cache = cache
+        self.revision = 0
+        self._blocks: List[str] = []
+        self._lock = threading.Lock()
+
+    def update(self, text: str, base: Optional[int] = None) -> Dict[str, Any]:
+        blocks = split_blocks(text)
+        with self._lock:
+            incremental = base is not None and base == self.revision
+            old = self._blocks if incremental else []
+            start, old_end, new_end = _changed_range(old, blocks)
+            insert = [{"id": block_id(b), "html": self.cache.render(b)} for b in blocks[start:new_end]]
+            self._blocks = blocks
+            self.revision += 1
+            return {
+                "revision": self.revision,
+                "base": base if incremental else None,
+                "blockCount": len(blocks),
+                "patch": {"start": start, "delete": old_end - start, "insert": insert},
+            }
+
+    def html(self) -> str:
+        return "\n".join(self.cache.render(b) for b in self._blocks)
+
+
+def _changed_range(old: List[str], new: List[str]) -> Tuple[int, int, int]:
+    """Trim the common prefix and suffix; returns (start, old_end, new_end)."""
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    old_end, new_end = len(old), len(new)
+    while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    return start, old_end, new_end
+
+
+_cache = BlockCache()
+_sessions: Dict[str, PreviewSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def build_preview(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Sidecar RPC handler.
+
+    params: ``text``; optional ``document`` (session key) and ``base`` (the
+    revision the client currently shows). Without ``document`` the full HTML
+    is returned in ``html`` as before.
+    """
+    text = params.get("text", "")
+    doc = params.get("document")
+    if doc is None:
+        return {"html": "\n".join(_cache.render(b) for b in split_blocks(text))}
+    with _sessions_lock:
+        session = _sessions.get(doc)
+        if session is None:
+            session = _sessions[doc] = PreviewSession(_cache)
+    return session.update(text, params.get("base"))
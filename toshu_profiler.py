@@ -0,0 +1,115 @@
+"""
+Toshu - opt-in slow request profiler
+Every API request is run under cProfile; those slower than the threshold
+are kept in a rotating directory together with their route and payload size
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+from datetime import datetime
+
+ENABLED = False
+THRESHOLD_MS = float(os.environ.get('TOSHU_PROFILE_THRESHOLD_MS', '500'))
+KEEP = int(os.environ.get('TOSHU_PROFILE_KEEP', '20'))
+DIRECTORY = None
+
+# cProfile cannot profile two requests at once on newer Pythons
+_active = threading.Lock()
+_SAFE_NAME = re.compile(r'^[\w.-]+\.prof$')
+
+
+def enable(directory, threshold_ms=None, keep=None):
+    global ENABLED, DIRECTORY, THRESHOLD_MS, KEEP
+    DIRECTORY = directory
+    if threshold_ms is not None:
+        THRESHOLD_MS = threshold_ms
+    if keep is not None:
+        KEEP = keep
+    os.makedirs(directory, exist_ok=True)
+    ENABLED = True
+
+
+def start():
+    """Begin profiling the current request, or return None if another is running"""
+    if not _active.acquire(blocking=False):
+        return None
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile
+
+
+def finish(profile, route, method, elapsed_ms, payload_bytes):
+    """Stop profiling; keep the profile only if the request was slow"""
+    profile.disable()
+    _active.release()
+    if elapsed_ms < THRESHOLD_MS:
+        return None
+
+    slug = re.sub(r'[^\w]+', '_', route.split('?', 1)[0]).strip('_') or 'root'
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    name = f'{stamp}_{method.lower()}_{slug}_{int(elapsed_ms)}ms.prof'
+    path = os.path.join(DIRECTORY, name)
+    profile.dump_stats(path)
+    with open(path[:-5] + '.json', 'w', encoding='utf-8') as f:
+        json.dump({
+            'name': name,
+            'route': route,
+            'method': method,
+            'duration_ms': round(elapsed_ms, 2),
+            'payload_bytes': payload_bytes,
+            'captured': datetime.now().isoformat(),
+        }, f)
+    rotate()
+    return name
+
+
+def rotate():
+    """Drop the oldest profiles beyond KEEP"""
+    profiles = sorted(
+        (e for e in os.scandir(DIRECTORY) if e.name.endswith('.prof')),
+        key=lambda e: e.stat().st_mtime,
+    )
+    for entry in profiles[:max(0, len(profiles) - KEEP)]:
+        for path in (entry.path, entry.path[:-5] + '.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def list_profiles():
+    """Metadata for the stored profiles, newest first"""
+    if DIRECTORY is None or not os.path.isdir(DIRECTORY):
+        return []
+    items = []
+    for entry in os.scandir(DIRECTORY):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                items.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    items.sort(key=lambda m: m.get('captured', ''), reverse=True)
+    return items
+
+
+def profile_path(name):
+    """Resolve a profile name from list_profiles(), or None if it is not one of ours"""
+    if DIRECTORY is None or not _SAFE_NAME.match(name):
+        return None
+    path = os.path.join(DIRECTORY, name)
+    return path if os.path.isfile(path) else None
+
+
+def summary(path, limit=40):
+    """Human-readable top functions by cumulative time"""
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
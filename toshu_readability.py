@@ -0,0 +1,268 @@
+"""
+Toshu - readability and style metrics
+Flesch reading ease / Flesch-Kincaid grade, Gunning fog, lexical density,
+sentence-length distribution and repeated words, computed from a
+toshu_text token stream. Per-word facts (syllables, stopword) are looked
+up by vocabulary id (kept per vocabulary); per-paragraph sums are cached
+by content, so an edit only recounts the paragraphs it touched.
+"""
+
+import hashlib
+import re
+import threading
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+
+import toshu_text
+
+VERSION = 1  # bump when any formula or threshold below changes
+PARAGRAPH_CACHE_SIZE = 20000
+COMPLEX_SYLLABLES = 3       # Gunning fog "complex word" threshold
+OVERUSED_MIN_COUNT = 5      # content words seen at least this often...
+OVERUSED_PER_1000 = 4.0     # ...and at least this often per 1000 words
+OVERUSED_LIMIT = 10
+DOUBLED_LIMIT = 100
+LENGTH_BUCKETS = (10, 20, 30, 40)  # sentence-length histogram upper bounds
+
+STOPWORDS = frozenset('''
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you
+your yours yourself yourselves also may might must shall upon via thus however therefore
+'''.split())
+
+_VOWEL_GROUPS = re.compile(r'[aeiouy]+')
+
+
+def count_syllables(word):
+    """Vowel-group estimate; good enough for grade-level formulas"""
+    if not word.isalpha():
+        return 1
+    count = len(_VOWEL_GROUPS.findall(word))
+    if word.endswith('e') and not word.endswith(('le', 'ee', 'ye')) and count > 1:
+        count -= 1
+    elif word.endswith('es') and not word.endswith(('ses', 'zes', 'ces', 'ges', 'xes')) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+class _WordFacts:
+    """Syllable count and stopword flag per vocabulary id, filled in as the vocabulary grows"""
+
+    def __init__(self):
+        self.syllables = array('B')
+        self.content = array('B')
+        self._lock = threading.Lock()
+
+    def sync(self, words):
+        if len(self.syllables) == len(words):
+            return
+        with self._lock:
+            for wid in range(len(self.syllables), len(words)):
+                word = words[wid]
+                self.syllables.append(min(255, count_syllables(word)))
+                self.content.append(word.isalpha() and word not in STOPWORDS)
+
+
+class ParagraphMetrics:
+    __slots__ = ('words', 'syllables', 'complex', 'content', 'sentence_lengths', 'doubled')
+
+    def __init__(self, words, syllables, complex_words, content, sentence_lengths, doubled):
+        self.words = words
+        self.syllables = syllables
+        self.complex = complex_words
+        self.content = content
+        self.sentence_lengths = sentence_lengths
+        self.doubled = doubled  # word indexes relative to the paragraph start
+
+
+class ReadabilityEngine:
+    def __init__(self, cache_size=PARAGRAPH_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._facts = weakref.WeakKeyDictionary()  # Vocabulary -> _WordFacts
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def facts(self, vocab):
+        with self._lock:
+            facts = self._facts.get(vocab)
+            if facts is None:
+                facts = self._facts[vocab] = _WordFacts()
+        facts.sync(vocab.words)
+        return facts
+
+    def _paragraph(self, vocab, facts, ids, sentence_starts):
+        """Metrics for one paragraph: ``ids`` view plus its sentence starts (relative)"""
+        key = hashlib.blake2b(ids, digest_size=16, salt=vocab.generation.to_bytes(8, 'little'))
+        key.update(sentence_starts)
+        key = key.digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        syllable_of = facts.syllables
+        content_of = facts.content
+        syllables = complex_words = content = 0
+        doubled = []
+        previous = -1
+        for i, wid in enumerate(ids):
+            s = syllable_of[wid]
+            syllables += s
+            if s >= COMPLEX_SYLLABLES:
+                complex_words += 1
+            if content_of[wid]:
+                content += 1
+            if wid == previous:
+                doubled.append(i)
+            previous = wid
+        bounds = list(sentence_starts) + [len(ids)]
+        lengths = array('I', (bounds[k + 1] - bounds[k] for k in range(len(bounds) - 1)))
+        metrics = ParagraphMetrics(len(ids), syllables, complex_words, content, lengths, doubled)
+
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = metrics
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return metrics
+
+    def _sums(self, stream):
+        facts = self.facts(stream.vocab)
+        sentences = stream.sentences
+        words = syllables = complex_words = content = 0
+        lengths = array('I')
+        doubled = []
+        for p in range(stream.paragraph_count):
+            first, last = stream.paragraph_span(p)
+            lo = bisect_left(sentences, first)
+            hi = bisect_left(sentences, last)
+            relative = array('I', (sentences[k] - first for k in range(lo, hi)))
+            metrics = self._paragraph(stream.vocab, facts, stream.paragraph_ids(p), relative)
+            words += metrics.words
+            syllables += metrics.syllables
+            complex_words += metrics.complex
+            content += metrics.content
+            lengths.extend(metrics.sentence_lengths)
+            doubled.extend(first + i for i in metrics.doubled)
+        doubled = [{'word': stream.token(i), 'offset': stream.starts[i]}
+                   for i in doubled if stream.gap(i - 1).isspace()][:DOUBLED_LIMIT]
+        return facts, words, syllables, complex_words, content, lengths, doubled
+
+    def analyse(self, stream):
+        facts, words, syllables, complex_words, content, lengths, doubled = self._sums(stream)
+        frequent = ((stream.vocab.words[wid], n) for wid, n in Counter(stream.ids).most_common()
+                    if facts.content[wid])
+        return _summarise(words, syllables, complex_words, content, lengths, doubled, frequent)
+
+    def partial(self, stream):
+        """Sums for one paragraph-aligned chunk of a document; merge() combines them"""
+        facts, words, syllables, complex_words, content, lengths, doubled = self._sums(stream)
+        return {
+            'characters': len(stream.text),
+            'words': words,
+            'syllables': syllables,
+            'complex': complex_words,
+            'content': content,
+            'lengths': lengths,
+            'doubled': doubled,
+            'frequent': {stream.vocab.words[wid]: n for wid, n in Counter(stream.ids).items()
+                         if facts.content[wid]},
+        }
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _summarise(words, syllables, complex_words, content, lengths, doubled, frequent):
+    """The readability result; ``frequent`` is (content word, count), most common first"""
+    sentences = len(lengths)
+    if not words or not sentences:
+        return {
+            'words': 0, 'sentences': 0, 'fleschReadingEase': None, 'fleschKincaidGrade': None,
+            'gunningFog': None, 'lexicalDensity': None, 'sentenceLengths': None,
+            'repeatedWords': {'doubled': [], 'overused': []},
+        }
+    wps = words / sentences
+    spw = syllables / words
+    ordered = sorted(lengths)
+    histogram = [0] * (len(LENGTH_BUCKETS) + 1)
+    for n in lengths:
+        histogram[bisect_left(LENGTH_BUCKETS, n)] += 1
+    labels = []
+    low = 1
+    for high in LENGTH_BUCKETS:
+        labels.append(f'{low}-{high}')
+        low = high + 1
+    labels.append(f'{low}+')
+
+    threshold = max(OVERUSED_MIN_COUNT, OVERUSED_PER_1000 * words / 1000)
+    overused = [
+        {'word': word, 'count': n, 'per1000': round(n * 1000 / words, 1)}
+        for word, n in frequent
+        if n >= threshold
+    ][:OVERUSED_LIMIT]
+
+    return {
+        'words': words,
+        'sentences': sentences,
+        'syllablesPerWord': round(spw, 2),
+        'fleschReadingEase': round(206.835 - 1.015 * wps - 84.6 * spw, 1),
+        'fleschKincaidGrade': round(0.39 * wps + 11.8 * spw - 15.59, 1),
+        'gunningFog': round(0.4 * (wps + 100 * complex_words / words), 1),
+        'lexicalDensity': round(content / words, 3),
+        'sentenceLengths': {
+            'mean': round(wps, 1),
+            'median': _percentile(ordered, 0.5),
+            'p90': _percentile(ordered, 0.9),
+            'max': ordered[-1],
+            'histogram': dict(zip(labels, histogram)),
+        },
+        'repeatedWords': {
+            'doubled': doubled,
+            'overused': overused,
+        },
+    }
+
+
+_engine = ReadabilityEngine()
+
+
+def analyse(stream):
+    return _engine.analyse(stream)
+
+
+def analyse_text(text):
+    """partial() of plain text; run in pool workers, one call per chunk"""
+    return _engine.partial(toshu_text.tokenize(text))
+
+
+def merge(partials):
+    """The analyse() result for the whole text, from its chunks' partials in order"""
+    words = syllables = complex_words = content = offset = 0
+    lengths = array('I')
+    doubled = []
+    frequent = Counter()
+    for partial in partials:
+        words += partial['words']
+        syllables += partial['syllables']
+        complex_words += partial['complex']
+        content += partial['content']
+        lengths.extend(partial['lengths'])
+        doubled.extend({'word': d['word'], 'offset': d['offset'] + offset} for d in partial['doubled'])
+        frequent.update(partial['frequent'])
+        offset += partial['characters']
+    return _summarise(words, syllables, complex_words, content, lengths, doubled[:DOUBLED_LIMIT],
+                      frequent.most_common())
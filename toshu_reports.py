@@ -0,0 +1,130 @@
+"""
+Toshu - streaming report writer
+Rows are written to disk as they are produced (text, JSONL or CSV), split
+into numbered parts once a size limit is reached and optionally gzipped
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+
+REPORTS_DIR = 'logs'
+FORMATS = {'text': '.txt', 'jsonl': '.jsonl', 'csv': '.csv'}
+GZIP_FLUSH_BYTES = 1024 * 1024  # most input zlib may buffer before a part's size is measured
+
+
+class ReportWriter:
+    """Write report rows one at a time; memory use does not grow with report size
+
+    text  : each row is a section (str) or a dict printed as "key: value" lines
+    jsonl : each row is one JSON object per line
+    csv   : each row is a dict; the header comes from the first row and is
+            repeated at the top of every part
+    """
+
+    def __init__(self, prefix, fmt='text', directory=REPORTS_DIR, max_bytes=None, compress=False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown report format {fmt!r} (choose from {', '.join(FORMATS)})")
+        self.prefix = prefix
+        self.fmt = fmt
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.paths = []
+        self.rows = 0
+        self._stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._file = None
+        self._raw = None
+        self._buf = io.StringIO()
+        self._csv = None
+        self._written = 0
+        self._pending = 0  # input not yet flushed through zlib
+        # Flush often enough that a compressed part overshoots max_bytes
+        # by a small fraction at most
+        self._flush_bytes = min(GZIP_FLUSH_BYTES, max(1, max_bytes // 16)) if max_bytes else None
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_part(self):
+        part = len(self.paths) + 1
+        suffix = '' if part == 1 else f'.part{part}'
+        name = f'{self.prefix}_{self._stamp}{suffix}{FORMATS[self.fmt]}'
+        if self.compress:
+            name += '.gz'
+        path = os.path.join(self.directory, name)
+        self._raw = open(path, 'wb')
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='wb') if self.compress else self._raw
+        self.paths.append(path)
+        self._written = 0
+        self._pending = 0
+        if self._csv is not None:
+            self._emit(self._csv_line(self._csv.writeheader))
+
+    def _csv_line(self, write, *args):
+        # Format through a small buffer so every format is counted the same way
+        self._buf.seek(0)
+        self._buf.truncate()
+        write(*args)
+        return self._buf.getvalue()
+
+    def _emit(self, data):
+        data = data.encode('utf-8')
+        self._file.write(data)
+        if self.compress:
+            self._pending += len(data)
+            if self._flush_bytes and self._pending >= self._flush_bytes:
+                self._file.flush()
+                self._pending = 0
+            self._written = self._raw.tell()
+        else:
+            self._written += len(data)
+
+    def _render(self, row):
+        if self.fmt == 'csv':
+            return self._csv_line(self._csv.writerow, row)
+        if self.fmt == 'jsonl':
+            return json.dumps(row, ensure_ascii=False) + '\n'
+        if isinstance(row, dict):
+            return '\n'.join(f'  {key}: {value}' for key, value in row.items()) + '\n\n'
+        return str(row).rstrip('\n') + '\n'
+
+    def write(self, row):
+        if self.fmt == 'csv' and self._csv is None:
+            self._csv = csv.DictWriter(self._buf, fieldnames=list(row), extrasaction='ignore')
+        if self._file is None:
+            self._open_part()
+        elif self.max_bytes and self._written >= self.max_bytes:
+            self._close_part()
+            self._open_part()
+        self._emit(self._render(row))
+        self.rows += 1
+
+    def write_all(self, rows):
+        for row in rows:
+            self.write(row)
+        return self
+
+    def _close_part(self):
+        self._file.close()
+        self._raw.close()  # GzipFile leaves the file it wraps open
+
+    def close(self):
+        if self._file is not None:
+            self._close_part()
+            self._file = None
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stream_report(rows, prefix, fmt='text', **options):
+    """Write an iterable of rows and return the list of files written"""
+    with ReportWriter(prefix, fmt, **options) as writer:
+        writer.write_all(rows)
+    return writer.paths
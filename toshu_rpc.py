@@ -0,0 +1,351 @@
+"""Pipelined JSON-RPC over newline-delimited JSON (stdin/stdout).
+
+Wire format, one JSON object per line:
+
+    request   {"id": 7, "method": "academize", "params": {...}}
+    partial   {"id": 7, "partial": {...}}          zero or more, streamed
+    result    {"id": 7, "result": {...}}           exactly one of result/error
+    error     {"id": 7, "error": {"code": -32601, "message": "..."}}
+    cancel    {"method": "$/cancel", "params": {"id": 7}}
+    heartbeat {"id": 8, "method": "$/ping"}  ->  {"id": 8, "result": {"pid": ..., "rss_kb": ...}}
+
+Any number of requests may be in flight; responses are matched by ``id``
+and can arrive in any order. ``RpcServer`` is what the sidecar mounts its
+methods on; ``SidecarClient`` replaces the old one-at-a-time
+``send_request``/``read_response`` helpers.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, IO, List, Optional
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+REQUEST_CANCELLED = -32800
+
+CANCEL_METHOD = "$/cancel"
+PING_METHOD = "$/ping"
+
+
+def current_rss_kb() -> Optional[int]:
+    """Resident memory of this process, best effort across platforms."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    try:
+        import psutil  # optional
+        return psutil.Process().memory_info().rss // 1024
+    except Exception:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # peak, not current
+    except Exception:
+        return None
+
+
+class RpcError(Exception):
+    """Error response from the sidecar, or a dead connection (code None)."""
+
+    def __init__(self, message: str, code: Optional[int] = None, data: Any = None) -> None:
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class RpcCancelled(RpcError):
+    pass
+
+
+class RequestContext:
+    """Handed to handlers registered with ``context=True``."""
+
+    def __init__(self, server: "RpcServer", request_id: Any) -> None:
+        self._server = server
+        self.id = request_id
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def partial(self, data: Any) -> None:
+        """Stream an intermediate result to the client."""
+        if not self.cancelled:
+            self._server.send({"id": self.id, "partial": data})
+
+
+class RpcServer:
+    """Dispatch requests read from a stream to a worker pool.
+
+    Usage inside the sidecar::
+
+        server = RpcServer(workers=4)
+        server.register("academize", academize)
+        server.register("auto_ingest", auto_ingest, context=True)
+        server.serve()
+    """
+
+    def __init__(self, workers: int = 4) -> None:
+        self._methods: Dict[str, Any] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rpc-worker")
+        self._write_lock = threading.Lock()
+        self._inflight: Dict[Any, RequestContext] = {}
+        self._inflight_lock = threading.Lock()
+        self._out: IO[str] = sys.stdout
+
+    def register(self, name: str, handler: Callable[..., Any], context: bool = False) -> None:
+        """Expose ``handler(params)``, or ``handler(params, ctx)`` when ``context`` is set."""
+        self._methods[name] = (handler, context)
+
+    def send(self, message: Dict[str, Any]) -> None:
+        line = json.dumps(message, ensure_ascii=False)
+        with self._write_lock:
+            self._out.write(line + "\n")
+            self._out.flush()
+
+    def serve(self, infile: Optional[IO[str]] = None, outfile: Optional[IO[str]] = None) -> None:
+        """Read requests until EOF, then wait for in-flight work to finish."""
+        infile = infile or sys.stdin
+        self._out = outfile or sys.stdout
+        for line in infile:
+            line = line.strip()
+            if line:
+                self.handle_line(line)
+        self._executor.shutdown(wait=True)
+
+    def handle_line(self, line: str) -> None:
+        try:
+            message = json.loads(line)
+        except ValueError as exc:
+            self.send({"id": None, "error": {"code": PARSE_ERROR, "message": str(exc)}})
+            return
+
+        method = message.get("method")
+        if method == CANCEL_METHOD:
+            self._cancel((message.get("params") or {}).get("id"))
+            return
+
+        request_id = message.get("id")
+        if method == PING_METHOD:
+            # Answered on the reader thread so a saturated pool still looks alive
+            self.send({"id": request_id, "result": {"pid": os.getpid(), "rss_kb": current_rss_kb()}})
+            return
+
+        entry = self._methods.get(method)
+        if entry is None:
+            self.send({"id": request_id, "error": {"code": METHOD_NOT_FOUND, "message": f"Unknown method: {method}"}})
+            return
+
+        ctx = RequestContext(self, request_id)
+        with self._inflight_lock:
+            self._inflight[request_id] = ctx
+        self._executor.submit(self._run, entry, message.get("params") or {}, ctx)
+
+    def _cancel(self, request_id: Any) -> None:
+        with self._inflight_lock:
+            ctx = self._inflight.get(request_id)
+        if ctx is not None:
+            ctx._cancelled.set()
+
+    def _run(self, entry: Any, params: Dict[str, Any], ctx: RequestContext) -> None:
+        handler, wants_context = entry
+        try:
+            if ctx.cancelled:
+                raise RpcCancelled("Request cancelled", REQUEST_CANCELLED)
+            result = handler(params, ctx) if wants_context else handler(params)
+            if ctx.cancelled:
+                raise RpcCancelled("Request cancelled", REQUEST_CANCELLED)
+            reply: Dict[str, Any] = {"id": ctx.id, "result": result}
+        except RpcError as exc:
+            reply = {"id": ctx.id, "error": {"code": exc.code, "message": str(exc)}}
+        except Exception as exc:
+            reply = {"id": ctx.id, "error": {"code": INTERNAL_ERROR, "message": str(exc)}}
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(ctx.id, None)
+        self.send(reply)
+
+
+class RpcFuture(Future):
+    """Future for one in-flight call; ``cancel()`` also tells the sidecar."""
+
+    def __init__(self, client: "SidecarClient", request_id: int,
+                 on_partial: Optional[Callable[[Any], None]] = None) -> None:
+        super().__init__()
+        self.request_id = request_id
+        self.on_partial = on_partial
+        self._client = client
+
+    def cancel(self) -> bool:
+        # Whoever pops the pending entry first (us or the reader) owns the outcome
+        if self._client._forget(self.request_id) is None:
+            return False
+        try:
+            self._client._send({"method": CANCEL_METHOD, "params": {"id": self.request_id}})
+        except Exception:
+            pass
+        self.set_exception(RpcCancelled("Request cancelled", REQUEST_CANCELLED))
+        return True
+
+
+def default_sidecar_command() -> List[str]:
+    return [sys.executable, os.path.join("sidecar", "sidecar.py")]
+
+
+class SidecarClient:
+    """Talk to a sidecar process with many requests in flight.
+
+        with SidecarClient(cwd=project_root) as client:
+            preview = client.call_async("build_preview", {"text": md})
+            academic = client.call("academize", {"text": para})
+            preview.result(timeout=10)
+    """
+
+    def __init__(self, command: Optional[List[str]] = None, cwd: Optional[str] = None,
+                 proc: Optional[subprocess.Popen] = None) -> None:
+        self.command = command or default_sidecar_command()
+        self.cwd = cwd
+        self.proc = proc
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, RpcFuture] = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+        self._exited = False  # reader hit EOF; the process may not be reaped yet
+        if proc is not None:
+            self._start_reader()
+
+    def start(self) -> "SidecarClient":
+        if self.proc is None:
+            self.proc = subprocess.Popen(
+                self.command,
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+            )
+            self._start_reader()
+        return self
+
+    def __enter__(self) -> "SidecarClient":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @property
+    def pending(self) -> int:
+        with self._pending_lock:
+            return len(self._pending)
+
+    @property
+    def running(self) -> bool:
+        return self.proc is not None and not self._exited and self.proc.poll() is None
+
+    def call_async(self, method: str, params: Optional[Dict[str, Any]] = None,
+                   on_partial: Optional[Callable[[Any], None]] = None) -> RpcFuture:
+        """Send a request without waiting; ``on_partial`` receives streamed chunks."""
+        request_id = next(self._ids)
+        future = RpcFuture(self, request_id, on_partial)
+        future.set_running_or_notify_cancel()
+        with self._pending_lock:
+            exited = self._exited
+            if not exited:
+                self._pending[request_id] = future
+        if exited:
+            future.set_exception(RpcError("Sidecar exited"))
+            return future
+        try:
+            self._send({"id": request_id, "method": method, "params": params or {}})
+        except Exception as exc:
+            self._forget(request_id)
+            future.set_exception(RpcError(f"Sidecar unavailable: {exc}"))
+        return future
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None,
+             timeout: Optional[float] = None) -> Any:
+        return self.call_async(method, params).result(timeout=timeout)
+
+    def close(self, timeout: float = 5) -> None:
+        proc = self.proc
+        if proc is None:
+            return
+        try:
+            if proc.stdin is not None:
+                proc.stdin.close()
+            proc.wait(timeout=timeout)
+        except Exception:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        if self._reader is not None:
+            self._reader.join(timeout=timeout)
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        if self.proc is None or self.proc.stdin is None:
+            raise RuntimeError("Process stdin is not available")
+        line = json.dumps(message, ensure_ascii=False)
+        with self._write_lock:
+            self.proc.stdin.write(line + "\n")
+            self.proc.stdin.flush()
+
+    def _forget(self, request_id: int) -> Optional[RpcFuture]:
+        with self._pending_lock:
+            return self._pending.pop(request_id, None)
+
+    def _start_reader(self) -> None:
+        self._reader = threading.Thread(target=self._read_loop, name="sidecar-reader", daemon=True)
+        self._reader.start()
+
+    def _read_loop(self) -> None:
+        stdout = self.proc.stdout if self.proc is not None else None
+        if stdout is None:
+            return
+        for line in stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue  # stray print() output from the sidecar
+            self._dispatch(message)
+        # Sidecar exited: fail whatever is still waiting
+        with self._pending_lock:
+            self._exited = True
+            orphans = list(self._pending.values())
+            self._pending.clear()
+        for future in orphans:
+            if not future.done():
+                future.set_exception(RpcError("Sidecar exited"))
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        request_id = message.get("id")
+        if "partial" in message:
+            with self._pending_lock:
+                future = self._pending.get(request_id)
+            if future is not None and future.on_partial is not None:
+                future.on_partial(message["partial"])
+            return
+
+        future = self._forget(request_id)
+        if future is None or future.done():
+            return
+        if "error" in message:
+            error = message["error"]
+            if isinstance(error, dict):
+                cls = RpcCancelled if error.get("code") == REQUEST_CANCELLED else RpcError
+                future.set_exception(cls(str(error.get("message")), error.get("code"), error.get("data")))
+            else:
+                future.set_exception(RpcError(str(error)))
+        else:
+            future.set_result(message.get("result"))
@@ -0,0 +1,439 @@
+"""
+Toshu - offline spelling
+Word lists in dictionaries/ (plain, "word count" or Hunspell .dic) are
+compiled once into a binary file that is memory-mapped on later starts:
+an open-addressing hash table for exact lookups and a sorted
+single-deletion index (SymSpell, edit distance 1) for suggestions. The
+user dictionary is a small text file kept in a set. Verdicts are cached
+per vocabulary id, so each distinct word is looked up once and an edit
+only checks words the document has not used before.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import weakref
+import zlib
+from array import array
+from bisect import bisect_left
+
+VERSION = 1  # bump when the checking rules below change
+_HERE = os.path.dirname(os.path.abspath(__file__))
+DICTIONARY_DIR = os.environ.get('TOSHU_DICTIONARY_DIR', os.path.join(_HERE, 'dictionaries'))
+USER_DICTIONARY_PATH = os.path.join(_HERE, 'data', 'user_dictionary.txt')
+COMPILED_DIR = os.path.join(_HERE, 'data', 'spelling')
+SUGGESTION_LIMIT = 3
+ISSUE_LIMIT = 20
+MAX_WORD_CHARS = 40
+STAMP_INTERVAL = 2.0  # seconds between checks for changed word lists on disk
+
+# Compiled layout: header, then uint32 sections (word offsets, hash table
+# of word index + 1, sorted deletion hashes, matching word indexes), then
+# the UTF-8 words back to back, most frequent first
+_MAGIC = b'TSD1'
+_HEADER = struct.Struct('<4sIIII')  # magic, words, table slots, deletions, blob bytes
+_SUFFIX = '.tsd'
+_SOURCES = ('.txt', '.dic')
+_APOSTROPHES = str.maketrans({'’': "'", 'ʼ': "'"})
+
+_UNKNOWN, _KNOWN, _MISSPELLED = 0, 1, 2
+
+
+def _hash(data):
+    return zlib.crc32(data)
+
+
+def _deletions(word):
+    """The word and every string one deletion away from it"""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def within_one_edit(a, b):
+    """True when ``b`` is one insertion, deletion, substitution or adjacent swap from ``a``"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        return i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    if la > lb:
+        return a[i + 1:] == b[i:]
+    return a[i:] == b[i + 1:]
+
+
+def read_word_list(path):
+    """Lower-cased words of a word list in file order, duplicates dropped"""
+    words = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for n, line in enumerate(f):
+            word = line.split('/', 1)[0].split(None, 1)[0] if line.strip() else ''
+            if not word or word.startswith('#') or (n == 0 and word.isdigit()):
+                continue  # blank, comment or the Hunspell entry count
+            words.setdefault(word.translate(_APOSTROPHES).lower(), None)
+    return list(words)
+
+
+def compile_dictionary(words, target):
+    """Write ``words`` (most frequent first) as a compiled dictionary at ``target``"""
+    encoded = [w.encode('utf-8') for w in words]
+    offsets = array('I', [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    slots = 1
+    while slots < len(encoded) * 2:
+        slots *= 2
+    table = array('I', bytes(4 * slots))
+    for index, data in enumerate(encoded):
+        slot = _hash(data) & (slots - 1)
+        while table[slot]:
+            slot = (slot + 1) & (slots - 1)
+        table[slot] = index + 1
+
+    pairs = array('Q')
+    for index, word in enumerate(words):
+        pairs.extend(_hash(d.encode('utf-8')) << 32 | index for d in _deletions(word))
+    pairs = sorted(pairs)
+    delete_hashes = array('I', (p >> 32 for p in pairs))
+    delete_words = array('I', (p & 0xFFFFFFFF for p in pairs))
+    del pairs
+
+    sections = [offsets, table, delete_hashes, delete_words]
+    if sys.byteorder != 'little':
+        for section in sections:
+            section.byteswap()
+    tmp = target + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(encoded), slots, len(delete_hashes), offsets[-1]))
+        for section in sections:
+            section.tofile(f)
+        f.write(b''.join(encoded))
+    os.replace(tmp, target)
+
+
+class Dictionary:
+    """A compiled dictionary, memory-mapped read-only"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, slots, deletions, blob = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            self._map.close()
+            raise ValueError(f'not a compiled dictionary: {path}')
+        self.count = count
+        self._mask = slots - 1
+        position = _HEADER.size
+        self._views = []
+        sections = []
+        for length in (count + 1, slots, deletions, deletions):
+            view = memoryview(self._map)[position:position + 4 * length]
+            self._views.append(view)
+            if sys.byteorder == 'little':
+                section = view.cast('I')
+                self._views.append(section)
+            else:
+                section = array('I', view)
+                section.byteswap()
+            sections.append(section)
+            position += 4 * length
+        self._offsets, self._table, self._delete_hashes, self._delete_words = sections
+        self._blob = memoryview(self._map)[position:position + blob]
+        self._views.append(self._blob)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return len(self._map)
+
+    def word(self, index):
+        return bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode('utf-8')
+
+    def __contains__(self, word):
+        data = word.encode('utf-8')
+        slot = _hash(data) & self._mask
+        while True:
+            index = self._table[slot]
+            if not index:
+                return False
+            if self._blob[self._offsets[index - 1]:self._offsets[index]] == data:
+                return True
+            slot = (slot + 1) & self._mask
+
+    def candidates(self, word):
+        """(rank, word) for dictionary words within one edit of ``word``"""
+        found = set()
+        hashes = self._delete_hashes
+        for deletion in _deletions(word):
+            h = _hash(deletion.encode('utf-8'))
+            i = bisect_left(hashes, h)
+            while i < len(hashes) and hashes[i] == h:
+                found.add(self._delete_words[i])
+                i += 1
+        matches = []
+        for index in found:
+            candidate = self.word(index)
+            if candidate != word and within_one_edit(word, candidate):
+                matches.append((index, candidate))
+        return matches
+
+    def close(self):
+        self._offsets = self._table = self._delete_hashes = self._delete_words = self._blob = None
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+
+def load_dictionary(source, compiled_dir=None):
+    """Dictionary for the word list at ``source``, compiling it on first use
+
+    The compiled file is named after the source's size and modification
+    time, so an edited list is recompiled and an unchanged one never parsed.
+    """
+    if compiled_dir is None:
+        compiled_dir = COMPILED_DIR
+    st = os.stat(source)
+    stamp = hashlib.blake2b(f'{st.st_size}:{st.st_mtime_ns}'.encode(), digest_size=8).hexdigest()
+    name = os.path.splitext(os.path.basename(source))[0]
+    target = os.path.join(compiled_dir, f'{name}-{stamp}{_SUFFIX}')
+    if not os.path.exists(target):
+        os.makedirs(compiled_dir, exist_ok=True)
+        compile_dictionary(read_word_list(source), target)
+        for old in os.listdir(compiled_dir):
+            if old.startswith(name + '-') and old.endswith(_SUFFIX) and old != os.path.basename(target):
+                try:
+                    os.remove(os.path.join(compiled_dir, old))
+                except OSError:
+                    pass  # still mapped by another process (Windows)
+    return Dictionary(target)
+
+
+class SpellChecker:
+    def __init__(self, dictionaries, user_words=()):
+        self.dictionaries = dictionaries
+        self.user_words = {w.translate(_APOSTROPHES).lower() for w in user_words}
+        self.verdicts = weakref.WeakKeyDictionary()  # Vocabulary -> array of verdicts by id
+        self._lock = threading.Lock()
+        identity = hashlib.blake2b(digest_size=8)
+        for d in dictionaries:
+            identity.update(os.path.basename(d.path).encode() + b'\0')
+        for w in sorted(self.user_words):
+            identity.update(w.encode('utf-8') + b'\n')
+        self.fingerprint = identity.hexdigest()
+
+    @property
+    def active(self):
+        return bool(self.dictionaries)
+
+    def _lookup(self, word):
+        return word in self.user_words or any(word in d for d in self.dictionaries)
+
+    def known(self, word):
+        """Whether a lower-cased token is spelled correctly (or not worth checking)"""
+        word = word.translate(_APOSTROPHES)
+        if len(word) < 2 or len(word) > MAX_WORD_CHARS or not word.replace("'", '').replace('-', '').isalpha():
+            return True
+        if self._lookup(word):
+            return True
+        if word.endswith("'s") and self._lookup(word[:-2]):
+            return True
+        if '-' in word:
+            return all(not part or self.known(part) for part in word.split('-'))
+        return False
+
+    def suggest(self, word, limit=SUGGESTION_LIMIT):
+        word = word.translate(_APOSTROPHES)
+        ranked = {}
+        for d in self.dictionaries:
+            for rank, candidate in d.candidates(word):
+                ranked[candidate] = min(rank, ranked.get(candidate, rank))
+        for candidate in self.user_words:
+            if within_one_edit(word, candidate) and candidate != word:
+                ranked[candidate] = -1
+        return sorted(ranked, key=ranked.get)[:limit]
+
+    def _verdicts(self, vocab, ids):
+        words = vocab.words
+        with self._lock:
+            verdicts = self.verdicts.get(vocab)
+            if verdicts is None:
+                verdicts = self.verdicts[vocab] = array('B')
+            if len(verdicts) < len(words):
+                verdicts.extend(bytes(len(words) - len(verdicts)))
+            for wid in ids:
+                if not verdicts[wid]:
+                    verdicts[wid] = _KNOWN if self.known(words[wid]) else _MISSPELLED
+        return verdicts
+
+    def scan(self, stream, start_word=0, end_word=None):
+        """{lower-cased word: count} for misspellings among words ``start_word``..``end_word``
+
+        Proper nouns (capitalised mid-sentence), acronyms and mixed-case
+        names are left alone.
+        """
+        if not self.active:
+            return {}
+        if end_word is None:
+            end_word = stream.word_count
+        ids = stream.ids
+        distinct = set(ids[start_word:end_word])
+        verdicts = self._verdicts(stream.vocab, distinct)
+        bad = [wid for wid in distinct if verdicts[wid] == _MISSPELLED]
+        if not bad:
+            return {}
+        sentences = stream.sentences
+        found = []
+        for wid in bad:
+            count = 0
+            first = None
+            i = ids.index(wid, start_word, end_word)
+            while True:
+                token = stream.token(i)
+                if not any(c.isupper() for c in token[1:]) and (
+                        not token[0].isupper() or _starts_sentence(sentences, i)):
+                    count += 1
+                    if first is None:
+                        first = i
+                try:
+                    i = ids.index(wid, i + 1, end_word)
+                except ValueError:
+                    break
+            if count:
+                found.append((first, stream.vocab.words[wid], count))
+        found.sort()
+        return {word: count for _, word, count in found}
+
+
+def _starts_sentence(sentences, i):
+    k = bisect_left(sentences, i)
+    return k < len(sentences) and sentences[k] == i
+
+
+def _user_words(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+
+def _sources():
+    """(path, size and mtime) of every word list, in load order"""
+    if not os.path.isdir(DICTIONARY_DIR):
+        return ()
+    paths = (os.path.join(DICTIONARY_DIR, name) for name in sorted(os.listdir(DICTIONARY_DIR))
+             if name.endswith(_SOURCES))
+    return tuple((path, _stamp(path)) for path in paths)
+
+
+_checker = None
+_checker_stamp = None
+_checked_at = None
+_checker_lock = threading.Lock()
+_loaded = {}  # word list path -> (size and mtime, Dictionary)
+
+
+def checker(expected=None):
+    """The shared SpellChecker, reloaded when the word lists or user dictionary change
+
+    The files are looked at no more than every STAMP_INTERVAL seconds,
+    or straight away when ``expected`` (another process's fingerprint())
+    differs from ours. Worker processes call this too; reloading maps
+    the compiled files rather than parsing the word lists again.
+    """
+    global _checker, _checker_stamp, _checked_at
+    with _checker_lock:
+        now = time.monotonic()
+        if (_checker is not None and _checked_at is not None and now - _checked_at < STAMP_INTERVAL
+                and (expected is None or expected == f'{VERSION}.{_checker.fingerprint}')):
+            return _checker
+        _checked_at = now
+        # Each list's own size and mtime: editing a list in place leaves
+        # the directory's mtime alone
+        sources = _sources()
+        stamp = (sources, _stamp(USER_DICTIONARY_PATH))
+        if _checker is None or stamp != _checker_stamp:
+            dictionaries = []
+            for source, source_stamp in sources:
+                if source_stamp is None:
+                    continue  # removed since the listing
+                loaded = _loaded.get(source)
+                if loaded is None or loaded[0] != source_stamp:
+                    loaded = _loaded[source] = (source_stamp, load_dictionary(source))
+                dictionaries.append(loaded[1])
+            _checker = SpellChecker(dictionaries, _user_words(USER_DICTIONARY_PATH))
+            _checker_stamp = stamp
+        return _checker
+
+
+def fingerprint():
+    return f'{VERSION}.{checker().fingerprint}'
+
+
+def user_words():
+    return sorted(checker().user_words)
+
+
+def invalidate():
+    """Make the next checker() call look at the files again"""
+    global _checked_at
+    with _checker_lock:
+        _checked_at = None
+
+
+def set_user_words(words):
+    """Replace the user dictionary file; the next checker() call picks it up"""
+    words = sorted({w.strip().translate(_APOSTROPHES).lower() for w in words if w.strip()})
+    os.makedirs(os.path.dirname(USER_DICTIONARY_PATH), exist_ok=True)
+    tmp = USER_DICTIONARY_PATH + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(''.join(w + '\n' for w in words))
+    os.replace(tmp, USER_DICTIONARY_PATH)
+    invalidate()
+    return words
+
+
+def scan(stream, start_word=0, end_word=None):
+    return checker().scan(stream, start_word, end_word)
+
+
+def issues(misspelled, limit=ISSUE_LIMIT):
+    spell = checker()
+    result = []
+    for word, count in misspelled.items():
+        if limit is not None and len(result) >= limit:
+            break
+        suggestions = spell.suggest(word)
+        result.append({
+            'id': 'spelling-' + word,
+            'text': word if count == 1 else f'{word} ({count} times)',
+            'suggestion': ('Did you mean ' + ', '.join(f'"{s}"' for s in suggestions) + '?') if suggestions
+                          else 'Check the spelling or add the word to your dictionary',
+            'type': 'spelling',
+            'severity': 'error',
+            'word': word,
+            'suggestions': suggestions
+        })
+    return result
@@ -0,0 +1,281 @@
+"""Keep a pool of warm sidecar processes.
+
+Spawning ``sidecar/sidecar.py`` pays the interpreter and model import cost
+on every use. ``SidecarSupervisor`` starts N workers once, hands each call
+to an idle one, and replaces workers that crash, stop answering heartbeats,
+time out on a call, or grow past a memory limit. Replacements start on a
+background thread; calls go to the remaining warm workers meanwhile.
+
+    supervisor = SidecarSupervisor(workers=2, cwd=project_root).start()
+    text = supervisor.call("academize", {"text": paragraph}, timeout=10)
+    supervisor.stats()   # queue depth, per-worker state, per-method latency
+
+Nothing in this tree calls the sidecar yet: ``sidecar/sidecar.py`` is not
+part of it, and test_new_rpc.py talks to a single SidecarClient. Routing
+the sidecar calls through a supervisor is left until that process lands;
+test_supervisor.py exercises the pool against a stand-in RpcServer script.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import threading
+import time
+
+from toshu_rpc import PING_METHOD, RpcError, SidecarClient
+import toshu_metrics
+
+LATENCY_WINDOW = 256  # recent samples kept per method for percentiles
+
+
+class _Worker:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.client: Optional[SidecarClient] = None
+        self.busy = False
+        self.spawning = False
+        self.served = 0
+        self.restarts = 0
+        self.rss_kb: Optional[int] = None
+        self.started_at = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.client is not None and self.client.running
+
+
+def _discard(client: SidecarClient) -> None:
+    if client.proc is not None:
+        try:
+            client.proc.kill()
+        except Exception:
+            pass
+    client.close(timeout=2)
+
+
+class SidecarSupervisor:
+    def __init__(self, workers: int = 2, command: Optional[List[str]] = None, cwd: Optional[str] = None,
+                 call_timeout: float = 60.0, startup_timeout: float = 60.0,
+                 heartbeat_interval: float = 5.0, heartbeat_timeout: float = 2.0,
+                 max_rss_mb: Optional[float] = None, max_requests: Optional[int] = None) -> None:
+        self.command = command
+        self.cwd = cwd
+        self.call_timeout = call_timeout
+        self.startup_timeout = startup_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_rss_kb = int(max_rss_mb * 1024) if max_rss_mb else None
+        self.max_requests = max_requests
+        self._workers = [_Worker(i) for i in range(workers)]
+        self._cond = threading.Condition()
+        self._waiting = 0
+        self._latency: Dict[str, Deque[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._closed = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers) * 2, thread_name_prefix="sidecar-call")
+        self._monitor: Optional[threading.Thread] = None
+
+    # Lifecycle
+
+    def start(self) -> "SidecarSupervisor":
+        for worker in self._workers:
+            self._spawn(worker)
+        self._monitor = threading.Thread(target=self._monitor_loop, name="sidecar-monitor", daemon=True)
+        self._monitor.start()
+        return self
+
+    def close(self) -> None:
+        self._closed.set()
+        self._executor.shutdown(wait=False)
+        for worker in self._workers:
+            if worker.client is not None:
+                worker.client.close(timeout=2)
+
+    def __enter__(self) -> "SidecarSupervisor":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _spawn(self, worker: _Worker) -> None:
+        client = SidecarClient(command=self.command, cwd=self.cwd).start()
+        try:
+            # Block until imports are done so the worker is genuinely warm
+            reply = client.call(PING_METHOD, timeout=self.startup_timeout)
+        except BaseException:
+            _discard(client)
+            raise
+        with self._cond:
+            installed = not self._closed.is_set()
+            if installed:
+                worker.client = client
+                worker.rss_kb = (reply or {}).get("rss_kb")
+                worker.served = 0
+                worker.started_at = time.monotonic()
+                self._cond.notify_all()
+        if not installed:
+            _discard(client)
+
+    def _restart(self, worker: _Worker, reason: str) -> None:
+        """Take ``worker`` out of rotation and replace it in the background."""
+        with self._cond:
+            old = worker.client
+            worker.client = None
+            worker.restarts += 1
+        toshu_metrics.observe_sidecar_restart(reason)
+        self._respawn(worker, old)
+
+    def _respawn(self, worker: _Worker, old: Optional[SidecarClient] = None) -> None:
+        with self._cond:
+            spawn = not worker.spawning and not self._closed.is_set()
+            if spawn:
+                worker.spawning = True
+        if spawn or old is not None:
+            threading.Thread(target=self._replace, args=(worker, old, spawn),
+                             name=f"sidecar-spawn-{worker.index}", daemon=True).start()
+
+    def _replace(self, worker: _Worker, old: Optional[SidecarClient], spawn: bool) -> None:
+        if old is not None:
+            _discard(old)
+        if not spawn:
+            return
+        try:
+            self._spawn(worker)
+        except Exception:
+            pass  # the next heartbeat tries again
+        finally:
+            with self._cond:
+                worker.spawning = False
+
+    # Routing
+
+    def _acquire(self, timeout: Optional[float]) -> _Worker:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting += 1
+            toshu_metrics.set_sidecar_queue_depth(self._waiting)
+            try:
+                while True:
+                    for worker in self._workers:
+                        if not worker.busy and worker.client is not None:
+                            worker.busy = True
+                            return worker
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise RpcError("No idle sidecar worker")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+                toshu_metrics.set_sidecar_queue_depth(self._waiting)
+
+    def _acquire_live(self, deadline: float) -> Tuple[_Worker, SidecarClient]:
+        """An idle worker whose process is running; dead ones met on the way are replaced."""
+        while True:
+            worker = self._acquire(deadline - time.monotonic())
+            client = worker.client
+            if client is not None and worker.alive:
+                return worker, client
+            self._restart(worker, "crashed")
+            self._release(worker)
+
+    def _release(self, worker: _Worker) -> None:
+        with self._cond:
+            worker.busy = False
+            self._cond.notify()
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        """Run one call on an idle worker; a call that overruns its timeout gets the worker replaced."""
+        timeout = self.call_timeout if timeout is None else timeout
+        start = time.monotonic()
+        worker, client = self._acquire_live(start + timeout)
+        ok = False
+        try:
+            remaining = max(0.001, timeout - (time.monotonic() - start))
+            try:
+                result = client.call(method, params, timeout=remaining)
+            except FutureTimeout:
+                self._restart(worker, "hung")
+                raise RpcError(f"Sidecar call {method} timed out after {timeout:.1f}s")
+            except RpcError:
+                if not worker.alive:
+                    self._restart(worker, "crashed")
+                raise
+            worker.served += 1
+            ok = True
+            if self.max_requests and worker.served >= self.max_requests:
+                self._restart(worker, "max_requests")
+            return result
+        finally:
+            self._record(method, time.monotonic() - start, ok)
+            self._release(worker)
+
+    def submit(self, method: str, params: Optional[Dict[str, Any]] = None,
+               timeout: Optional[float] = None) -> "Future[Any]":
+        return self._executor.submit(self.call, method, params, timeout)
+
+    # Health
+
+    def _monitor_loop(self) -> None:
+        while not self._closed.wait(self.heartbeat_interval):
+            for worker in self._workers:
+                with self._cond:
+                    if worker.busy:
+                        continue  # a busy worker is checked by its call timeout
+                    worker.busy = True
+                try:
+                    self._check(worker)
+                except Exception:
+                    pass  # keep watching the other workers
+                finally:
+                    self._release(worker)
+
+    def _check(self, worker: _Worker) -> None:
+        if worker.client is None:
+            self._respawn(worker)  # an earlier spawn failed, or one is under way
+            return
+        if not worker.alive:
+            self._restart(worker, "crashed")
+            return
+        try:
+            reply = worker.client.call(PING_METHOD, timeout=self.heartbeat_timeout)
+        except (FutureTimeout, RpcError):
+            self._restart(worker, "heartbeat")
+            return
+        worker.rss_kb = (reply or {}).get("rss_kb")
+        if self.max_rss_kb and worker.rss_kb and worker.rss_kb > self.max_rss_kb:
+            self._restart(worker, "memory")
+
+    # Reporting
+
+    def _record(self, method: str, seconds: float, ok: bool) -> None:
+        toshu_metrics.observe_sidecar(method, seconds, ok)
+        with self._cond:
+            self._latency.setdefault(method, deque(maxlen=LATENCY_WINDOW)).append(seconds * 1000)
+            if not ok:
+                self._errors[method] = self._errors.get(method, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            samples = {m: sorted(d) for m, d in self._latency.items()}
+            errors = dict(self._errors)
+            workers = [{
+                "index": w.index,
+                "pid": w.client.proc.pid if w.client is not None and w.client.proc is not None else None,
+                "busy": w.busy,
+                "spawning": w.spawning,
+                "alive": w.alive,
+                "served": w.served,
+                "restarts": w.restarts,
+                "rss_kb": w.rss_kb,
+                "uptime_s": round(time.monotonic() - w.started_at, 1) if w.started_at else 0.0,
+            } for w in self._workers]
+            waiting = self._waiting
+
+        def pct(values: List[float], p: float) -> float:
+            return round(values[min(len(values) - 1, int(p / 100.0 * len(values)))], 2)
+
+        methods = {
+            m: {"samples": len(v), "errors": errors.get(m, 0),
+                "p50_ms": pct(v, 50), "p95_ms": pct(v, 95), "max_ms": round(v[-1], 2)}
+            for m, v in samples.items() if v
+        }
+        return {"queue_depth": waiting, "workers": workers, "methods": methods}
@@ -0,0 +1,342 @@
+"""
+Toshu - shared tokenizer and sentence segmenter
+One pass over the text produces word offsets, interned word ids and
+sentence/paragraph boundaries in compact arrays (12 bytes per word);
+stats and grammar read from the same stream without building substrings
+"""
+
+import html
+import itertools
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+VERSION = 2  # bump when tokenization or segmentation changes
+VOCAB_LIMIT = int(os.environ.get('TOSHU_VOCAB_LIMIT', '250000'))  # words before a fresh vocabulary
+
+_TAG = re.compile(r'<[^>]+>')
+_BLOCK_TAG = re.compile(r'<(?:br\s*/?|/(?:p|div|li|h[1-6]|blockquote|pre|tr))\s*>', re.IGNORECASE)
+_BLANK_RUNS = re.compile(r'\n\s*\n\s*')
+_WORD = re.compile(r"\w+(?:['’\-]\w+)*")
+_TERMINATOR = re.compile(r'[.!?]+[\"\'”’)\]]*(?=\s|$)')
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n')
+_WS = re.compile(r'\s+')
+_BLOCK_START = re.compile(r'<(?:p|div|li|h[1-6]|blockquote|pre|tr)\b|\n[ \t]*\n', re.IGNORECASE)
+_BLOCK_END = re.compile(r'</(?:p|div|li|h[1-6]|blockquote|pre|tr)\s*>|\n[ \t]*\n', re.IGNORECASE)
+
+# A period after these does not end a sentence; dotted ones ("e.g") are
+# matched against the two words on either side of the inner period
+ABBREVIATIONS = frozenset((
+    'al', 'e.g', 'i.e', 'etc', 'cf', 'vs', 'fig', 'figs', 'eq', 'eqs', 'no', 'vol', 'pp', 'p',
+    'ch', 'sec', 'ed', 'eds', 'dr', 'mr', 'mrs', 'ms', 'prof', 'st', 'jr', 'sr', 'approx',
+))
+
+
+_generations = itertools.count(1)
+
+
+class Vocabulary:
+    """Lower-cased word <-> integer id, shared by the streams tokenized while
+    it is the process's current one
+
+    Ids only mean something within one vocabulary; anything keyed by id
+    is kept per vocabulary (or per ``generation``).
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.words = []
+        self.generation = next(_generations)
+        self._endings = {}  # suffix -> (ids ending with it, words checked so far)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.words)
+
+    def intern(self, word):
+        wid = self.index.get(word)
+        if wid is None:
+            with self._lock:
+                wid = self.index.get(word)
+                if wid is None:
+                    wid = self.index[word] = len(self.words)
+                    self.words.append(word)
+        return wid
+
+    def get(self, word):
+        """Id of ``word`` (any case), or None if it has never been seen"""
+        return self.index.get(word.lower())
+
+    def ids_where(self, predicate):
+        """Set of ids whose word satisfies ``predicate``"""
+        return {wid for wid, word in enumerate(self.words) if predicate(word)}
+
+    def ids_ending(self, suffix):
+        """Set of ids whose word ends with ``suffix``; only words added since
+        the last call are checked"""
+        with self._lock:
+            found, checked = self._endings.get(suffix, (None, 0))
+            if found is None:
+                found = set()
+            words = self.words
+            found.update(wid for wid in range(checked, len(words)) if words[wid].endswith(suffix))
+            self._endings[suffix] = (found, len(words))
+        return found
+
+
+VOCAB = Vocabulary()
+_vocab_lock = threading.Lock()
+
+
+def current_vocabulary():
+    """VOCAB, replaced by an empty one once it holds more than VOCAB_LIMIT words
+
+    Streams keep the vocabulary they were built with, so ones still in use
+    stay valid; the old vocabulary is freed along with the last of them.
+    """
+    global VOCAB
+    if len(VOCAB) > VOCAB_LIMIT:
+        with _vocab_lock:
+            if len(VOCAB) > VOCAB_LIMIT:
+                VOCAB = Vocabulary()
+    return VOCAB
+
+
+def plain_text(raw):
+    """Editor HTML to plain text; block-level tags become paragraph breaks"""
+    if '<' not in raw:
+        return raw
+    text = _BLOCK_TAG.sub('\n\n', raw)
+    text = _TAG.sub('', text)
+    if '&' in text:
+        text = html.unescape(text)
+    return _BLANK_RUNS.sub('\n\n', text).strip('\n')
+
+
+def changed_span(old, new, block=4096):
+    """(start, end) of the part of ``new`` that differs from ``old``"""
+    n = min(len(old), len(new))
+    start = 0
+    while start + block <= n and old[start:start + block] == new[start:start + block]:
+        start += block
+    while start < n and old[start] == new[start]:
+        start += 1
+    limit = n - start  # the suffix may not overlap the prefix
+    tail = 0
+    while tail + block <= limit and old[len(old) - tail - block:len(old) - tail] == new[len(new) - tail - block:len(new) - tail]:
+        tail += block
+    while tail < limit and old[len(old) - tail - 1] == new[len(new) - tail - 1]:
+        tail += 1
+    return start, len(new) - tail
+
+
+def block_window(raw, start, end, max_chars=20000):
+    """Widen raw[start:end] to whole paragraphs (HTML blocks or blank-line
+    separated), at most about ``max_chars`` either side"""
+    floor = max(0, start - max_chars)
+    begin = floor
+    for m in _BLOCK_START.finditer(raw, floor, start):
+        begin = m.start()
+    m = _BLOCK_END.search(raw, end, min(len(raw), end + max_chars))
+    return begin, (m.end() if m else min(len(raw), end + max_chars))
+
+
+class TokenStream:
+    """Word offsets, ids and sentence/paragraph boundaries for one text
+
+    starts/ends are character offsets of each word and ids its entry in
+    ``vocab``. sentences and paragraphs hold the index of the first word of
+    each unit; a unit runs up to the next entry (or the last word).
+    Per-unit accessors return memoryviews into these arrays, not copies.
+    """
+
+    __slots__ = ('text', 'starts', 'ends', 'ids', 'sentences', 'paragraphs', 'vocab')
+
+    def __init__(self, text, starts, ends, ids, sentences, paragraphs, vocab):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.ids = ids
+        self.sentences = sentences
+        self.paragraphs = paragraphs
+        self.vocab = vocab
+
+    @property
+    def word_count(self):
+        return len(self.starts)
+
+    @property
+    def sentence_count(self):
+        return len(self.sentences)
+
+    @property
+    def paragraph_count(self):
+        return len(self.paragraphs)
+
+    def token(self, i):
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def word(self, i):
+        """Lower-cased form of word ``i``, from the vocabulary"""
+        return self.vocab.words[self.ids[i]]
+
+    def gap(self, i):
+        """Text between word ``i`` and word ``i + 1``"""
+        return self.text[self.ends[i]:self.starts[i + 1]]
+
+    def token_at(self, offset):
+        """Index of the first word starting at or after ``offset``"""
+        return bisect_left(self.starts, offset)
+
+    def _span(self, bounds, i):
+        end = bounds[i + 1] if i + 1 < len(bounds) else len(self.starts)
+        return bounds[i], end
+
+    def sentence_span(self, i):
+        """(first word, one past last word) of sentence ``i``"""
+        return self._span(self.sentences, i)
+
+    def sentence_ids(self, i):
+        first, last = self.sentence_span(i)
+        return memoryview(self.ids)[first:last]
+
+    def sentence_text(self, i):
+        first, last = self.sentence_span(i)
+        return self.text[self.starts[first]:self.ends[last - 1]]
+
+    def sentence_lengths(self):
+        bounds = self.sentences
+        total = len(self.starts)
+        for i in range(len(bounds)):
+            yield (bounds[i + 1] if i + 1 < len(bounds) else total) - bounds[i]
+
+    def paragraph_span(self, i):
+        return self._span(self.paragraphs, i)
+
+    def paragraph_ids(self, i):
+        first, last = self.paragraph_span(i)
+        return memoryview(self.ids)[first:last]
+
+    def nbytes(self):
+        """Memory held by the arrays (the text itself excluded)"""
+        return sum(a.itemsize * len(a) for a in (self.starts, self.ends, self.ids,
+                                                 self.sentences, self.paragraphs))
+
+
+def tokenize(text, vocab=None):
+    if vocab is None:
+        vocab = current_vocabulary()
+    starts = array('I')
+    ends = array('I')
+    ids = array('I')
+    index, intern = vocab.index, vocab.intern
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters change length when lower-cased; keep offsets exact
+        lowered = None
+    for m in _WORD.finditer(text if lowered is None else lowered):
+        s, e = m.span()
+        starts.append(s)
+        ends.append(e)
+        word = m.group() if lowered is not None else m.group().lower()
+        wid = index.get(word)
+        ids.append(intern(word) if wid is None else wid)
+    n = len(starts)
+
+    paragraphs = array('I')
+    if n:
+        paragraphs.append(0)
+        for m in _PARAGRAPH_BREAK.finditer(text):
+            k = bisect_left(starts, m.end())
+            if k < n and k > paragraphs[-1]:
+                paragraphs.append(k)
+
+    sentences = array('I')
+    if n:
+        sentences.append(0)
+        for m in _TERMINATOR.finditer(text):
+            k = bisect_left(starts, m.end())
+            if k >= n or k <= sentences[-1]:
+                continue
+            if m.group()[0] == '.':
+                prev = vocab.words[ids[k - 1]]
+                # "et al." / "Fig." / initials such as "J. Smith"
+                if prev in ABBREVIATIONS or (len(prev) == 1 and text[starts[k - 1]].isupper()):
+                    continue
+                # "e.g." / "i.e." are two words joined by a period
+                if (k >= 2 and text[ends[k - 2]:starts[k - 1]] == '.'
+                        and vocab.words[ids[k - 2]] + '.' + prev in ABBREVIATIONS):
+                    continue
+            sentences.append(k)
+        # Paragraph starts are always sentence starts
+        if len(paragraphs) > 1:
+            merged = sorted(set(sentences).union(paragraphs))
+            sentences = array('I', merged)
+
+    return TokenStream(text, starts, ends, ids, sentences, paragraphs, vocab)
+
+
+def counts(stream):
+    return {
+        'words': stream.word_count,
+        'characters': len(stream.text),
+        'charactersNoSpaces': len(stream.text) - sum(m.end() - m.start() for m in _WS.finditer(stream.text)),
+        'sentences': stream.sentence_count,
+        'paragraphs': stream.paragraph_count,
+    }
+
+
+def count_text(text):
+    return counts(tokenize(text))
+
+
+def word_count(text):
+    """Words tokenize() would find, without building a stream"""
+    return len(_WORD.findall(text))
+
+
+def merge_counts(parts):
+    """Sum counts of consecutive chunks split at paragraph breaks"""
+    total = dict.fromkeys(('words', 'characters', 'charactersNoSpaces', 'sentences', 'paragraphs'), 0)
+    for part in parts:
+        for key in total:
+            total[key] += part[key]
+    return total
+
+
+class StreamCache:
+    """Memoise the token stream for the current document revision"""
+
+    def __init__(self):
+        self._key = None
+        self._stream = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, raw, check=None):
+        """Stream for ``raw``, rebuilt only when ``key`` (the revision) changes
+
+        ``check`` is called once this caller's turn to build comes up and
+        may raise to abandon a build nobody needs any more.
+        """
+        with self._lock:
+            if self._stream is not None and self._key == key:
+                self.hits += 1
+                return self._stream, True
+        # One build at a time; callers for the same key reuse it
+        with self._build_lock:
+            with self._lock:
+                if self._stream is not None and self._key == key:
+                    self.hits += 1
+                    return self._stream, True
+            if check is not None:
+                check()
+            stream = tokenize(plain_text(raw))
+            with self._lock:
+                self.misses += 1
+                self._key, self._stream = key, stream
+        return stream, False
@@ -0,0 +1,301 @@
+"""
+Toshu - watch a folder (pdf_library) and queue changed files for ingestion
+Polls with mtime/size snapshots; on Linux inotify tells us exactly which
+files to stat, so large libraries are never rescanned after the first pass
+"""
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+ADDED, CHANGED, REMOVED = 'added', 'changed', 'removed'
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct('iIII')
+
+
+class _Inotify:
+    """Minimal ctypes binding; raises OSError where inotify is unavailable"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}  # watch descriptor -> directory
+
+    def add(self, directory):
+        wd = self._add(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+        self.dirs[wd] = directory
+
+    def read(self, timeout):
+        """Return [(path, mask)] for events within ``timeout`` seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            base = self.dirs.get(wd)
+            if base is not None or mask & IN_Q_OVERFLOW:
+                events.append((os.path.join(base, os.fsdecode(name)) if base and name else base, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """Report added, changed and removed files under ``directory`` to ``handler(kind, path)``
+
+    A file is only reported once its mtime and size have been stable for
+    ``debounce`` seconds, so a PDF being copied in is ingested once, complete.
+    The snapshot only takes a change once ``handler`` has returned for it;
+    a file whose handler raised is reported again when it next changes, or
+    on the next start. Passing ``state_path`` persists the snapshot so a
+    restart only reports what changed while the app was closed.
+    """
+
+    def __init__(self, directory, handler, extensions=('.pdf',), interval=2.0, debounce=1.5,
+                 state_path=None, use_inotify=True):
+        self.directory = os.path.abspath(directory)
+        self.handler = handler
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.interval = interval
+        self.debounce = debounce
+        self.state_path = state_path
+        self.use_inotify = use_inotify and sys.platform.startswith('linux')
+        self.snapshot = {}   # path -> (mtime_ns, size) as last handled
+        self._pending = {}   # path -> (signature or None, last change time)
+        self._reported = {}  # path -> signature or None, queued or failed, not yet in snapshot
+        self._lock = threading.RLock()  # snapshot and _reported, shared with the ingest thread
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._dirty = False
+        self._threads = []
+        self._inotify = None
+
+    # Snapshots
+
+    def _wanted(self, name):
+        return name.lower().endswith(self.extensions)
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _scan(self, directory=None):
+        """Full listing of one directory tree: path -> signature"""
+        found = {}
+        stack = [directory or self.directory]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    self._watch_dir(entry.path)
+                elif self._wanted(entry.name):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    found[entry.path] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return {path: tuple(sig) for path, sig in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            snapshot = dict(self.snapshot)
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self.state_path)
+
+    # Change detection
+
+    def _known(self, path):
+        """Signature ``path`` was last reported with (None if absent or removed)"""
+        with self._lock:
+            if path in self._reported:
+                return self._reported[path]
+            return self.snapshot.get(path)
+
+    def _watch_dir(self, directory):
+        if self._inotify is None:
+            return
+        try:
+            self._inotify.add(directory)
+        except OSError as e:
+            # Out of watches (fs.inotify.max_user_watches) or similar: poll instead
+            log.warning('inotify unavailable for %s (%s); polling %s instead', directory, e, self.directory)
+            self._inotify.close()
+            self._inotify = None
+
+    def _touch(self, path, now):
+        """Mark ``path`` as possibly changed; it is re-checked until it settles"""
+        sig = self._stat(path)
+        previous = self._pending.get(path)
+        if previous is None or previous[0] != sig:
+            self._pending[path] = (sig, now)
+
+    def _diff(self, current, now, directory=None):
+        prefix = (directory or self.directory) + os.sep
+        for path, sig in current.items():
+            if self._known(path) != sig:
+                self._touch(path, now)
+        with self._lock:
+            known = set(self.snapshot).union(self._reported)
+        for path in known:
+            if path not in current and (directory is None or path.startswith(prefix)):
+                self._touch(path, now)
+
+    def _settle(self, now):
+        """Emit pending paths whose signature has not moved for ``debounce`` seconds"""
+        for path, (sig, since) in list(self._pending.items()):
+            latest = self._stat(path)
+            if latest != sig:
+                self._pending[path] = (latest, now)
+                continue
+            if now - since < self.debounce:
+                continue
+            del self._pending[path]
+            with self._lock:
+                if sig == self._known(path):
+                    continue
+                old = self.snapshot.get(path)
+                if sig is None and old is None:
+                    self._reported.pop(path, None)  # never handled, now gone
+                    continue
+                self._reported[path] = sig
+            kind = REMOVED if sig is None else ADDED if old is None else CHANGED
+            self._queue.put((kind, path, sig))
+
+    def _handled(self, path, sig):
+        with self._lock:
+            if sig is None:
+                self.snapshot.pop(path, None)
+            else:
+                self.snapshot[path] = sig
+            if path in self._reported and self._reported[path] == sig:
+                del self._reported[path]
+            self._dirty = True
+
+    def scan_once(self):
+        """One polling pass (also used as the inotify overflow fallback)"""
+        self._diff(self._scan(), time.monotonic())
+
+    # Threads
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.use_inotify:
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                self._inotify = None
+            self._watch_dir(self.directory)
+        self.snapshot = self._load_state()
+        self.scan_once()
+        for target, name in ((self._watch_loop, 'toshu-watch'), (self._ingest_loop, 'toshu-ingest')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self._inotify is not None:
+            self._inotify.close()
+        self.save_state()
+
+    def _watch_loop(self):
+        tick = min(self.interval, self.debounce / 2)
+        last_poll = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if self._inotify is not None:
+                for path, mask in self._inotify.read(tick):
+                    if mask & IN_Q_OVERFLOW or path is None:
+                        self.scan_once()  # kernel dropped events: fall back to one full pass
+                    elif mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            self._watch_dir(path)
+                            self._diff(self._scan(path), time.monotonic(), path)
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            self._diff({}, time.monotonic(), path)
+                    elif self._wanted(path):
+                        self._touch(path, time.monotonic())
+            else:
+                self._stop.wait(tick)
+                if time.monotonic() - last_poll >= self.interval:
+                    self.scan_once()
+                    last_poll = time.monotonic()
+            self._settle(time.monotonic())
+            # Persist once a burst has settled and been handed off
+            if self._dirty and not self._pending and self._queue.empty():
+                self._dirty = False
+                self.save_state()
+
+    def _ingest_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            kind, path, sig = item
+            try:
+                self.handler(kind, path)
+            except Exception:
+                log.exception('Ingest failed for %s', path)
+                continue
+            self._handled(path, sig)
@@ -5,60 +5,75 @@ Provides a modern, sliding interface matching the Figma design
 """
 
 import webview
-import os
-import json
 from pathlib import Path
 
-class ToshuAPI:
-    """Backend API for Toshu web app"""
+import toshu_app
+import toshu_bridge
+
+class ToshuAPI(toshu_bridge.Bridge):
+    """Backend API for Toshu web app
+
+    A thin front over toshu_app's service layer, so this window and the
+    React UI share one document, one set of references and one cache.
+    ``call(path, method, payload)`` is inherited for anything else.
+    """
     
     def __init__(self):
-        self.theme = "light"
-        self.document_content = ""
-        self.references = []
-        self.custom_theme = {
-            "primaryColor": "#E53E3E",
-            "secondaryColor": "#319795",
-            "backgroundColor": "#F9FAFB",
-            "textColor": "#1F2937"
-        }
+        super().__init__(toshu_app.dispatch)
+    
+    def _request(self, path, method='GET', payload=None):
+        return self.call(path, method, payload)['body']
     
     def set_theme(self, theme):
         """Set the current theme"""
-        self.theme = theme
-        return {"status": "ok", "theme": theme}
+        result = self._request('/api/theme', 'POST', {'theme': theme})
+        return {"status": "ok", "theme": result.get('theme', theme)}
     
     def get_theme(self):
         """Get current theme"""
-        return {"theme": self.theme}
+        return self._request('/api/theme')
     
     def save_document(self, content):
         """Save document content"""
-        self.document_content = content
-        return {"status": "saved"}
+        return self._request('/api/document', 'POST', {'content': content})
     
     def add_reference(self, ref_text):
         """Add a reference"""
-        self.references.append({"text": ref_text})
-        return {"status": "ok", "count": len(self.references)}
+        result = self._request('/api/references', 'POST', {'text': ref_text})
+        return {"status": "ok", "count": result.get('count', 0)}
     
     def update_custom_theme(self, colors):
         """Update custom theme colors"""
-        self.custom_theme.update(colors)
-        return {"status": "ok", "theme": self.custom_theme}
+        result = self._request('/api/custom-theme', 'POST', colors)
+        return {"status": "ok", "theme": result.get('theme', {})}
     
     def get_stats(self):
         """Get document statistics"""
-        words = len(self.document_content.split())
-        chars = len(self.document_content)
+        stats = self._request('/api/stats')
         return {
-            "words": words,
-            "characters": chars,
-            "characters_no_spaces": len(self.document_content.replace(" ", "")),
-            "sentences": self.document_content.count("."),
-            "paragraphs": self.document_content.count("\n\n"),
-            "pages": round(words / 250, 1)
+            "words": stats['wordCount'],
+            "characters": stats['characterCount'],
+            "characters_no_spaces": stats['characterCountNoSpaces'],
+            "sentences": stats['sentenceCount'],
+            "paragraphs": stats['paragraphCount'],
+            "pages": stats['pageCount']
         }
+    
+    def get_readability(self):
+        """Readability scores, sentence-length distribution and repeated words"""
+        return self._request('/api/readability')
+
+    def add_to_dictionary(self, word):
+        """Stop flagging ``word`` as a spelling mistake"""
+        return self._request('/api/dictionary', 'POST', {'word': word})
+
+    def get_outline(self):
+        """Headings and sections with word counts"""
+        return self._request('/api/outline')
+
+    def get_citations(self):
+        """In-text citations with missing and unused references"""
+        return self._request('/api/citations')
 
 def create_html():
     """Generate HTML for the web UI"""
@@ -795,6 +810,7 @@ def create_html():
 '''
 
 if __name__ == "__main__":
+    toshu_app.load_data()
     api = ToshuAPI()
     html = create_html()
     